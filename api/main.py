@@ -1,18 +1,89 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Header, Response, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 import uvicorn
+from contextlib import asynccontextmanager
 import shutil
+import asyncio
+import hashlib
+import json
 import os
 import sys
+import time
+import uuid
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.pipeline import run_ingestion_pipeline
-from search_service.search import query, fuse_results
-from indexing.insert import get_connection
+from core.pipeline import ingestion_options, register_upload
+from core.checkpoint import load_checkpoint
+from core.jobs import enqueue_job, cancel_job, get_job, list_jobs, active_job, recover_jobs, JOB_STATUSES
+from core.workers import WorkerPool, worker_settings
+from ingestion.extract_frames import FRAME_BACKENDS
+from ingestion.frame_filter import FRAME_FILTERS
+from indexing.thumbnails import THUMBNAIL_FORMATS, MEDIA_TYPES, read_packed_preview, packed_preview_length
+from search_service.search import query, query_async, fuse_results
+from search_service.cache import invalidate_results, cache_stats
+from embedding.models import warm_models, model_stats
+from indexing.insert import (connection, open_pool, close_pool, pool_stats, open_async_pool, close_async_pool,
+                             async_pool_stats)
+from indexing.backends import get_backend
+from core.progress import progress_bus, FINAL_STATUSES
+from core import metrics
 
-app = FastAPI()
+# Ingestion runs in worker processes, never in the web process
+worker_pool = None
+
+def _on_index_changed():
+    # Workers write the index; this process serves it, so pick up their segments and drop stale results
+    get_backend().refresh()
+    invalidate_results()
+
+def _on_worker_progress(video_id: int, snapshot: dict):
+    progress_bus.mirror(video_id, snapshot)
+    # A finished job has merged its segments (finalize); in-between batches arrive as index notices
+    if snapshot.get("status") in FINAL_STATUSES:
+        _on_index_changed()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pool for the whole process: API handlers, search and background ingestion
+    open_pool()
+    # Separate async pool for /search/stream, bound to this event loop
+    try:
+        await open_async_pool()
+    except Exception as e:
+        # e.g. Windows' default Proactor loop, which psycopg's async driver can't use
+        print(f"Async Pool Warning: {e}")
+
+    # Load CLIP/MiniLM after startup so "/" answers immediately; set DEEPSEARCH_WARM_MODELS="" to disable
+    warm = os.getenv("DEEPSEARCH_WARM_MODELS", "clip,minilm")
+    if warm:
+        warm_models([name.strip() for name in warm.split(",") if name.strip()])
+
+    # Requeue ingestions interrupted by the last shutdown; they resume from their checkpoints.
+    # DEEPSEARCH_RESUME_ON_STARTUP=0 disables
+    if os.getenv("DEEPSEARCH_RESUME_ON_STARTUP", "1") != "0":
+        try:
+            requeued = recover_jobs()
+            if requeued: print(f"Requeued {len(requeued)} interrupted jobs")
+        except Exception as e:
+            print(f"Resume Warning: {e}")
+
+    global worker_pool
+    settings = worker_settings()
+    if settings["workers"] > 0:
+        worker_pool = WorkerPool(**settings)
+        worker_pool.start(on_progress=_on_worker_progress, on_index=_on_index_changed)
+
+    yield
+    if worker_pool is not None:
+        worker_pool.stop()
+        worker_pool = None
+    await close_async_pool()
+    close_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,73 +93,280 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Sampled requests get a trace; the spans of everything they call (encoders, SQL, fusion) land in it
+    start = time.perf_counter()
+    with metrics.trace(f"{request.method} {request.url.path}", method=request.method) as root:
+        response = await call_next(request)
+        if root is not None: root.attributes["status_code"] = response.status_code
+
+    # Route templates, not raw paths, keep the label set bounded. Streaming responses count until headers
+    route = request.scope.get("route")
+    metrics.registry.observe("deepsearch_http_request_seconds", time.perf_counter() - start, method=request.method,
+                             route=getattr(route, "path", "unmatched"), status=str(response.status_code))
+    return response
+
 os.makedirs("frames", exist_ok=True)
 app.mount("/frames", StaticFiles(directory="frames"), name="frames")
 
+@app.get("/previews/{video_id}/{name}")
+def get_packed_preview(video_id: int, name: str, range: str = Header(None)):
+    """
+    Serves a preview stored in a video's pack file. Supports single byte ranges
+    """
+    start = end = suffix = None
+    if range and range.startswith("bytes="):
+        first, _, last = range[len("bytes="):].split(",")[0].partition("-")
+        try:
+            if first:
+                start, end = int(first), int(last) if last else None
+            elif last:
+                # Suffix range: the last N bytes
+                suffix = int(last)
+        except ValueError:
+            raise HTTPException(status_code=416, detail="Invalid range")
+
+    length = packed_preview_length(video_id, name)
+    if length is None:
+        raise HTTPException(status_code=404, detail="Preview not found")
+
+    if suffix is not None:
+        start = max(0, length - suffix)
+    # "-0", a start past the end, or an end before the start: nothing to send
+    if (suffix == 0 or (start is not None and start >= length)
+            or (start is not None and end is not None and end < start)):
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{length}"})
+
+    data = read_packed_preview(video_id, name, start=start, end=end)
+    media_type = MEDIA_TYPES.get(name.rsplit(".", 1)[-1], "application/octet-stream")
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": "public, max-age=86400"}
+
+    if start is None:
+        return Response(content=data, media_type=media_type, headers=headers)
+
+    headers["Content-Range"] = f"bytes {start}-{start + len(data) - 1}/{length}"
+    return Response(content=data, status_code=206, media_type=media_type, headers=headers)
+
+def _save_upload(src, path: str, chunk_size: int = 1 << 20) -> str:
+    # Hashes while writing, so a duplicate is known without reading the file a second time
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        while chunk := src.read(chunk_size):
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
 @app.get("/")
 def home():
     return {"status": "DeepSearch API Ready"}
 
 @app.post("/upload")
 async def upload_video(
-    background_tasks: BackgroundTasks, 
     file: UploadFile = File(...),
-    frame_interval: int = Form(1)
+    frame_interval: int = Form(1),
+    frame_backend: str = Form("grab"),
+    frame_filter: str = Form(None),
+    filter_threshold: float = Form(None),
+    parallel_tracks: bool = Form(False),
+    thumbnail_size: int = Form(384),
+    thumbnail_format: str = Form("webp"),
+    thumbnail_quality: int = Form(80),
+    pack_thumbnails: bool = Form(False),
+    priority: int = Form(0),
+    reindex: bool = Form(False)
 ):
-    os.makedirs("uploads", exist_ok=True)
-    file_path = f"uploads/{file.filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    background_tasks.add_task(run_ingestion_pipeline, file_path, frame_interval)
+    if frame_backend not in FRAME_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"frame_backend must be one of {FRAME_BACKENDS}")
+    if frame_filter and frame_filter not in FRAME_FILTERS:
+        raise HTTPException(status_code=400, detail=f"frame_filter must be one of {FRAME_FILTERS}")
+    if thumbnail_format not in THUMBNAIL_FORMATS:
+        raise HTTPException(status_code=400, detail=f"thumbnail_format must be one of {THUMBNAIL_FORMATS}")
+
+    # The library keeps every video, so uploads with the same name get their own folder
+    upload_dir = os.path.join("uploads", uuid.uuid4().hex[:12])
+    os.makedirs(upload_dir, exist_ok=True)
+    file_path = os.path.join(upload_dir, os.path.basename(file.filename))
     
-    return {"message": "Processing started", "filename": file.filename, "config": {"frame_interval": frame_interval}}
+    content_hash = await asyncio.to_thread(_save_upload, file.file, file_path)
+
+    options = ingestion_options(frame_interval, frame_backend, frame_filter, filter_threshold,
+                                parallel_tracks=parallel_tracks,
+                                thumbnails={"max_size": thumbnail_size, "fmt": thumbnail_format,
+                                            "quality": thumbnail_quality, "pack": pack_thumbnails})
+    # Off the event loop: a concurrent upload of the same file holds the hash lock until it commits
+    (video_id, job_id), existing = await asyncio.to_thread(register_upload, file_path, content_hash, options,
+                                                           reindex, priority)
+
+    # Same bytes as a video already in the library: reuse its index instead of running the pipeline again
+    if existing is not None:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        video_id, status, title = existing
+        return {"message": "Duplicate", "video_id": video_id, "status": status, "duplicate_of": title,
+                "job_id": await asyncio.to_thread(active_job, video_id), "content_hash": content_hash,
+                "filename": file.filename}
+
+    return {"message": "Queued", "job_id": job_id, "video_id": video_id, "filename": file.filename, "config": {"frame_interval": frame_interval, "frame_backend": frame_backend, "frame_filter": frame_filter, "parallel_tracks": parallel_tracks, "priority": priority}}
+
+@app.post("/videos/{video_id}/resume")
+def resume_video(video_id: int, priority: int = 0):
+    checkpoint = load_checkpoint(video_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail="Unknown video")
+    if checkpoint["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Video is already indexed")
+    if active_job(video_id) is not None:
+        raise HTTPException(status_code=409, detail="Video is already queued or being processed")
+
+    job_id = enqueue_job(video_id, priority=priority)
+    return {"message": "Queued", "job_id": job_id, "video_id": video_id,
+            "checkpoint": {name: checkpoint[name] for name in ("transcript_done", "transcript_end", "frames_done", "last_frame_ts")}}
+
+@app.get("/jobs")
+def get_jobs(status: str = None, limit: int = Query(100, ge=1, le=1000)):
+    """Ingestion jobs, most recent first"""
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {JOB_STATUSES}")
+    return list_jobs(status=status, limit=limit)
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: int):
+    """A job's queue state, with live progress while it runs"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+
+    if job["status"] == "running":
+        job["progress"] = progress_bus.snapshot(job["video_id"])
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job_endpoint(job_id: int):
+    """Drops a queued job, or stops a running one at its next batch; the video keeps what was indexed"""
+    status = cancel_job(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {"job_id": job_id, "status": status, "cancel_requested": True}
+
+@app.get("/workers")
+def get_worker_stats():
+    """Ingestion worker processes and their resource slots"""
+    if worker_pool is None: return {"status": "no_workers"}
+    return worker_pool.stats()
+
+def _db_status(video_id: int = None) -> dict:
+    # Last checkpoint in the DB, for jobs this process isn't running (or after a restart)
+    sql = "SELECT id, status, title, progress FROM videos "
+    sql += "WHERE id = %s" if video_id is not None else "ORDER BY id DESC LIMIT 1"
+
+    # Short wait so UI polling fails fast when the DB is down
+    with connection(timeout=2.0) as conn:
+        row = conn.execute(sql, (video_id,) if video_id is not None else None).fetchone()
+
+    if row is None: return None
+    return {"video_id": row[0], "status": row[1], "filename": row[2], "progress": row[3]}
 
 @app.get("/status")
 def get_status():
-    conn = get_connection()
-    if conn is None: return {"status": "offline"}
-    
-    cur = conn.cursor()
-    # Fetch status AND progress
-    cur.execute("SELECT status, title, progress FROM videos ORDER BY id DESC LIMIT 1")
-    row = cur.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            "status": row[0], 
-            "filename": row[1], 
-            "progress": row[2] # <--- Sending this to Frontend
-        }
-    else:
-        return {"status": "no_index", "filename": None, "progress": 0}
+    # Live jobs are answered from the progress bus, without touching the DB
+    snapshot = progress_bus.snapshot()
+    if snapshot is not None and snapshot["status"] not in FINAL_STATUSES:
+        return snapshot
+
+    # A finished job stays on the bus; a newer upload still waiting for a worker is only in the DB
+    try:
+        status = _db_status()
+    except Exception as e:
+        print(f"Status Error: {e}")
+        return snapshot or {"status": "offline"}
+
+    if snapshot is not None and (status is None or status["video_id"] == snapshot["video_id"]):
+        return snapshot
+    return status or {"status": "no_index", "filename": None, "progress": 0}
+
+@app.get("/progress/{video_id}/stream")
+async def stream_progress(video_id: int):
+    """
+    Server-Sent Events stream of one job's progress: a snapshot (status, progress,
+    per-stage counts and rates, ETA) on every change, until the job finishes
+    """
+    if progress_bus.snapshot(video_id) is None:
+        # Not running here; send the last DB checkpoint once
+        try:
+            status = await asyncio.to_thread(_db_status, video_id)
+        except Exception as e:
+            print(f"Status Error: {e}")
+            raise HTTPException(status_code=503, detail="Database unavailable")
+        if status is None:
+            raise HTTPException(status_code=404, detail="Unknown video")
+
+        async def once():
+            yield f"data: {json.dumps(status)}\n\n"
+        return StreamingResponse(once(), media_type="text/event-stream")
+
+    async def events():
+        last = None
+        async for snapshot in progress_bus.subscribe(video_id):
+            # None means nothing changed for a while; a comment line keeps proxies from closing the stream
+            if snapshot is not None: last = snapshot
+            yield ": keepalive\n\n" if snapshot is None else f"data: {json.dumps(snapshot)}\n\n"
+
+        # The job was dropped before finishing (e.g. /reset): tell the client to stop listening
+        if last is None or last["status"] not in FINAL_STATUSES:
+            yield f"event: end\ndata: {json.dumps({'video_id': video_id, 'status': 'gone'})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/search")
-def search(q: str, visual_weight: float = 1.0, text_weight: float = 1.0):
+def search(q: str, visual_weight: float = 1.0, text_weight: float = 1.0, ef_search: int = None, probes: int = None,
+           candidates: int = Query(100, ge=1, le=5000)):
     try:
-        raw_results = query(q)
+        # candidates = hits fetched per modality before fusion
+        raw_results = query(q, limit=candidates, ef_search=ef_search, probes=probes)
         fused_results = fuse_results(raw_results, weight_visual=visual_weight, weight_text=text_weight)
         return fused_results[:20]
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail="Search failed")
 
+@app.get("/search/stream")
+async def search_stream(q: str, visual_weight: float = 1.0, text_weight: float = 1.0, ef_search: int = None,
+                        probes: int = None, candidates: int = Query(100, ge=1, le=5000), top: int = Query(20, ge=1, le=500)):
+    """
+    Async search: query encoding runs on the inference executor, the frame and text
+    similarity queries run concurrently, and fusion runs on a worker thread. Ranking
+    needs every candidate, so scenes are written as NDJSON lines, best first, once
+    fusion finishes; the event loop is never blocked by it
+    """
+    try:
+        raw_results = await query_async(q, limit=candidates, ef_search=ef_search, probes=probes)
+        fused_results = await asyncio.to_thread(fuse_results, raw_results, weight_visual=visual_weight,
+                                                weight_text=text_weight)
+    except Exception as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail="Search failed")
+
+    fused_results = fused_results[:top]
+
+    async def lines():
+        for scene in fused_results:
+            yield json.dumps(scene) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.post("/reset")
 def reset_system():
     """
     Forcefully resets the database status. Used when the UI gets stuck.
     """
-    conn = get_connection()
-    if conn is None:
-        return {"status": "error", "detail": "Database offline"}
-
-    cur = conn.cursor()
     try:
-        # 1. Delete everything from the DB
-        cur.execute("TRUNCATE TABLE videos, frames, text_segments RESTART IDENTITY CASCADE;")
-        conn.commit()
+        # 1. Delete everything from the DB (jobs cascade; running workers see their job vanish and stop)
+        with connection() as conn:
+            conn.execute("TRUNCATE TABLE videos, frames, text_segments RESTART IDENTITY CASCADE;")
+        get_backend().reset()
+        invalidate_results()
+        progress_bus.forget()
         
         # 2. Delete the physical frame files
         if os.path.exists("frames"):
@@ -104,9 +382,33 @@ def reset_system():
     except Exception as e:
         print(f"Reset Error: {e}")
         return {"status": "error", "detail": str(e)}
-    finally:
-        cur.close()
-        conn.close()
+
+@app.get("/pool")
+def get_pool_stats():
+    """Connection pool size and wait metrics"""
+    stats = pool_stats()
+    if stats is None: return {"status": "no_pool"}
+    return {**stats, "async": async_pool_stats()}
+
+@app.get("/cache")
+def get_cache_stats():
+    """Hit/miss counters for the query-embedding and search-result caches"""
+    return cache_stats()
+
+@app.get("/models")
+def get_model_stats():
+    """Load time and memory per model"""
+    return model_stats()
+
+@app.get("/metrics")
+def get_metrics():
+    """Stage and request latency histograms in Prometheus text format, including ingestion workers"""
+    return Response(content=metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces")
+def get_traces(limit: int = Query(20, ge=1, le=1000)):
+    """Recently finished sampled traces, newest first (set DEEPSEARCH_TRACE_SAMPLE to enable)"""
+    return {"sample_rate": metrics.trace_sample_rate(), "traces": metrics.recent_traces(limit)}
 
 if __name__ == "__main__":
     uvicorn.run("api.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion.extract_frames import extract_frames, FRAME_BACKENDS
+
+def bench_backend(video_file: str, backend: str, seconds_per_frame: float) -> dict:
+    """
+    Drains one sampler and measures its throughput
+
+    Args:
+        video_file (str): Path to video file
+        backend (str): Frame sampler backend to run
+        seconds_per_frame (float): Sampling rate passed to extract_frames
+
+    Return:
+        dict: Frame count, elapsed seconds and frames/sec for the backend
+    """
+    start = time.perf_counter()
+    count = 0
+    last_timestamp = 0.0
+
+    for _, timestamp in extract_frames(video_file, seconds_per_frame=seconds_per_frame, backend=backend):
+        count += 1
+        last_timestamp = timestamp
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "frames": count,
+        "seconds": elapsed,
+        "fps": count / elapsed if elapsed > 0 else 0.0,
+        "last_timestamp": last_timestamp,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare frame sampler throughput")
+    parser.add_argument("video", help="Path to the video file to sample")
+    parser.add_argument("--interval", type=float, default=1.0, help="Value passed as seconds_per_frame")
+    parser.add_argument("--backends", nargs="+", default=list(FRAME_BACKENDS), choices=FRAME_BACKENDS)
+    args = parser.parse_args()
+
+    results = [bench_backend(args.video, backend, args.interval) for backend in args.backends]
+
+    baseline = next((r for r in results if r["backend"] == "seek"), None)
+
+    print(f"{'backend':<8} {'frames':>7} {'seconds':>9} {'frames/s':>9} {'speedup':>8}")
+    for r in results:
+        speedup = r["fps"] / baseline["fps"] if baseline and baseline["fps"] > 0 else float("nan")
+        print(f"{r['backend']:<8} {r['frames']:>7} {r['seconds']:>9.2f} {r['fps']:>9.1f} {speedup:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
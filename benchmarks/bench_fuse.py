@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_service.search import fuse_results
+
+def synthetic_results(n: int, duration: float = 7200.0, seed: int = 0) -> dict:
+    """
+    Builds query()-shaped results with n candidates split between frames and text
+
+    Args:
+        n (int): Total candidate count
+        duration (float): Video length in seconds the hits are spread over
+        seed (int): RNG seed
+
+    Return:
+        dict: {"frames": [...], "text": [...]} rows in the same layout query() returns
+    """
+    rng = np.random.default_rng(seed)
+    n_frames = n // 2
+    n_text = n - n_frames
+
+    frame_times = rng.uniform(0, duration, n_frames)
+    frames = [(float(ts), f"frames/1/frame_{i}.jpg", float(score), float(ts))
+              for i, (ts, score) in enumerate(zip(frame_times, rng.uniform(0.1, 0.4, n_frames)))]
+
+    text_times = rng.uniform(0, duration, n_text)
+    text = [(float(ts), float(ts) + 3.0, f"segment {i}", float(score))
+            for i, (ts, score) in enumerate(zip(text_times, rng.uniform(0.1, 0.8, n_text)))]
+
+    return {"frames": frames, "text": text}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure fuse_results latency by candidate count")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 10000])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'candidates':>10} {'scenes':>7} {'p50 ms':>9} {'max ms':>9}")
+    for n in args.sizes:
+        results = synthetic_results(n)
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            scenes = fuse_results(results)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        print(f"{n:>10} {len(scenes):>7} {np.percentile(timings, 50):>9.3f} {max(timings):>9.3f}")
+
+if __name__ == "__main__":
+    main()
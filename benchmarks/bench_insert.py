@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexing.insert import get_connection, insert_frame, insert_frames_bulk, register_vector
+
+def _delete_frames(conn, video_id: int):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM frames WHERE video_id = %s", (video_id,))
+    conn.commit()
+
+def bench_row_at_a_time(conn, video_id: int, timestamps, paths, embeddings) -> float:
+    start = time.perf_counter()
+    for ts, path, emb in zip(timestamps, paths, embeddings):
+        insert_frame(conn, video_id, float(ts), path, emb)
+    return time.perf_counter() - start
+
+def bench_bulk(conn, video_id: int, timestamps, paths, embeddings, batch_size: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(timestamps), batch_size):
+        insert_frames_bulk(conn, video_id, timestamps[i:i + batch_size], paths[i:i + batch_size], embeddings[i:i + batch_size])
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare row-at-a-time INSERT against COPY bulk inserts for frames")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((args.rows, 512)).astype(np.float32)
+    timestamps = np.arange(args.rows, dtype=np.float64)
+    paths = [f"frames/bench/frame_{i}.jpg" for i in range(args.rows)]
+
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO videos (title, filepath, status, progress) VALUES ('bench', 'bench', 'completed', 100) RETURNING id")
+        video_id = cur.fetchone()[0]
+    conn.commit()
+
+    try:
+        row_seconds = bench_row_at_a_time(conn, video_id, timestamps, paths, embeddings)
+        _delete_frames(conn, video_id)
+
+        bulk_seconds = bench_bulk(conn, video_id, timestamps, paths, embeddings, args.batch_size)
+    finally:
+        _delete_frames(conn, video_id)
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM videos WHERE id = %s", (video_id,))
+        conn.commit()
+        conn.close()
+
+    copy_format = "binary" if register_vector is not None else "text"
+    print(f"{'path':<22} {'rows':>7} {'seconds':>9} {'rows/s':>10}")
+    print(f"{'row-at-a-time':<22} {args.rows:>7} {row_seconds:>9.2f} {args.rows / row_seconds:>10.0f}")
+    print(f"{'COPY ' + copy_format + f' x{args.batch_size}':<22} {args.rows:>7} {bulk_seconds:>9.2f} {args.rows / bulk_seconds:>10.0f}")
+    print(f"Speedup: {row_seconds / bulk_seconds:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding.models import _load_clip, _load_minilm
+from embedding.onnx_backend import (OnnxCLIP, OnnxSentenceEncoder, _ensure_exported, onnx_dir,
+                                    CLIP_PROCESSOR_DIR)
+
+QUERIES = ["a dog running on the beach", "someone explains the budget", "red car at night",
+           "two people shaking hands", "the crowd cheers", "close-up of a keyboard"]
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+def synthetic_frames(count: int, height: int = 360, width: int = 640, seed: int = 0) -> list:
+    """Smooth random RGB images; flat noise would make every CLIP embedding look alike"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        small = rng.integers(0, 256, (height // 40, width // 40, 3), dtype=np.uint8)
+        frames.append(np.kron(small, np.ones((40, 40, 1), dtype=np.uint8)))
+    return frames
+
+def _throughput(encode, frames: list, batch_size: int) -> float:
+    encode(frames[:batch_size])  # warm-up
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        encode(frames[i:i + batch_size])
+    return len(frames) / (time.perf_counter() - start)
+
+def _latency_ms(encode, queries: list, repeats: int) -> float:
+    encode(queries[0])
+    timings = []
+    for _ in range(repeats):
+        for q in queries:
+            start = time.perf_counter()
+            encode(q)
+            timings.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(timings, 50))
+
+def main():
+    import torch
+    from transformers import CLIPProcessor
+
+    parser = argparse.ArgumentParser(description="Parity and speed of the ONNX Runtime encoders against PyTorch")
+    parser.add_argument("--frames", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = all cores)")
+    parser.add_argument("--int8", action="store_true", help="Compare the dynamically quantized models")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=None,
+                        help="Fail below this cosine similarity. Defaults to 0.999 (fp32) or 0.95 (int8)")
+    args = parser.parse_args()
+
+    min_cosine = args.min_cosine or (0.95 if args.int8 else 0.999)
+    root = onnx_dir()
+    _ensure_exported(root, args.int8)
+
+    torch_clip = _load_clip()
+    torch_minilm = _load_minilm()["model"]
+    onnx_clip = OnnxCLIP(root, int8=args.int8, threads=args.threads)
+    onnx_minilm = OnnxSentenceEncoder(root, int8=args.int8, threads=args.threads)
+    processor = CLIPProcessor.from_pretrained(os.path.join(root, CLIP_PROCESSOR_DIR))
+
+    def torch_images(frames):
+        with torch.no_grad():
+            inputs = torch_clip["processor"](images=frames, return_tensors="pt").to(torch_clip["device"])
+            return torch_clip["model"].get_image_features(**inputs).cpu().numpy()
+
+    def onnx_images(frames):
+        return onnx_clip.get_image_features(processor(images=frames, return_tensors="np")["pixel_values"])
+
+    def torch_clip_text(text):
+        with torch.no_grad():
+            inputs = torch_clip["processor"](text=[text], return_tensors="pt", padding=True).to(torch_clip["device"])
+            return torch_clip["model"].get_text_features(**inputs).cpu().numpy()
+
+    def onnx_clip_text(text):
+        inputs = processor(text=[text], return_tensors="np", padding=True)
+        return onnx_clip.get_text_features(inputs["input_ids"], inputs["attention_mask"])
+
+    frames = synthetic_frames(args.frames)
+
+    # --- Parity: every output row must point the same way as PyTorch's ---
+    parity = {
+        "clip image": _cosine(torch_images(frames[:args.batch_size]), onnx_images(frames[:args.batch_size])),
+        "clip text": _cosine(np.concatenate([torch_clip_text(q) for q in QUERIES]),
+                             np.concatenate([onnx_clip_text(q) for q in QUERIES])),
+        "minilm": _cosine(np.asarray(torch_minilm.encode(QUERIES)), onnx_minilm.encode(QUERIES)),
+    }
+
+    print(f"{'output':<11} {'min cos':>9} {'mean cos':>9}")
+    failed = False
+    for name, cos in parity.items():
+        print(f"{name:<11} {cos.min():>9.5f} {cos.mean():>9.5f}")
+        failed |= bool(cos.min() < min_cosine)
+
+    # --- Speed ---
+    runtime = "onnx-int8" if args.int8 else "onnx"
+    print(f"\n{'runtime':<10} {'frames/s':>9} {'clip q ms':>10} {'minilm q ms':>12}")
+    print(f"{'torch':<10} {_throughput(torch_images, frames, args.batch_size):>9.1f} "
+          f"{_latency_ms(torch_clip_text, QUERIES, args.repeats):>10.2f} "
+          f"{_latency_ms(torch_minilm.encode, QUERIES, args.repeats):>12.2f}")
+    print(f"{runtime:<10} {_throughput(onnx_images, frames, args.batch_size):>9.1f} "
+          f"{_latency_ms(onnx_clip_text, QUERIES, args.repeats):>10.2f} "
+          f"{_latency_ms(onnx_minilm.encode, QUERIES, args.repeats):>12.2f}")
+
+    if failed:
+        print(f"\nParity check failed: cosine similarity below {min_cosine}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding.models import CLIP_MODEL_NAME
+from embedding.preprocess import ClipPreprocessor, adaptive_batch_size
+
+def synthetic_frames(count: int, height: int = 1080, width: int = 1920, seed: int = 0) -> list:
+    """Blurred blocky BGR frames, roughly as smooth as decoded video"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        small = rng.integers(0, 256, (height // 40, width // 40, 3), dtype=np.uint8)
+        frames.append(cv2.GaussianBlur(np.kron(small, np.ones((40, 40, 1), dtype=np.uint8)), (0, 0), 5))
+    return frames
+
+def main():
+    from transformers import CLIPProcessor
+
+    parser = argparse.ArgumentParser(description="Parity and speed of batched CLIP preprocessing against CLIPProcessor")
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--embeddings", action="store_true", help="Also compare CLIP image embeddings")
+    parser.add_argument("--min-cosine", type=float, default=0.995)
+    args = parser.parse_args()
+
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+    preprocessor = ClipPreprocessor()
+    frames = synthetic_frames(args.frames, args.height, args.width)
+
+    def reference(batch):
+        rgb = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in batch]
+        return processor(images=rgb, return_tensors="np")["pixel_values"]
+
+    # --- Parity on pixel values ---
+    batch = frames[:args.batch_size]
+    expected = reference(batch)
+    actual = preprocessor(batch).copy()
+    diff = np.abs(expected - actual)
+    print(f"pixel values: max abs diff {diff.max():.4f}, mean abs diff {diff.mean():.5f} (normalized units)")
+
+    failed = False
+    if args.embeddings:
+        import torch
+        from embedding.models import get_clip
+
+        clip = get_clip()
+        with torch.no_grad():
+            a = clip["model"].get_image_features(pixel_values=torch.from_numpy(expected).to(clip["device"])).cpu().numpy()
+            b = clip["model"].get_image_features(pixel_values=torch.from_numpy(actual).to(clip["device"])).cpu().numpy()
+        cos = (a * b).sum(1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+        print(f"embeddings: min cosine {cos.min():.5f}, mean cosine {cos.mean():.5f}")
+        failed = bool(cos.min() < args.min_cosine)
+
+    # --- Speed ---
+    for name, fn in (("CLIPProcessor", reference), ("batched", preprocessor)):
+        fn(batch)
+        start = time.perf_counter()
+        for i in range(0, len(frames), args.batch_size):
+            fn(frames[i:i + args.batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14} {len(frames) / elapsed:>8.1f} frames/s")
+
+    print(f"adaptive batch size (cpu): {adaptive_batch_size('cpu')}")
+
+    if failed:
+        print(f"Parity check failed: cosine similarity below {args.min_cosine}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
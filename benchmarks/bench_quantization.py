@@ -0,0 +1,84 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexing.mmap_index import MmapBackend
+from indexing.quantization import EMBEDDING_FORMATS, bytes_per_vector
+
+def synthetic_embeddings(rows: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors; closer to real CLIP frame embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, rows)] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+def _dir_bytes(path: str, suffix: str = None) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files if suffix is None or f.startswith(suffix))
+    return total
+
+def _rss_bytes() -> int:
+    # Current resident set, mapped index pages included; Linux only
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and memory of each embedding storage format")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=10)
+    args = parser.parse_args()
+
+    data = synthetic_embeddings(args.rows, args.dim)
+    rng = np.random.default_rng(1)
+    queries = data[rng.integers(0, args.rows, args.queries)] + 0.1 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    # Exact float32 answers are the ground truth
+    truth = [set(np.argsort(-(data @ q))[:args.k].tolist()) for q in queries]
+    dummy_text = np.zeros(384, dtype=np.float32)
+
+    print(f"{'format':<8} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'scan MB':>9} {'disk MB':>9} {'RSS MB':>8} "
+          f"{'B/vec scan':>11}")
+    for fmt in EMBEDDING_FORMATS:
+        root = tempfile.mkdtemp(prefix=f"bench_{fmt}_")
+        try:
+            writer = MmapBackend(root, embedding_format=fmt, rerank_factor=args.rerank_factor)
+            writer.add_frames(1, np.arange(args.rows, dtype=np.float64), [str(i) for i in range(args.rows)], data)
+            del writer
+
+            # A fresh reader, so the RSS growth is what searching this format keeps resident
+            backend = MmapBackend(root, embedding_format=fmt, rerank_factor=args.rerank_factor)
+            rss_before = _rss_bytes()
+
+            hits = 0
+            timings = []
+            for q, expected in zip(queries, truth):
+                start = time.perf_counter()
+                rows = backend.search(q, dummy_text, limit=args.k)["frames"]
+                timings.append((time.perf_counter() - start) * 1000)
+                hits += len(expected & {int(r[0]) for r in rows})
+
+            rss_after = _rss_bytes()
+            resident = f"{(rss_after - rss_before) / 1e6:.1f}" if rss_before is not None else "n/a"
+
+            scanned = bytes_per_vector(fmt, args.dim)["first_pass"] * args.rows
+            print(f"{fmt:<8} {hits / (args.k * len(queries)):>10.3f} {np.percentile(timings, 50):>8.2f} "
+                  f"{scanned / 1e6:>9.1f} {_dir_bytes(root) / 1e6:>9.1f} {resident:>8} "
+                  f"{bytes_per_vector(fmt, args.dim)['first_pass']:>11}")
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
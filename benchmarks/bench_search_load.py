@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+
+QUERIES = ["a dog running on the beach", "someone explains the budget", "red car at night",
+           "two people shaking hands", "the crowd cheers", "close-up of a keyboard",
+           "sunset over the city", "a man talking to the camera"]
+
+async def _worker(client, endpoint: str, jobs: asyncio.Queue, latencies: list, errors: list, params: dict):
+    while True:
+        try:
+            q = jobs.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+
+        start = time.perf_counter()
+        try:
+            response = await client.get(endpoint, params={**params, "q": q})
+            # Read the whole body so streamed responses are timed to their last scene
+            await response.aread()
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            errors.append(str(e))
+
+async def run_load(base_url: str, endpoint: str, requests: int, concurrency: int, distinct: bool, params: dict) -> dict:
+    """
+    Fires `requests` searches at one endpoint with `concurrency` clients in flight
+
+    Return:
+        dict: Request count, errors, throughput and latency percentiles in ms
+    """
+    import httpx
+
+    jobs = asyncio.Queue()
+    for i in range(requests):
+        q = QUERIES[i % len(QUERIES)]
+        # Distinct queries miss the result and embedding caches, so every request encodes and hits the DB
+        jobs.put_nowait(f"{q} {i}" if distinct else q)
+
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_worker(client, endpoint, jobs, latencies, errors, params) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    result = {"endpoint": endpoint, "requests": requests, "concurrency": concurrency,
+              "errors": len(errors), "req_per_s": round(len(latencies) / elapsed, 1)}
+    if latencies:
+        result.update({f"p{p}_ms": round(float(np.percentile(latencies, p)), 1) for p in (50, 95, 99)})
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency under concurrent load: /search vs /search/stream")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoints", nargs="+", default=["/search", "/search/stream"])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--distinct", action="store_true", help="Unique query per request (defeats the caches)")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per run")
+    args = parser.parse_args()
+
+    params = {"candidates": args.candidates}
+
+    if not args.json:
+        print(f"{'endpoint':<16} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for concurrency in args.concurrency:
+        for endpoint in args.endpoints:
+            result = asyncio.run(run_load(args.url, endpoint, args.requests, concurrency, args.distinct, params))
+            if args.json:
+                print(json.dumps(result))
+                continue
+            print(f"{endpoint:<16} {concurrency:>5} {result['req_per_s']:>8} {result.get('p50_ms', '-'):>8} "
+                  f"{result.get('p95_ms', '-'):>8} {result.get('p99_ms', '-'):>8} {result['errors']:>7}")
+
+if __name__ == "__main__":
+    main()
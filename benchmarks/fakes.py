@@ -0,0 +1,46 @@
+import hashlib
+import numpy as np
+
+FRAME_DIM = 512
+TEXT_DIM = 384
+
+def _seeded_vector(key: bytes, dim: int) -> np.ndarray:
+    # Same input, same vector, on every machine and run
+    seed = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def fake_frame_embeddings(frames: list, cache_stats=None) -> np.ndarray:
+    """Stands in for get_frame_embeddings: a vector seeded by a coarse sample of each frame's pixels"""
+    return np.stack([_seeded_vector(np.ascontiguousarray(item[0][::16, ::16]).tobytes(), FRAME_DIM)
+                     for item in frames]) if frames else np.empty((0, FRAME_DIM), dtype=np.float32)
+
+def fake_text_embeddings(texts: list) -> np.ndarray:
+    """Stands in for get_text_embeddings (takes the same segment dicts)"""
+    return np.stack([_seeded_vector(seg["text"].encode(), TEXT_DIM)
+                     for seg in texts]) if texts else np.empty((0, TEXT_DIM), dtype=np.float32)
+
+def fake_transcribe(audio, segment_seconds: float = 5.0, sample_rate: int = 16000, **kwargs):
+    """Stands in for iter_transcribe: one fixed-length segment per segment_seconds of PCM"""
+    duration = len(audio) / sample_rate
+    start, i = 0.0, 0
+    while start < duration:
+        end = min(start + segment_seconds, duration)
+        yield {"start": start, "end": end, "text": f"synthetic segment {i}"}
+        start, i = end, i + 1
+
+def install():
+    """
+    Swaps the model calls used by ingestion and search for the fakes above, so stage
+    timings measure the pipeline around the models. Affects this process only
+    """
+    from core import pipeline
+    from search_service import search
+
+    pipeline.get_frame_embeddings = fake_frame_embeddings
+    pipeline.get_text_embeddings = fake_text_embeddings
+    pipeline.iter_transcribe = fake_transcribe
+
+    # The batchers captured the real encoders when search was imported
+    search.text_batcher.encode_batch = lambda texts: [_seeded_vector(t.encode(), TEXT_DIM).tolist() for t in texts]
+    search.clip_batcher.encode_batch = lambda texts: [_seeded_vector(t.encode(), FRAME_DIM).tolist() for t in texts]
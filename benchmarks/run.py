@@ -0,0 +1,375 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic, fakes
+
+BENCHES = ("extract", "preprocess", "embed", "text_embed", "transcribe", "insert", "fuse", "search", "pipeline")
+
+# Run by default; transcribe and pipeline are slow (and pipeline needs the database), so they are opt-in
+DEFAULT_BENCHES = ("extract", "preprocess", "embed", "text_embed", "insert", "fuse", "search")
+
+def latency_summary(samples_ms: list) -> dict:
+    """p50/p95/p99/mean of per-item or per-call latencies in ms"""
+    if not samples_ms: return {"p50": None, "p95": None, "p99": None, "mean": None}
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "mean": round(float(np.mean(samples_ms)), 3)}
+
+def _result(bench: str, params: dict, items: int, unit: str, seconds: float, latencies_ms: list) -> dict:
+    return {
+        "bench": bench,
+        "params": params,
+        "items": items,
+        "unit": unit,
+        "seconds": round(seconds, 4),
+        "throughput": round(items / seconds, 3) if seconds > 0 else None,
+        "latency_ms": latency_summary(latencies_ms),
+    }
+
+def _decoded_frames(video: str, count: int) -> list:
+    from ingestion.extract_frames import extract_frames
+    frames = []
+    for frame, ts in extract_frames(video, seconds_per_frame=0.2):
+        frames.append((frame, ts))
+        if len(frames) >= count: break
+    return frames
+
+def bench_extract(video: str, backend: str = "grab", interval: float = 1.0, **_) -> dict:
+    """Frame sampling throughput; latency is the gap between consecutive frames"""
+    from ingestion.extract_frames import extract_frames
+
+    latencies = []
+    start = last = time.perf_counter()
+    for _ in extract_frames(video, seconds_per_frame=interval, backend=backend):
+        now = time.perf_counter()
+        latencies.append((now - last) * 1000)
+        last = now
+    return _result("extract", {"backend": backend, "interval": interval}, len(latencies), "frames",
+                   time.perf_counter() - start, latencies)
+
+def bench_preprocess(video: str, batch_size: int = 32, batches: int = 20, **_) -> dict:
+    """Batched CLIP preprocessing (resize, crop, normalize) without the model"""
+    from embedding.preprocess import preprocess_frames
+
+    frames = [frame for frame, _ in _decoded_frames(video, batch_size)]
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(batches):
+        t = time.perf_counter()
+        preprocess_frames(frames)
+        latencies.append((time.perf_counter() - t) * 1000)
+    return _result("preprocess", {"batch_size": batch_size}, batches * len(frames), "frames",
+                   time.perf_counter() - start, latencies)
+
+def bench_embed(video: str, batch_size: int = 32, batches: int = 10, fake: bool = False, **_) -> dict:
+    """get_frame_embeddings per batch (preprocessing included), or the fake encoder"""
+    if fake:
+        embed = fakes.fake_frame_embeddings
+    else:
+        from embedding.frame_embedding import get_frame_embeddings
+        from embedding.frame_cache import frame_cache
+        embed = get_frame_embeddings
+
+    frames = _decoded_frames(video, batch_size)
+    embed(frames[:1])  # model load and first-call overhead stay out of the timings
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(batches):
+        # Every batch repeats the same frames; without this the frame cache would answer them
+        if not fake: frame_cache.clear()
+        t = time.perf_counter()
+        embed(frames)
+        latencies.append((time.perf_counter() - t) * 1000)
+    return _result("embed", {"batch_size": batch_size, "fake": fake}, batches * len(frames), "frames",
+                   time.perf_counter() - start, latencies)
+
+def bench_text_embed(batch_size: int = 16, batches: int = 20, fake: bool = False, **_) -> dict:
+    """get_text_embeddings per batch of transcript-like segments"""
+    if fake:
+        embed = fakes.fake_text_embeddings
+    else:
+        from embedding.text_embedding import get_text_embeddings
+        embed = get_text_embeddings
+
+    segments = [{"text": f"synthetic segment {i} about the quarterly budget and a dog on the beach"}
+                for i in range(batch_size)]
+    embed(segments[:1])
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(batches):
+        t = time.perf_counter()
+        embed(segments)
+        latencies.append((time.perf_counter() - t) * 1000)
+    return _result("text_embed", {"batch_size": batch_size, "fake": fake}, batches * batch_size, "segments",
+                   time.perf_counter() - start, latencies)
+
+def bench_transcribe(video: str, **_) -> dict:
+    """Whisper on the synthetic track; throughput is audio seconds per second"""
+    from ingestion.extract_audio import load_audio_pcm, iter_transcribe, SAMPLE_RATE
+
+    audio = load_audio_pcm(video)
+    latencies = []
+    start = last = time.perf_counter()
+    for _ in iter_transcribe(audio):
+        now = time.perf_counter()
+        latencies.append((now - last) * 1000)
+        last = now
+    result = _result("transcribe", {}, 0, "audio_seconds", time.perf_counter() - start, latencies)
+    result["items"] = round(len(audio) / SAMPLE_RATE, 2)
+    result["throughput"] = round(result["items"] / result["seconds"], 3) if result["seconds"] > 0 else None
+    return result
+
+def bench_insert(rows: int = 20000, batch_size: int = 32, backend: str = "mmap", **_) -> dict:
+    """Bulk frame writes through the index backend, one add_frames call per batch"""
+    chunk = next(synthetic.synthetic_embeddings(rows, 512, chunk_rows=rows))[1]
+    timestamps = np.arange(rows, dtype=np.float64)
+    paths = [f"frames/bench/{i}.jpg" for i in range(rows)]
+
+    if backend == "mmap":
+        from indexing.mmap_index import MmapBackend
+        root = tempfile.mkdtemp(prefix="bench_index_", dir=synthetic.CACHE_DIR if os.path.isdir(synthetic.CACHE_DIR) else None)
+        target, video_id, cleanup = MmapBackend(root), 1, lambda: shutil.rmtree(root, ignore_errors=True)
+    else:
+        from indexing.backends import PgvectorBackend
+        from indexing.insert import connection
+        with connection() as conn:
+            video_id = conn.execute("INSERT INTO videos (title, filepath, status) VALUES ('bench', 'bench', 'completed') "
+                                    "RETURNING id").fetchone()[0]
+
+        def cleanup():
+            with connection() as conn:
+                conn.execute("DELETE FROM frames WHERE video_id = %s", (video_id,))
+                conn.execute("DELETE FROM videos WHERE id = %s", (video_id,))
+        target = PgvectorBackend()
+
+    latencies = []
+    start = time.perf_counter()
+    try:
+        for i in range(0, rows, batch_size):
+            t = time.perf_counter()
+            target.add_frames(video_id, timestamps[i:i + batch_size], paths[i:i + batch_size], chunk[i:i + batch_size])
+            latencies.append((time.perf_counter() - t) * 1000)
+        seconds = time.perf_counter() - start
+    finally:
+        cleanup()
+    return _result("insert", {"backend": backend, "batch_size": batch_size}, rows, "rows", seconds, latencies)
+
+def bench_fuse(candidates: int = 200, repeats: int = 200, **_) -> dict:
+    """fuse_results on query()-shaped candidates"""
+    from benchmarks.bench_fuse import synthetic_results
+    from search_service.search import fuse_results
+
+    results = synthetic_results(candidates)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        t = time.perf_counter()
+        fuse_results(results)
+        latencies.append((time.perf_counter() - t) * 1000)
+    return _result("fuse", {"candidates": candidates}, repeats, "calls", time.perf_counter() - start, latencies)
+
+def bench_search(rows: int = 10000, queries: int = 200, limit: int = 100, embedding_format: str = None, **_) -> dict:
+    """Backend search (frames and text) over synthetic tables of `rows` rows each; index build is not timed"""
+    backend = synthetic.build_mmap_index(rows, embedding_format=embedding_format)
+    frame_queries = synthetic.query_vectors(queries, 512)
+    text_queries = synthetic.query_vectors(queries, 384, seed=2)
+    backend.search(frame_queries[0], text_queries[0], limit=limit)  # page the tables in
+
+    latencies = []
+    start = time.perf_counter()
+    for frame_q, text_q in zip(frame_queries, text_queries):
+        t = time.perf_counter()
+        backend.search(frame_q, text_q, limit=limit)
+        latencies.append((time.perf_counter() - t) * 1000)
+    return _result("search", {"rows": rows, "limit": limit, "format": backend.embedding_format}, queries, "queries",
+                   time.perf_counter() - start, latencies)
+
+def bench_pipeline(video: str, batch_size: int = 32, fake: bool = False, **_) -> dict:
+    """End-to-end ingestion of the synthetic video (needs the database); latency is per indexed frame"""
+    if fake: fakes.install()
+    from core.pipeline import ingestion_options, register_video, ingest_video
+    from core.progress import progress_bus
+    from indexing.insert import connection
+
+    video_id = register_video(video, ingestion_options(frame_batch_size=batch_size), status="processing")
+    start = time.perf_counter()
+    status = ingest_video(video_id)
+    seconds = time.perf_counter() - start
+
+    snapshot = progress_bus.snapshot(video_id) or {}
+    with connection() as conn:
+        for table in ("frames", "text_segments", "jobs"):
+            conn.execute(f"DELETE FROM {table} WHERE video_id = %s", (video_id,))
+        conn.execute("DELETE FROM videos WHERE id = %s", (video_id,))
+
+    frames = snapshot.get("counts", {}).get("frames", 0)
+    result = _result("pipeline", {"batch_size": batch_size, "fake": fake}, frames, "frames", seconds,
+                     [seconds * 1000 / frames] if frames else [])
+    result["status"] = status
+    result["segments"] = snapshot.get("counts", {}).get("segments", 0)
+    return result
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _child(bench: str, kwargs: dict, results):
+    try:
+        result = globals()[f"bench_{bench}"](**kwargs)
+        result["peak_rss_mb"] = _peak_rss_mb()
+    except Exception as e:
+        result = {"bench": bench, "params": {k: v for k, v in kwargs.items() if k != "video"}, "error": str(e)}
+    results.put(result)
+
+def run_isolated(bench: str, kwargs: dict) -> dict:
+    """Runs one benchmark in a fresh process, so peak RSS and warm caches belong to that benchmark alone"""
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_child, args=(bench, kwargs, results))
+    process.start()
+
+    while True:
+        try:
+            result = results.get(timeout=5.0)
+            break
+        except queue.Empty:
+            if process.is_alive(): continue
+            # Killed without reporting (e.g. out of memory, or a crash in native code)
+            try:
+                result = results.get(timeout=1.0)
+            except queue.Empty:
+                result = {"bench": bench, "params": {k: v for k, v in kwargs.items() if k != "video"},
+                          "error": f"benchmark process exited with code {process.exitcode}"}
+            break
+
+    process.join()
+    return result
+
+def _meta(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "fake": args.fake,
+        "index_backend": os.getenv("DEEPSEARCH_INDEX_BACKEND", "pgvector"),
+        "embedding_format": os.getenv("DEEPSEARCH_EMBEDDING_FORMAT"),
+        "args": sys.argv[1:],
+    }
+
+def _key(result: dict) -> str:
+    return json.dumps([result["bench"], result.get("params", {})], sort_keys=True)
+
+def compare(current: list, baseline: list, threshold: float) -> list:
+    """
+    Flags results whose throughput fell, or whose p95 latency rose, by more than threshold (a fraction)
+
+    Return:
+        list: One message per regression
+    """
+    previous = {_key(r): r for r in baseline if "error" not in r}
+    regressions = []
+    for r in current:
+        old = previous.get(_key(r))
+        if old is None or "error" in r: continue
+
+        if old.get("throughput") and r.get("throughput") is not None and r["throughput"] < old["throughput"] * (1 - threshold):
+            regressions.append(f"{r['bench']} {r['params']}: throughput {old['throughput']} -> {r['throughput']} {r['unit']}/s")
+
+        old_p95, new_p95 = old["latency_ms"].get("p95"), r["latency_ms"].get("p95")
+        if old_p95 and new_p95 is not None and new_p95 > old_p95 * (1 + threshold):
+            regressions.append(f"{r['bench']} {r['params']}: p95 {old_p95} -> {new_p95} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible ingestion and search benchmarks with JSON output")
+    parser.add_argument("--benches", default=",".join(DEFAULT_BENCHES),
+                        help=f"Comma-separated subset of {','.join(BENCHES)}, or 'all'")
+    parser.add_argument("--fake", action="store_true", help="Deterministic fake encoders instead of CLIP/MiniLM/Whisper")
+    parser.add_argument("--video-seconds", type=float, default=60.0)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000],
+                        help="Search table sizes, e.g. 10000 1000000 10000000")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--insert-backend", default="mmap", choices=("mmap", "pgvector"))
+    parser.add_argument("--out", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression as a fraction")
+    parser.add_argument("--inline", action="store_true", help="Run in this process (peak RSS then accumulates)")
+    args = parser.parse_args()
+
+    benches = BENCHES if args.benches == "all" else tuple(b.strip() for b in args.benches.split(",") if b.strip())
+    unknown = set(benches) - set(BENCHES)
+    if unknown: parser.error(f"unknown benches {sorted(unknown)}")
+
+    video = synthetic.make_video(seconds=args.video_seconds) if {"extract", "preprocess", "embed", "transcribe", "pipeline"} & set(benches) else None
+
+    from ingestion.extract_frames import FRAME_BACKENDS
+    runs = []
+    for bench in benches:
+        common = {"video": video, "batch_size": args.batch_size, "fake": args.fake}
+        if bench == "extract":
+            runs += [(bench, {**common, "backend": backend}) for backend in FRAME_BACKENDS]
+        elif bench == "search":
+            runs += [(bench, {"rows": rows}) for rows in args.rows]
+        elif bench == "insert":
+            runs.append((bench, {"batch_size": args.batch_size, "backend": args.insert_backend}))
+        elif bench == "transcribe" and args.fake:
+            print("Skipping transcribe: it only measures the real Whisper model", file=sys.stderr)
+        else:
+            runs.append((bench, common))
+
+    results = []
+    for bench, kwargs in runs:
+        print(f"Running {bench} {({k: v for k, v in kwargs.items() if k != 'video'})}...", file=sys.stderr)
+        if args.inline:
+            result = globals()[f"bench_{bench}"](**kwargs)
+            result["peak_rss_mb"] = _peak_rss_mb()
+        else:
+            result = run_isolated(bench, kwargs)
+        results.append(result)
+
+        if "error" in result:
+            print(f"  error: {result['error']}", file=sys.stderr)
+        else:
+            print(f"  {result['throughput']} {result['unit']}/s, p95 {result['latency_ms']['p95']} ms, "
+                  f"peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    report = {"meta": _meta(args), "results": results}
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import shutil
+import subprocess
+import sys
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Generated inputs are reused across runs; delete the directory to rebuild them
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+def make_video(seconds: float = 60.0, width: int = 640, height: int = 360, fps: int = 25, tone_hz: int = 440,
+               cache_dir: str = CACHE_DIR) -> str:
+    """
+    Renders a test video with ffmpeg: the testsrc pattern plus a sine-wave audio track.
+    The same arguments always give the same file, so runs on different commits see identical input
+
+    Args:
+        seconds (float): Duration
+        width (int): Frame width
+        height (int): Frame height
+        fps (int): Frame rate
+        tone_hz (int): Sine frequency of the audio track
+        cache_dir (str): Where videos are written and reused from
+
+    Return:
+        str: Path to the .mp4
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is required to generate synthetic videos")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"testsrc_{seconds:g}s_{width}x{height}_{fps}fps_{tone_hz}hz.mp4")
+    if os.path.exists(path): return path
+
+    command = ["ffmpeg", "-v", "error", "-y",
+               "-f", "lavfi", "-i", f"testsrc=duration={seconds}:size={width}x{height}:rate={fps}",
+               "-f", "lavfi", "-i", f"sine=frequency={tone_hz}:duration={seconds}:sample_rate=44100",
+               "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", str(fps * 2),
+               "-c:a", "aac", "-shortest", path + ".tmp.mp4"]
+    subprocess.run(command, check=True)
+    os.replace(path + ".tmp.mp4", path)
+    return path
+
+def synthetic_embeddings(rows: int, dim: int, seed: int = 0, clusters: int = 256, chunk_rows: int = 262144):
+    """
+    Yields unit-norm float32 embeddings in chunks. Rows are drawn around random
+    cluster centers, which gives ANN indexes and quantizers realistic structure.
+    Each chunk has its own seed, so output doesn't depend on chunk_rows
+
+    Args:
+        rows (int): Total rows
+        dim (int): Embedding width
+        seed (int): RNG seed
+        clusters (int): Number of cluster centers
+        chunk_rows (int): Rows per yielded chunk; bounds memory for 10M-row tables
+
+    Return:
+        generator: (first_row, np.ndarray of shape (n, dim)) tuples
+    """
+    centers = np.random.default_rng(seed).standard_normal((clusters, dim)).astype(np.float32)
+
+    for first in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - first)
+        rng = np.random.default_rng((seed, first))
+        chunk = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+        chunk /= np.linalg.norm(chunk, axis=1, keepdims=True)
+        yield first, chunk
+
+def query_vectors(count: int, dim: int, seed: int = 1) -> np.ndarray:
+    """Unit-norm queries drawn like the table rows, but from a different seed"""
+    return next(synthetic_embeddings(count, dim, seed=seed, chunk_rows=max(count, 1)))[1]
+
+def build_mmap_index(rows: int, embedding_format: str = None, seed: int = 0, cache_dir: str = CACHE_DIR):
+    """
+    Builds (or reopens) an mmap index with `rows` frames and `rows` transcript segments
+
+    Args:
+        rows (int): Rows per table, e.g. 10_000, 1_000_000 or 10_000_000
+        embedding_format (str, optional): Storage format (float32, halfvec, int8, binary)
+        seed (int): RNG seed for the table contents
+        cache_dir (str): Parent directory of cached indexes
+
+    Return:
+        MmapBackend: Backend over the synthetic tables
+    """
+    from indexing.mmap_index import MmapBackend
+    from indexing.quantization import get_embedding_format
+
+    embedding_format = get_embedding_format(embedding_format)
+    root = os.path.join(cache_dir, f"index_{rows}_{embedding_format}_{seed}")
+    done_marker = os.path.join(root, "COMPLETE")
+
+    if os.path.exists(done_marker):
+        return MmapBackend(root, embedding_format=embedding_format)
+
+    shutil.rmtree(root, ignore_errors=True)
+    backend = MmapBackend(root, embedding_format=embedding_format)
+
+    # One segment per chunk, like a long video written batch by batch before finalize
+    for first, chunk in synthetic_embeddings(rows, 512, seed=seed):
+        timestamps = np.arange(first, first + len(chunk), dtype=np.float64)
+        backend.add_frames(1, timestamps, [f"frames/bench/{i}.jpg" for i in range(first, first + len(chunk))], chunk)
+
+    for first, chunk in synthetic_embeddings(rows, 384, seed=seed + 1):
+        starts = np.arange(first, first + len(chunk), dtype=np.float64) * 3.0
+        backend.add_text_segments(1, starts, starts + 3.0, [f"segment {i}" for i in range(first, first + len(chunk))], chunk)
+
+    open(done_marker, "w").close()
+    return backend
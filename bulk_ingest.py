@@ -0,0 +1,247 @@
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v")
+
+def find_videos(directory: str = None, manifest: str = None) -> list:
+    """
+    Lists the videos to index
+
+    Args:
+        directory (str, optional): Walked recursively for files with a video extension
+        manifest (str, optional): Text file with one path per line ('#' starts a comment)
+
+    Return:
+        list: Absolute paths, sorted and without duplicates
+    """
+    paths = []
+    if directory:
+        for root, _, files in os.walk(directory):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS))
+
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line: paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+
+    return sorted({os.path.abspath(path) for path in paths})
+
+def indexed_state(paths: list) -> dict:
+    """Latest videos row per file path: {path: (video_id, status)}"""
+    from indexing.insert import connection
+
+    with connection() as conn:
+        rows = conn.execute("SELECT id, filepath, status FROM videos WHERE filepath = ANY(%s) ORDER BY id",
+                            (paths,)).fetchall()
+    return {filepath: (video_id, status) for video_id, filepath, status in rows}
+
+def plan_tasks(paths: list) -> tuple:
+    """
+    Splits files into work and skips. Completed files are skipped and interrupted
+    ones continue from their checkpoint. Registering either again would leave a
+    second row with its own copy of the frames and segments
+
+    Return:
+        tuple: (tasks as (path, video_id or None), skipped paths)
+    """
+    state = indexed_state(paths)
+    tasks, skipped = [], []
+    for path in paths:
+        video_id, status = state.get(path, (None, None))
+        if status == "completed":
+            skipped.append(path)
+        else:
+            tasks.append((path, video_id))
+    return tasks, skipped
+
+def shard_tasks(tasks: list, shards: int) -> list:
+    """Greedy size-balanced split: largest files first, each to the lightest shard"""
+    buckets = [[] for _ in range(shards)]
+    loads = [0] * shards
+    for task in sorted(tasks, key=lambda t: os.path.getsize(t[0]) if os.path.exists(t[0]) else 0, reverse=True):
+        i = loads.index(min(loads))
+        buckets[i].append(task)
+        loads[i] += os.path.getsize(task[0]) if os.path.exists(task[0]) else 0
+    return buckets
+
+def _pin(threads: int, cores: list):
+    # Thread pools size themselves on import, so this runs before torch/CTranslate2 load
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError as e:
+            print(f"Affinity Warning: {e}")
+
+def _run_shard(shard: int, tasks: list, threads: int, cores: list, options: dict, results):
+    """Worker process: loads the models once, then indexes its files one after another"""
+    _pin(threads, cores)
+
+    import cv2
+    from core.pipeline import ingestion_options, register_video, ingest_video
+    from core.progress import progress_bus
+    from embedding.models import warm_models
+    from ingestion.extract_audio import get_whisper
+    from indexing.insert import open_pool
+
+    open_pool(min_size=1)
+    options = ingestion_options(**options, torch_threads=threads, whisper_threads=threads)
+
+    load_start = time.perf_counter()
+    warm_models(background=False)
+    get_whisper(cpu_threads=threads)
+    print(f"[shard {shard}] models loaded in {time.perf_counter() - load_start:.1f}s, {len(tasks)} videos, "
+          f"{threads} threads on cores {cores or 'any'}")
+
+    for path, video_id in tasks:
+        start = time.perf_counter()
+        try:
+            if video_id is None:
+                video_id = register_video(path, options, status="processing")
+            status = ingest_video(video_id) or "completed"
+            error = None
+        except Exception as e:
+            status, error = "failed", str(e)
+
+        snapshot = (progress_bus.snapshot(video_id) if video_id is not None else None) or {}
+        progress_bus.forget(video_id)
+
+        audio_seconds = 0.0
+        if status == "completed":
+            vid = cv2.VideoCapture(path)
+            fps = vid.get(cv2.CAP_PROP_FPS) or 24
+            audio_seconds = vid.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+            vid.release()
+        results.put({
+            "shard": shard,
+            "path": path,
+            "video_id": video_id,
+            "status": status,
+            "error": error or snapshot.get("error"),
+            "frames": snapshot.get("counts", {}).get("frames", 0),
+            "segments": snapshot.get("counts", {}).get("segments", 0),
+            "frame_cache": snapshot.get("frame_cache", {"hits": 0, "misses": 0, "hit_rate": 0.0}),
+            "audio_seconds": audio_seconds,
+            "seconds": time.perf_counter() - start,
+        })
+
+def print_summary(results: list, wall_seconds: float):
+    """Aggregate throughput across all shards, against wall-clock time"""
+    done = [r for r in results if r["status"] == "completed"]
+    frames = sum(r["frames"] for r in results)
+    segments = sum(r["segments"] for r in results)
+    audio_seconds = sum(r["audio_seconds"] for r in done)
+    wall = max(wall_seconds, 1e-9)
+
+    print()
+    print(f"{'videos':<18} {len(done)} completed, {len(results) - len(done)} failed")
+    print(f"{'wall time':<18} {wall_seconds:.1f}s")
+    print(f"{'videos/hour':<18} {len(done) / wall * 3600:.1f}")
+    print(f"{'frames/sec':<18} {frames / wall:.1f} ({frames} frames)")
+    print(f"{'segments/sec':<18} {segments / wall:.1f} ({segments} segments)")
+    print(f"{'audio-seconds/sec':<18} {audio_seconds / wall:.1f} ({audio_seconds / 3600:.2f}h of audio)")
+
+    # Shared footage (intros, re-cuts) is only embedded once per worker
+    hits = sum(r["frame_cache"]["hits"] for r in results)
+    lookups = hits + sum(r["frame_cache"]["misses"] for r in results)
+    print(f"{'frame cache hits':<18} {hits / lookups if lookups else 0.0:.1%} ({hits} of {lookups} frames)")
+
+    for r in results:
+        if r["status"] != "completed":
+            print(f"  {r['status']}: {r['path']} ({r['error']})")
+
+def main():
+    from ingestion.extract_frames import FRAME_BACKENDS
+    from ingestion.frame_filter import FRAME_FILTERS
+
+    parser = argparse.ArgumentParser(description="Index a directory or manifest of videos with parallel worker processes")
+    parser.add_argument("directory", nargs="?", help="Directory to walk for videos")
+    parser.add_argument("--manifest", help="File listing one video path per line")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes, each with its own models")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per worker (default: cores / workers)")
+    parser.add_argument("--no-pin", action="store_true", help="Don't pin workers to disjoint cores")
+    parser.add_argument("--resume", action="store_true",
+                        help="No-op: indexed files are always skipped and interrupted ones resumed")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan and exit")
+    parser.add_argument("--frame-interval", type=float, default=1.0)
+    parser.add_argument("--frame-backend", default="grab", choices=FRAME_BACKENDS)
+    parser.add_argument("--frame-filter", default=None, choices=FRAME_FILTERS)
+    parser.add_argument("--batch-size", type=int, default=None, help="Frames per CLIP batch (default: from free memory)")
+    args = parser.parse_args()
+
+    if not args.directory and not args.manifest:
+        parser.error("give a directory, --manifest, or both")
+
+    paths = find_videos(args.directory, args.manifest)
+    tasks, skipped = plan_tasks(paths)
+    workers = max(1, min(args.workers, len(tasks)))
+
+    # Disjoint core ranges, so workers don't contend for the same cores
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    threads = args.threads or max(1, len(cores) // workers)
+    core_sets = [[] for _ in range(workers)]
+    if not args.no_pin and len(cores) >= workers * threads:
+        core_sets = [cores[i * threads:(i + 1) * threads] for i in range(workers)]
+
+    shards = shard_tasks(tasks, workers)
+
+    resumed = sum(1 for _, video_id in tasks if video_id is not None)
+    print(f"{len(paths)} videos found: {len(tasks) - resumed} new, {resumed} to resume, {len(skipped)} already indexed")
+    print(f"{workers} workers x {threads} threads")
+
+    if args.dry_run:
+        for i, shard in enumerate(shards):
+            size = sum(os.path.getsize(path) for path, _ in shard if os.path.exists(path))
+            print(f"[shard {i}] {len(shard)} videos, {size / 1e9:.2f} GB, cores {core_sets[i] or 'any'}")
+            for path, video_id in shard:
+                print(f"    {'resume ' + str(video_id) if video_id else 'new'}: {path}")
+        return
+
+    if not tasks:
+        print("Nothing to do")
+        return
+
+    options = {"frame_interval": args.frame_interval, "frame_backend": args.frame_backend,
+               "frame_filter": args.frame_filter, "frame_batch_size": args.batch_size,
+               "embed_workers": 1, "writer_workers": 2}
+
+    # spawn: each worker imports torch fresh, after its thread limits are set
+    ctx = mp.get_context("spawn")
+    results_queue = ctx.Queue()
+    processes = [ctx.Process(target=_run_shard, name=f"bulk-shard-{i}",
+                             args=(i, shard, threads, core_sets[i], options, results_queue))
+                 for i, shard in enumerate(shards) if shard]
+
+    start = time.perf_counter()
+    for process in processes: process.start()
+
+    results = []
+    while len(results) < len(tasks):
+        try:
+            result = results_queue.get(timeout=5.0)
+        except queue.Empty:
+            # A shard that died (e.g. out of memory) won't report its remaining videos
+            if not any(process.is_alive() for process in processes): break
+            continue
+
+        results.append(result)
+        print(f"[{len(results)}/{len(tasks)}] {result['status']} in {result['seconds']:.0f}s "
+              f"(frame cache {result['frame_cache']['hit_rate']:.0%}): {result['path']}")
+
+    for process in processes: process.join()
+    if len(results) < len(tasks):
+        print(f"{len(tasks) - len(results)} videos were not reported; rerun to pick them up")
+    print_summary(results, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
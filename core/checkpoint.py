@@ -0,0 +1,77 @@
+import json
+import threading
+from indexing.insert import connection
+
+# Durable per-video progress, stored on the videos row (see database_setup.py)
+CHECKPOINT_COLUMNS = ("transcript_done", "transcript_end", "last_frame_ts", "frames_done", "last_batch")
+
+def load_checkpoint(video_id: int) -> dict:
+    """
+    Reads a video's ingestion state
+
+    Return:
+        dict: filepath, title, status, options (the original pipeline arguments) and
+        the checkpoint columns, or None if the video doesn't exist
+    """
+    with connection() as conn:
+        row = conn.execute(
+            f"SELECT filepath, title, status, options, {', '.join(CHECKPOINT_COLUMNS)} FROM videos WHERE id = %s",
+            (video_id,),
+        ).fetchone()
+
+    if row is None: return None
+
+    checkpoint = dict(zip(("filepath", "title", "status", "options") + CHECKPOINT_COLUMNS, row))
+    if isinstance(checkpoint["options"], str):
+        checkpoint["options"] = json.loads(checkpoint["options"])
+    checkpoint["options"] = checkpoint["options"] or {}
+    return checkpoint
+
+def save_checkpoint(video_id: int, **fields):
+    """Updates checkpoint columns, e.g. save_checkpoint(7, transcript_end=93.2)"""
+    unknown = set(fields) - set(CHECKPOINT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown checkpoint fields {sorted(unknown)}")
+
+    assignments = ", ".join(f"{name} = %s" for name in fields)
+    with connection() as conn:
+        conn.execute(f"UPDATE videos SET {assignments} WHERE id = %s", (*fields.values(), video_id))
+
+class FrameWatermark:
+    """
+    Tracks frame batches that writer threads commit out of order and reports the
+    contiguous prefix that is safely stored. Only that prefix is checkpointed, so a
+    resume never skips a batch that was still in flight
+    """
+
+    def __init__(self, frames_done: int = 0, last_frame_ts: float = None, batches_done: int = 0):
+        self.frames_done = frames_done
+        self.last_frame_ts = last_frame_ts
+        self.batches_done = batches_done
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def commit(self, first_idx: int, count: int, last_ts: float, on_advance=None):
+        """
+        Marks frames [first_idx, first_idx + count) as stored
+
+        Args:
+            first_idx (int): Index of the batch's first frame
+            count (int): Frames in the batch
+            last_ts (float): End of the span the batch's last frame covers
+            on_advance (callable, optional): Called with (frames_done, last_frame_ts, batches_done)
+                under the lock when the contiguous prefix grows, so checkpoints are saved in order
+        """
+        with self._lock:
+            self._pending[first_idx] = (count, last_ts)
+
+            advanced = False
+            while self.frames_done in self._pending:
+                count, last_ts = self._pending.pop(self.frames_done)
+                self.frames_done += count
+                self.last_frame_ts = last_ts
+                self.batches_done += 1
+                advanced = True
+
+            if advanced and on_advance is not None:
+                on_advance(self.frames_done, self.last_frame_ts, self.batches_done)
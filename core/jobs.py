@@ -0,0 +1,173 @@
+import json
+from indexing.insert import connection
+
+# Job lifecycle: queued -> running -> completed | failed | cancelled
+JOB_STATUSES = ("queued", "running", "completed", "failed", "cancelled")
+
+JOB_COLUMNS = ("id", "video_id", "status", "priority", "worker", "error", "cancel_requested",
+               "created_at", "started_at", "finished_at", "stats", "crashes")
+
+def _job_dict(row) -> dict:
+    job = dict(zip(JOB_COLUMNS, row))
+    for name in ("created_at", "started_at", "finished_at"):
+        if job[name] is not None: job[name] = job[name].isoformat()
+    return job
+
+def enqueue_job(video_id: int, priority: int = 0) -> int:
+    """
+    Queues a video for ingestion by the worker pool
+
+    Args:
+        video_id (int): Registered video to index (or resume, if it has a checkpoint)
+        priority (int): Higher runs first; equal priorities run in submission order
+
+    Return:
+        int: Job id
+    """
+    with connection() as conn:
+        return insert_job(conn, video_id, priority)
+
+def insert_job(conn, video_id: int, priority: int = 0) -> int:
+    """enqueue_job() inside the caller's transaction, e.g. the one registering the video"""
+    return conn.execute(
+        "INSERT INTO jobs (video_id, status, priority) VALUES (%s, 'queued', %s) RETURNING id",
+        (video_id, priority),
+    ).fetchone()[0]
+
+def claim_job(worker: str) -> tuple:
+    """
+    Takes the next queued job for a worker. SKIP LOCKED lets workers claim in
+    parallel without blocking on, or double-claiming, each other's rows
+
+    Return:
+        tuple: (job_id, video_id), or None when the queue is empty
+    """
+    with connection() as conn:
+        return conn.execute("""
+            UPDATE jobs SET status = 'running', worker = %s, started_at = now()
+            WHERE id = (
+                SELECT id FROM jobs WHERE status = 'queued'
+                ORDER BY priority DESC, id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1)
+            RETURNING id, video_id
+        """, (worker,)).fetchone()
+
+def finish_job(job_id: int, status: str, error: str = None, stats: dict = None):
+    """stats is kept on the job row, e.g. {"frame_cache": {"hits", "misses", "hit_rate"}}"""
+    with connection() as conn:
+        conn.execute("UPDATE jobs SET status = %s, error = %s, stats = %s, finished_at = now() WHERE id = %s",
+                     (status, error, json.dumps(stats) if stats is not None else None, job_id))
+
+def release_worker_jobs(worker: str, error: str, max_crashes: int = 2) -> list:
+    """
+    Hands back the jobs of a worker process that died mid-job. Each is requeued to
+    resume from its checkpoint, or failed once it has taken down max_crashes workers
+
+    Args:
+        worker (str): Name of the dead worker
+        error (str): Stored on jobs that are failed
+        max_crashes (int): Worker deaths a job may cause before it is failed
+
+    Return:
+        list: (job_id, video_id, status) of every released job
+    """
+    with connection() as conn:
+        rows = conn.execute("""
+            UPDATE jobs SET
+                crashes = crashes + 1,
+                status = CASE WHEN cancel_requested THEN 'cancelled'
+                              WHEN crashes + 1 >= %(max)s THEN 'failed'
+                              ELSE 'queued' END,
+                error = CASE WHEN cancel_requested OR crashes + 1 < %(max)s THEN error ELSE %(error)s END,
+                worker = CASE WHEN cancel_requested OR crashes + 1 >= %(max)s THEN worker END,
+                started_at = CASE WHEN cancel_requested OR crashes + 1 >= %(max)s THEN started_at END,
+                finished_at = CASE WHEN cancel_requested OR crashes + 1 >= %(max)s THEN now() END
+            WHERE worker = %(worker)s AND status = 'running'
+            RETURNING id, video_id, status
+        """, {"worker": worker, "error": error, "max": max_crashes}).fetchall()
+
+        # Requeued videos stay 'processing'; the others get the job's final status
+        for _, video_id, status in rows:
+            if status != "queued":
+                conn.execute("UPDATE videos SET status = %s WHERE id = %s", (status, video_id))
+    return rows
+
+def cancel_job(job_id: int) -> str:
+    """
+    Cancels a queued job outright, or asks the worker running it to stop
+
+    Return:
+        str: The job's status afterwards, or None if the job doesn't exist
+    """
+    with connection() as conn:
+        row = conn.execute("""
+            UPDATE jobs SET
+                cancel_requested = TRUE,
+                status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                finished_at = CASE WHEN status = 'queued' THEN now() ELSE finished_at END
+            WHERE id = %s
+            RETURNING status
+        """, (job_id,)).fetchone()
+
+        # A queued video never started, so nothing will update its status otherwise
+        if row is not None and row[0] == "cancelled":
+            conn.execute("UPDATE videos SET status = 'cancelled' WHERE id = (SELECT video_id FROM jobs WHERE id = %s) "
+                         "AND status = 'queued'", (job_id,))
+    return row[0] if row is not None else None
+
+def cancel_requested(job_id: int) -> bool:
+    """True once the job is cancelled, or deleted altogether (e.g. by /reset)"""
+    with connection() as conn:
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = %s", (job_id,)).fetchone()
+    return row is None or bool(row[0])
+
+def get_job(job_id: int) -> dict:
+    with connection() as conn:
+        row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = %s", (job_id,)).fetchone()
+    return _job_dict(row) if row is not None else None
+
+def list_jobs(status: str = None, limit: int = 100) -> list:
+    """Most recent jobs first, optionally only one status"""
+    sql = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs "
+    params = []
+    if status is not None:
+        sql += "WHERE status = %s "
+        params.append(status)
+    sql += "ORDER BY id DESC LIMIT %s"
+    params.append(limit)
+
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [_job_dict(row) for row in rows]
+
+def active_job(video_id: int) -> int:
+    """Id of the video's queued or running job, if any"""
+    with connection() as conn:
+        row = conn.execute("SELECT id FROM jobs WHERE video_id = %s AND status IN ('queued', 'running') "
+                           "ORDER BY id DESC LIMIT 1", (video_id,)).fetchone()
+    return row[0] if row is not None else None
+
+def recover_jobs() -> list:
+    """
+    Requeues work lost with a previous server process: jobs left 'running', and
+    videos left 'processing' or 'queued' without a job (e.g. from before the queue
+    existed). They pick up from their ingestion checkpoints
+
+    Return:
+        list: Requeued job ids
+    """
+    with connection() as conn:
+        requeued = [row[0] for row in conn.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL WHERE status = 'running' RETURNING id"
+        ).fetchall()]
+
+        orphans = conn.execute("""
+            SELECT v.id FROM videos v
+            WHERE v.status IN ('processing', 'queued')
+              AND NOT EXISTS (SELECT 1 FROM jobs j WHERE j.video_id = v.id AND j.status IN ('queued', 'running'))
+            ORDER BY v.id
+        """).fetchall()
+
+    # Queued after the requeue commits, so the orphans line up behind the interrupted jobs
+    return requeued + [enqueue_job(row[0]) for row in orphans]
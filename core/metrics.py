@@ -0,0 +1,313 @@
+import contextvars
+import os
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond SQL to multi-second Whisper chunks
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    "deepsearch_stage_seconds": ("histogram", "Time per call of an instrumented stage"),
+    "deepsearch_stage_items_total": ("counter", "Items handled by a stage (frames, rows, segments, queries, candidates)"),
+    "deepsearch_stage_bytes_total": ("counter", "Bytes handled by a stage"),
+    "deepsearch_http_request_seconds": ("histogram", "HTTP request latency by route"),
+    "deepsearch_frame_cache_total": ("counter", "Frame embedding cache lookups by result (hit, miss)"),
+    "deepsearch_query_batch_size": ("histogram", "Distinct queries per micro-batched encoder call"),
+    "deepsearch_query_queue_wait_seconds": ("histogram", "Time a query waited for its micro-batch to start"),
+}
+
+# Histograms that don't measure seconds
+METRIC_BUCKETS = {
+    "deepsearch_query_batch_size": (1, 2, 4, 8, 16, 32, 64),
+}
+
+class Registry:
+    """
+    Prometheus-style histograms and counters keyed by metric name and label set.
+    Worker processes drain() theirs and the API merge()s the deltas, so /metrics
+    covers ingestion that runs outside the web process
+    """
+
+    def __init__(self, buckets: tuple = SECONDS_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _buckets(self, name: str) -> tuple:
+        return METRIC_BUCKETS.get(name, self.buckets)
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._buckets(name)
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                # Per-bucket counts (+Inf last), then sum and count
+                hist = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            hist[index] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not amount: return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def drain(self) -> dict:
+        """Takes everything recorded so far and resets; returns a picklable delta for merge()"""
+        with self._lock:
+            delta = {"histograms": self._histograms, "counters": self._counters}
+            self._histograms, self._counters = {}, {}
+        return delta
+
+    def merge(self, delta: dict):
+        with self._lock:
+            for key, values in delta["histograms"].items():
+                hist = self._histograms.setdefault(key, [0] * (len(self._buckets(key[0])) + 1) + [0.0, 0])
+                for i, v in enumerate(values):
+                    hist[i] += v
+            for key, value in delta["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            counters = dict(self._counters)
+
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs: return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        for metric in sorted({name for name, _ in histograms} | {name for name, _ in counters}):
+            kind, help_text = METRIC_HELP.get(metric, ("untyped", metric))
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric: lines.append(f"{metric}{fmt_labels(labels)} {value}")
+
+            for (name, labels), values in sorted(histograms.items()):
+                if name != metric: continue
+                cumulative = 0
+                for bound, count in zip(self._buckets(metric) + ("+Inf",), values[:-2]):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{fmt_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_sum{fmt_labels(labels)} {values[-2]}")
+                lines.append(f"{metric}_count{fmt_labels(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+class Trace:
+    """Spans of one sampled request or ingestion job, kept in an OpenTelemetry-like shape"""
+
+    def __init__(self, name: str, attributes: dict, max_spans: int):
+        self.trace_id = secrets.token_hex(16)
+        self.root_id = secrets.token_hex(8)
+        self.name = name
+        self.attributes = attributes
+        self.max_spans = max_spans
+        self.start_ns = time.time_ns()
+        self.duration_ms = None
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, span_id: str, parent_id: str, name: str, start_ns: int, seconds: float, attributes: dict):
+        with self._lock:
+            # Long jobs emit a span per batch; past the cap only the histograms keep counting
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return
+            self.spans.append({"span_id": span_id, "parent_span_id": parent_id, "name": name,
+                               "start_unix_nano": start_ns, "duration_ms": round(seconds * 1000, 3),
+                               "attributes": attributes})
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {"trace_id": self.trace_id, "span_id": self.root_id, "name": self.name,
+                "start_unix_nano": self.start_ns, "duration_ms": self.duration_ms,
+                "attributes": self.attributes, "spans": spans, "dropped_spans": self.dropped}
+
+# (trace, parent span id) of the sampled trace this code runs under, or None
+_current = contextvars.ContextVar("deepsearch_trace", default=None)
+
+# Finished traces, newest last; also handed to forwarders (e.g. from a worker to the API)
+_recent = deque(maxlen=int(os.getenv("DEEPSEARCH_TRACE_KEEP", 100)))
+_trace_forwarders = []
+
+def trace_sample_rate() -> float:
+    """Share of requests and jobs traced, from $DEEPSEARCH_TRACE_SAMPLE (default 0: tracing off)"""
+    return float(os.getenv("DEEPSEARCH_TRACE_SAMPLE", 0.0))
+
+def add_trace_forwarder(fn):
+    """fn(trace_dict) is called for every finished trace"""
+    _trace_forwarders.append(fn)
+
+def record_trace(trace: dict):
+    """Stores a finished trace (e.g. one forwarded from a worker process) for /traces"""
+    _recent.append(trace)
+
+def recent_traces(limit: int = 20) -> list:
+    return list(_recent)[-limit:][::-1]
+
+class Span:
+    """Handle yielded by span(); add() counts items and bytes as they become known"""
+    __slots__ = ("items", "nbytes", "attributes")
+
+    def __init__(self, items: int, nbytes: int, attributes: dict):
+        self.items = items
+        self.nbytes = nbytes
+        self.attributes = attributes
+
+    def add(self, items: int = 0, nbytes: int = 0, **attributes):
+        self.items += items
+        self.nbytes += nbytes
+        self.attributes.update(attributes)
+
+def observe(stage: str, seconds: float, items: int = 0, nbytes: int = 0, **attributes):
+    """
+    Records one timed call of a stage, for code that can't wrap a `with span(...)`
+    (e.g. time spent inside a generator). Adds a span ending now to a sampled trace
+    """
+    registry.observe("deepsearch_stage_seconds", seconds, stage=stage)
+    registry.inc("deepsearch_stage_items_total", items, stage=stage)
+    registry.inc("deepsearch_stage_bytes_total", nbytes, stage=stage)
+
+    current = _current.get()
+    if current is not None:
+        trace, parent_id = current
+        trace.add(secrets.token_hex(8), parent_id, stage, time.time_ns() - int(seconds * 1e9), seconds,
+                  {**attributes, "items": items, "bytes": nbytes})
+
+@contextmanager
+def span(stage: str, items: int = 0, nbytes: int = 0, **attributes):
+    """
+    Times a stage into deepsearch_stage_seconds{stage=...} and adds its items/bytes
+    to the stage counters. Inside a sampled trace it also becomes a child span.
+    Unsampled calls cost two clock reads and a histogram update
+
+    Args:
+        stage (str): Stage name, e.g. "clip_forward"
+        items (int): Items handled, if known up front
+        nbytes (int): Bytes handled, if known up front
+        **attributes: Extra span attributes (only kept in traces)
+    """
+    handle = Span(items, nbytes, attributes)
+    current = _current.get()
+    token = span_id = None
+    if current is not None:
+        span_id = secrets.token_hex(8)
+        token = _current.set((current[0], span_id))
+
+    start_ns = time.time_ns() if current is not None else 0
+    start = time.perf_counter()
+    try:
+        yield handle
+    except BaseException:
+        handle.attributes["error"] = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe("deepsearch_stage_seconds", seconds, stage=stage)
+        registry.inc("deepsearch_stage_items_total", handle.items, stage=stage)
+        registry.inc("deepsearch_stage_bytes_total", handle.nbytes, stage=stage)
+
+        if current is not None:
+            _current.reset(token)
+            current[0].add(span_id, current[1], stage, start_ns, seconds,
+                           {**handle.attributes, "items": handle.items, "bytes": handle.nbytes})
+
+@contextmanager
+def trace(name: str, sample_rate: float = None, **attributes):
+    """
+    Starts a trace for a request or ingestion job, if sampled. Spans opened below it,
+    including on threads started through bind_context(), are collected into it.
+    Nested inside another trace, it is just a span
+
+    Args:
+        name (str): Root span name, e.g. "GET /search" or "ingest"
+        sample_rate (float, optional): Probability of tracing. Defaults to trace_sample_rate()
+        **attributes: Root span attributes
+    """
+    if _current.get() is not None:
+        with span(name, **attributes) as handle:
+            yield handle
+        return
+
+    rate = trace_sample_rate() if sample_rate is None else sample_rate
+    if rate <= 0 or random.random() >= rate:
+        yield None
+        return
+
+    current = Trace(name, attributes, max_spans=int(os.getenv("DEEPSEARCH_TRACE_MAX_SPANS", 1000)))
+    token = _current.set((current, current.root_id))
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        _current.reset(token)
+        _finish(current)
+
+def _finish(current: Trace):
+    finished = current.as_dict()
+    record_trace(finished)
+
+    if os.getenv("DEEPSEARCH_TRACE_EXPORT") == "otel":
+        _export_otel(finished)
+
+    for fn in list(_trace_forwarders):
+        try:
+            fn(finished)
+        except Exception as e:
+            print(f"Trace Forwarder Warning: {e}")
+
+def _export_otel(finished: dict):
+    # Optional: replays the trace through the OpenTelemetry API; the app configures the SDK/exporter
+    try:
+        from opentelemetry import trace as otel_trace
+    except ImportError:
+        return
+
+    def clean(attributes):
+        return {k: v for k, v in attributes.items() if isinstance(v, (str, bool, int, float))}
+
+    tracer = otel_trace.get_tracer("deepsearch")
+    root = tracer.start_span(finished["name"], start_time=finished["start_unix_nano"],
+                             attributes=clean(finished["attributes"]))
+    opened = {finished["span_id"]: root}
+    ends = []
+    for s in sorted(finished["spans"], key=lambda s: s["start_unix_nano"]):
+        parent = opened.get(s["parent_span_id"], root)
+        child = tracer.start_span(s["name"], context=otel_trace.set_span_in_context(parent),
+                                  start_time=s["start_unix_nano"], attributes=clean(s["attributes"]))
+        opened[s["span_id"]] = child
+        ends.append((child, s["start_unix_nano"] + int(s["duration_ms"] * 1e6)))
+
+    for child, end_ns in reversed(ends):
+        child.end(end_time=end_ns)
+    root.end(end_time=finished["start_unix_nano"] + int(finished["duration_ms"] * 1e6))
+
+def bind_context(fn):
+    """
+    Wraps fn to run in a copy of the caller's context, so a thread or pool task
+    records its spans into the caller's trace. Wrap once per thread or task
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def render_prometheus() -> str:
+    return registry.render()
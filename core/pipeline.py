@@ -1,134 +1,482 @@
 import os
 import cv2
-import shutil
-from ingestion.extract_audio import extract_audio, transcribe_audio
+import json
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ingestion.extract_audio import load_audio_pcm, iter_transcribe, SAMPLE_RATE
 from ingestion.extract_frames import extract_frames
+from ingestion.frame_filter import filter_frames
 from embedding.frame_embedding import get_frame_embeddings
+from embedding.frame_cache import FrameCacheStats
 from embedding.text_embedding import get_text_embeddings
-from indexing.insert import get_connection, insert_video, insert_text_segment, insert_frame
+from embedding.models import get_clip
+from embedding.preprocess import adaptive_batch_size
+from indexing.insert import connection
+from indexing.backends import get_backend
+from indexing.thumbnails import ThumbnailWriter
+from core.stages import run_frame_stages, print_stage_stats
+from core.progress import progress_bus
+from core.checkpoint import FrameWatermark, load_checkpoint, save_checkpoint
+from core.jobs import insert_job
+from core import metrics
+from search_service.cache import invalidate_results
 
 def update_progress(video_id, progress):
     """Helper to update DB progress without crashing"""
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("UPDATE videos SET progress = %s WHERE id = %s", (progress, video_id))
-        conn.commit()
-        conn.close()
+        with connection() as conn:
+            conn.execute("UPDATE videos SET progress = %s WHERE id = %s", (progress, video_id))
     except Exception as e:
         print(f"Progress Update Warning: {e}")
 
-def run_ingestion_pipeline(video_path: str, frame_interval: float = 1.0):
-    filename = os.path.basename(video_path)
-    print(f"🚀 Starting pipeline for: {filename}")
-    
-    conn = get_connection()
-    cur = conn.cursor()
-
-    # 1. WIPE OLD DATA (Utility Mode)
-    cur.execute("TRUNCATE TABLE videos, frames, text_segments RESTART IDENTITY CASCADE;")
-    conn.commit()
-    
-    # Clear physical folders
-    if os.path.exists("frames"): shutil.rmtree("frames")
-    os.makedirs("frames", exist_ok=True)
-
-    # 2. REGISTER VIDEO
-    cur.execute(
-        "INSERT INTO videos (title, filepath, status, progress) VALUES (%s, %s, 'processing', 0) RETURNING id",
-        (filename, video_path)
-    )
-    video_id = cur.fetchone()[0]
-    conn.commit()
-    conn.close() # Close main conn, we open short ones for updates
+# The bus only writes progress to the DB as throttled checkpoints
+progress_bus.set_checkpoint(update_progress)
 
-    try:
-        # --- AUDIO PHASE (0% -> 10%) ---
-        print("🎤 Processing Audio...")
-        audio_path = extract_audio(video_path)
-        transcript = transcribe_audio(audio_path)
-        text_embeddings = get_text_embeddings(transcript)
-        
-        conn = get_connection()
-        for seg, emb in zip(transcript, text_embeddings):
-            insert_text_segment(conn, video_id, seg["start"], seg["end"], seg["text"], emb)
-        conn.close()
-        
-        update_progress(video_id, 10) 
+# Cross-process semaphores bounding how many jobs use a model at once ("whisper", "clip").
+# Set by ingestion workers (core/workers.py); empty means unlimited
+resource_slots = {}
 
-        # --- VIDEO PHASE (10% -> 99%) ---
-        print("👁️ Processing Frames...")
-        
-        # Calculate totals for progress math
-        vid = cv2.VideoCapture(video_path)
-        fps = vid.get(cv2.CAP_PROP_FPS)
-        if fps <= 0: fps = 24
-        total_seconds = (vid.get(cv2.CAP_PROP_FRAME_COUNT) / fps)
-        vid.release()
-
-        frame_gen = extract_frames(video_path, seconds_per_frame=frame_interval)
-        
-        batch = []
-        frame_idx = 0
-        last_reported_progress = 10 
-        
-        video_frame_dir = os.path.join("frames", str(video_id))
-        os.makedirs(video_frame_dir, exist_ok=True)
+def resource_slot(name: str):
+    """Context manager holding one slot of a shared resource, if it is bounded"""
+    slot = resource_slots.get(name)
+    return slot if slot is not None else nullcontext()
+
+class IngestionCancelled(RuntimeError):
+    """Raised inside a track when its job is cancelled"""
+
+def _batched(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch: yield batch
+
+class FrameWriter:
+    """
+    Writer-stage worker: queues frame previews and inserts their rows. With a
+    watermark, every stored batch advances the video's frame checkpoint
+    """
+
+    def __init__(self, video_id: int, thumbnails: ThumbnailWriter, watermark: FrameWatermark = None,
+                 skip_existing: bool = False):
+        self.video_id = video_id
+        self.thumbnails = thumbnails
+        self.watermark = watermark
+        self.skip_existing = skip_existing
+
+    def _checkpoint(self, frames_done, last_frame_ts, batches_done):
+        # Previews of checkpointed frames must survive a crash too
+        self.thumbnails.flush()
+        save_checkpoint(self.video_id, frames_done=frames_done, last_frame_ts=last_frame_ts, last_batch=batches_done)
+
+    def write(self, batch, embeddings):
+        # Preview encoding happens on the thumbnail pool; only the DB write blocks here
+        db_paths = [self.thumbnails.submit(frame_idx, frm) for frame_idx, (frm, _, _) in batch]
+
+        # One bulk write per batch
+        get_backend().add_frames(self.video_id,
+                                 [ts for _, (_, ts, _) in batch], db_paths, embeddings,
+                                 end_timestamps=[end_ts for _, (_, _, end_ts) in batch],
+                                 skip_existing=self.skip_existing)
+        invalidate_results()
+
+        if self.watermark is not None:
+            # End of the last frame's span: with frame_filter it covers dropped frames, and a resume
+            # restarting inside it would store a new row for a span that is already indexed
+            self.watermark.commit(batch[0][0], len(batch), batch[-1][1][2], on_advance=self._checkpoint)
+
+    def close(self):
+        pass
+
+class ProgressTracker:
+    """
+    Combines audio and visual track progress into one percentage and publishes it,
+    with per-stage item counts, on the progress bus. Each track owns a share of
+    0-99%; 100% is reported once the video is finished
+    """
+
+    def __init__(self, video_id: int, audio_share: int, visual_share: int):
+        self.video_id = video_id
+        self.shares = {"audio": audio_share, "visual": visual_share}
+        self.fractions = {"audio": 0.0, "visual": 0.0}
+        self.last_reported = 0
+        self._lock = threading.Lock()
+
+    def update(self, track: str, fraction: float):
+        with self._lock:
+            self.fractions[track] = min(max(fraction, self.fractions[track]), 1.0)
+            percent_complete = int(sum(self.shares[t] * self.fractions[t] for t in self.shares))
+
+            # Only publish if we moved forward
+            if percent_complete <= self.last_reported:
+                return
+            self.last_reported = percent_complete
+
+            # Published under the lock so the two tracks can't report progress out of order
+            progress_bus.publish(self.video_id, progress=percent_complete)
+            print(f"Progress: {percent_complete}%")
+
+    def count(self, stage: str, items: int):
+        """Adds finished items for a stage ("frames", "segments"); feeds the bus's rates"""
+        progress_bus.publish(self.video_id, counts={stage: items}, checkpoint=False)
+
+def _video_duration(video_path: str) -> float:
+    vid = cv2.VideoCapture(video_path)
+    fps = vid.get(cv2.CAP_PROP_FPS)
+    if fps <= 0: fps = 24
+    total_seconds = (vid.get(cv2.CAP_PROP_FRAME_COUNT) / fps)
+    vid.release()
+    return total_seconds
+
+def _run_audio_track(video_id: int, video_path: str, progress: ProgressTracker, total_seconds: float,
+                     cancel: threading.Event, text_batch_size: int = 16, whisper_threads: int = 0,
+                     checkpoint: dict = None):
+    checkpoint = checkpoint or {}
+    if checkpoint.get("transcript_done"):
+        print("🎤 Transcript already indexed, skipping audio")
+        progress.update("audio", 1.0)
+        return
+
+    print("🎤 Processing Audio...")
+    audio = load_audio_pcm(video_path)
+
+    # Resume after the last committed segment; Whisper only sees the rest of the track
+    resume_from = checkpoint.get("transcript_end") or 0.0
+    if resume_from > 0:
+        print(f"Resuming transcript at {resume_from:.1f}s")
+        audio = audio[int(resume_from * SAMPLE_RATE):]
+
+    # Segments are embedded and inserted in small batches while Whisper keeps decoding.
+    # The Whisper slot is held for the whole transcription, bounding concurrent decodes across workers
+    segment_count = 0
+    transcript = iter_transcribe(audio, cpu_threads=whisper_threads) if len(audio) > 0 else ()
+    with resource_slot("whisper"):
+        for segments in _batched(transcript, text_batch_size):
+            if cancel.is_set(): raise IngestionCancelled("Audio track cancelled")
+
+            if resume_from > 0:
+                segments = [{**seg, "start": seg["start"] + resume_from, "end": seg["end"] + resume_from}
+                            for seg in segments]
+
+            text_embeddings = get_text_embeddings(segments)
+            get_backend().add_text_segments(video_id,
+                                            [seg["start"] for seg in segments], [seg["end"] for seg in segments],
+                                            [seg["text"] for seg in segments], text_embeddings,
+                                            skip_existing=resume_from > 0)
+            invalidate_results()
+            save_checkpoint(video_id, transcript_end=segments[-1]["end"])
+            segment_count += len(segments)
+            progress.count("segments", len(segments))
 
-        conn = get_connection()
-        
-        for frame, timestamp in frame_gen:
-            batch.append((frame, timestamp))
-            
-            # --- PROGRESS CALCULATION ---
             if total_seconds > 0:
-                # Map timestamp to 10-99% range
-                percent_complete = 10 + int((timestamp / total_seconds) * 89)
-                
-                # Only update if we moved forward (prevents database spam)
-                if percent_complete > last_reported_progress:
-                    update_progress(video_id, percent_complete)
-                    print(f"Progress: {percent_complete}%") 
-                    last_reported_progress = percent_complete
-            # -----------------------------
-
-            if len(batch) >= 32:
-                embeddings = get_frame_embeddings(batch)
-                for (frm, ts), emb in zip(batch, embeddings):
-                    img_name = f"frame_{frame_idx}.jpg"
-                    save_path = os.path.join(video_frame_dir, img_name)
-                    cv2.imwrite(save_path, frm)
-                    
-                    db_path = f"frames/{video_id}/{img_name}"
-                    insert_frame(conn, video_id, ts, db_path, emb)
-                    frame_idx += 1
-                batch = []
-
-        # Process leftovers
-        if batch:
-            embeddings = get_frame_embeddings(batch)
-            for (frm, ts), emb in zip(batch, embeddings):
-                img_name = f"frame_{frame_idx}.jpg"
-                save_path = os.path.join(video_frame_dir, img_name)
-                cv2.imwrite(save_path, frm)
-                db_path = f"frames/{video_id}/{img_name}"
-                insert_frame(conn, video_id, ts, db_path, emb)
-                frame_idx += 1
+                progress.update("audio", segments[-1]["end"] / total_seconds)
+
+    save_checkpoint(video_id, transcript_done=True)
+    progress.update("audio", 1.0)
+    print(f"Indexed {segment_count} transcript segments")
+
+def _run_visual_track(video_id: int, video_path: str, progress: ProgressTracker, total_seconds: float,
+                      cancel: threading.Event, frame_interval: float = 1.0, frame_backend: str = "grab",
+                      frame_filter: str = None, filter_threshold: float = None, thumbnails: dict = None,
+                      checkpoint: dict = None, **stage_options):
+    print("👁️ Processing Frames...")
+
+    if stage_options.get("batch_size") is None:
+        # Every embed worker holds a batch in flight, so they share the memory budget
+        embed_workers = max(1, stage_options.get("embed_workers", 1))
+        stage_options["batch_size"] = max(4, adaptive_batch_size(get_clip()["device"]) // embed_workers)
+        print(f"CLIP batch size: {stage_options['batch_size']}")
+
+    # Resume after the span of the last frame whose whole batch (and every batch before it) was stored
+    checkpoint = checkpoint or {}
+    watermark = FrameWatermark(checkpoint.get("frames_done") or 0, checkpoint.get("last_frame_ts"),
+                               checkpoint.get("last_batch") or 0)
+    resume_after = watermark.last_frame_ts
+    if resume_after is not None:
+        print(f"Resuming frames after {resume_after:.1f}s ({watermark.frames_done} already indexed)")
+
+    frame_gen = extract_frames(video_path, seconds_per_frame=frame_interval, backend=frame_backend,
+                               start_time=resume_after or 0.0)
+
+    # Keyframe seeks can land early; drop anything at or before the checkpoint
+    if resume_after is not None:
+        frame_gen = ((frame, ts) for frame, ts in frame_gen if ts > resume_after)
+
+    # Optionally collapse near-duplicate frames; every item carries the span it covers
+    if frame_filter:
+        frame_gen = filter_frames(frame_gen, method=frame_filter, threshold=filter_threshold)
+    else:
+        frame_gen = ((frame, ts, ts) for frame, ts in frame_gen)
+
+    thumbnail_writer = ThumbnailWriter(video_id, **(thumbnails or {}))
+
+    def report_frame(item):
+        # Raising here stops the decode stage, which shuts the other stages down
+        if cancel.is_set(): raise IngestionCancelled("Visual track cancelled")
+
+        progress.count("frames", 1)
+        if total_seconds > 0:
+            progress.update("visual", item[1] / total_seconds)
+
+    cache_stats = FrameCacheStats()
+
+    def embed(batch):
+        # One CLIP slot per forward pass, so workers interleave batches instead of oversubscribing
+        with resource_slot("clip"):
+            embeddings = get_frame_embeddings(batch, cache_stats=cache_stats)
+        progress_bus.publish(video_id, checkpoint=False, frame_cache=cache_stats.as_dict())
+        return embeddings
+
+    # Decode, CLIP inference and DB writes overlap on separate threads
+    try:
+        stage_stats = run_frame_stages(
+            frame_gen,
+            embed,
+            lambda: FrameWriter(video_id, thumbnail_writer, watermark, skip_existing=resume_after is not None),
+            on_frame=report_frame,
+            start_index=watermark.frames_done,
+            **stage_options,
+        )
+    finally:
+        thumbnail_writer.close()
+    print_stage_stats(stage_stats)
+    print(f"Indexed {stage_stats[-1]['items']} frames")
+
+    hit_stats = cache_stats.as_dict()
+    if hit_stats["hits"]:
+        print(f"Frame cache: {hit_stats['hits']} of {hit_stats['hits'] + hit_stats['misses']} frames "
+              f"reused ({hit_stats['hit_rate']:.0%})")
+
+def ingestion_options(frame_interval: float = 1.0, frame_backend: str = "grab",
+                      frame_filter: str = None, filter_threshold: float = None,
+                      frame_batch_size: int = None, embed_workers: int = 1, writer_workers: int = 4,
+                      batch_queue_depth: int = 4, write_queue_depth: int = 8, text_batch_size: int = 16,
+                      parallel_tracks: bool = False, whisper_threads: int = 0, torch_threads: int = None,
+                      thumbnails: dict = None) -> dict:
+    """
+    Collects pipeline settings into the JSON-safe dict stored with a video
+
+    Args:
+        frame_interval (float): Sampling rate passed to extract_frames
+        frame_backend (str): Frame sampler ("grab", "ffmpeg" or "seek")
+        frame_filter (str, optional): Near-duplicate filter ("dhash" or "histogram")
+        filter_threshold (float, optional): Distance threshold for the filter
+        frame_batch_size (int, optional): Frames per CLIP batch. Sized from free memory if not given
+        embed_workers (int): CLIP embedding threads
+        writer_workers (int): JPEG/DB writer threads
+        batch_queue_depth (int): Max decoded batches waiting for CLIP
+        write_queue_depth (int): Max embedded batches waiting to be written
+        text_batch_size (int): Transcript segments per embed/insert batch
+        parallel_tracks (bool): Run the audio and visual tracks at the same time
+        whisper_threads (int): CPU threads for Whisper (0 = CTranslate2 default)
+        torch_threads (int, optional): Intra-op threads for CLIP/MiniLM (process-wide)
+        thumbnails (dict, optional): ThumbnailWriter options (max_size, fmt, quality, workers, pack)
+
+    Return:
+        dict: Options for register_video
+    """
+    return {
+        "frame_interval": frame_interval, "frame_backend": frame_backend,
+        "frame_filter": frame_filter, "filter_threshold": filter_threshold,
+        "frame_batch_size": frame_batch_size, "embed_workers": embed_workers, "writer_workers": writer_workers,
+        "batch_queue_depth": batch_queue_depth, "write_queue_depth": write_queue_depth,
+        "text_batch_size": text_batch_size, "parallel_tracks": parallel_tracks,
+        "whisper_threads": whisper_threads, "torch_threads": torch_threads, "thumbnails": thumbnails,
+    }
+
+def register_video(video_path: str, options: dict = None, status: str = "queued", content_hash: str = None) -> int:
+    """
+    Adds a video to the library without indexing it yet
+
+    Args:
+        video_path (str): Path to the uploaded video
+        options (dict, optional): Pipeline settings from ingestion_options(); defaults otherwise
+        status (str): Initial status
+        content_hash (str, optional): sha256 of the file, for find_indexed_copy()
+
+    Return:
+        int: The new video's id
+    """
+    # Stored with the video so workers, and resumes after a crash, index it with the same settings
+    options = options if options is not None else ingestion_options()
+
+    with connection() as conn:
+        return _insert_video(conn, video_path, options, status, content_hash)
+
+def _insert_video(conn, video_path: str, options: dict, status: str, content_hash: str) -> int:
+    return conn.execute(
+        "INSERT INTO videos (title, filepath, status, progress, options, content_hash) "
+        "VALUES (%s, %s, %s, 0, %s, %s) RETURNING id",
+        (os.path.basename(video_path), video_path, status, json.dumps(options), content_hash)
+    ).fetchone()[0]
+
+def _find_copy(conn, content_hash: str) -> tuple:
+    return conn.execute("""
+        SELECT id, status, title FROM videos
+        WHERE content_hash = %s AND status IN ('completed', 'processing', 'queued')
+        ORDER BY status = 'completed' DESC, id
+        LIMIT 1
+    """, (content_hash,)).fetchone()
+
+def find_indexed_copy(content_hash: str) -> tuple:
+    """
+    Finds a video with the same content that is indexed, or on its way to being indexed
+
+    Args:
+        content_hash (str): sha256 of the file
+
+    Return:
+        tuple: (video_id, status, title), completed copies first, or None
+    """
+    with connection() as conn:
+        return _find_copy(conn, content_hash)
+
+def register_upload(video_path: str, content_hash: str, options: dict = None, reindex: bool = False,
+                    priority: int = 0) -> tuple:
+    """
+    Adds an uploaded video and queues its job, unless the library already has its
+    content. The lookup, the video and the job share one transaction holding an
+    advisory lock on the hash, so concurrent uploads of the same file register it
+    once, and a registered upload always has a job
+
+    Args:
+        video_path (str): Path to the uploaded video
+        content_hash (str): sha256 of the file
+        options (dict, optional): Pipeline settings from ingestion_options(); defaults otherwise
+        reindex (bool): Register it even if a copy exists
+        priority (int): Job priority, see enqueue_job()
+
+    Return:
+        tuple: (video_id, job_id) of the new video, or (None, None), and the existing
+            copy as find_indexed_copy() returns it, or None
+    """
+    options = options if options is not None else ingestion_options()
+
+    with connection() as conn:
+        conn.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", (content_hash,))
+        existing = None if reindex else _find_copy(conn, content_hash)
+        if existing is not None: return (None, None), existing
+
+        video_id = _insert_video(conn, video_path, options, "queued", content_hash)
+        return (video_id, insert_job(conn, video_id, priority)), None
+
+def run_ingestion_pipeline(video_path: str, **options):
+    """
+    Adds a video to the library and indexes its transcript and frames in this process.
+    The API queues videos for the worker pool instead (core/workers.py)
+
+    Args:
+        video_path (str): Path to the uploaded video
+        **options: Pipeline settings, see ingestion_options()
+
+    Return:
+        str: Final status ("completed", "failed" or "cancelled")
+    """
+    video_id = register_video(video_path, ingestion_options(**options), status="processing")
+    return ingest_video(video_id)
+
+def ingest_video(video_id: int, cancel: threading.Event = None) -> str:
+    """
+    Indexes a registered video, continuing from its checkpoint if an earlier run was
+    interrupted, with the options it was registered with. Spans already indexed are
+    skipped; rows replayed around the checkpoint are dropped by the backend instead
+    of duplicated
+
+    Args:
+        video_id (int): Video to index
+        cancel (threading.Event, optional): Set to stop the job between batches
+
+    Return:
+        str: Final status ("completed", "failed" or "cancelled"), or None if the video
+        doesn't exist or is already completed
+    """
+    checkpoint = load_checkpoint(video_id)
+    if checkpoint is None or checkpoint["status"] == "completed":
+        return None
+
+    resuming = bool(checkpoint["transcript_end"] or checkpoint["transcript_done"] or checkpoint["frames_done"])
+    print(f"{'🔁 Resuming' if resuming else '🚀 Starting'} pipeline for: {checkpoint['title']}")
+
+    with connection() as conn:
+        conn.execute("UPDATE videos SET status = 'processing' WHERE id = %s", (video_id,))
+
+    progress_bus.forget(video_id)
+    progress_bus.start(video_id, checkpoint["title"])
+
+    with metrics.trace("ingest", video_id=video_id, resumed=resuming) as root:
+        status = _ingest(video_id, checkpoint["filepath"], checkpoint["options"], checkpoint, cancel=cancel)
+        if root is not None: root.attributes["status"] = status
+    return status
+
+def _ingest(video_id: int, video_path: str, options: dict, checkpoint: dict = None,
+            cancel: threading.Event = None) -> str:
+    if options.get("torch_threads"):
+        import torch
+        torch.set_num_threads(options["torch_threads"])
+
+    total_seconds = _video_duration(video_path)
+    cancel = cancel if cancel is not None else threading.Event()
+
+    audio_options = {
+        "text_batch_size": options.get("text_batch_size", 16),
+        "whisper_threads": options.get("whisper_threads", 0),
+        "checkpoint": checkpoint,
+    }
+    visual_options = {
+        "frame_interval": options.get("frame_interval", 1.0),
+        "frame_backend": options.get("frame_backend", "grab"),
+        "frame_filter": options.get("frame_filter"),
+        "filter_threshold": options.get("filter_threshold"),
+        "thumbnails": options.get("thumbnails"),
+        "checkpoint": checkpoint,
+        "batch_size": options.get("frame_batch_size"),
+        "embed_workers": options.get("embed_workers", 1),
+        "writer_workers": options.get("writer_workers", 4),
+        "batch_queue_depth": options.get("batch_queue_depth", 4),
+        "write_queue_depth": options.get("write_queue_depth", 8),
+    }
+
+    try:
+        if options.get("parallel_tracks"):
+            # Both tracks report at once, so give each a share closer to its real cost
+            progress = ProgressTracker(video_id, audio_share=40, visual_share=59)
+
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="ingest-track") as pool:
+                futures = [
+                    pool.submit(metrics.bind_context(_run_audio_track), video_id, video_path, progress, total_seconds,
+                                cancel, **audio_options),
+                    pool.submit(metrics.bind_context(_run_visual_track), video_id, video_path, progress, total_seconds,
+                                cancel, **visual_options),
+                ]
+
+                # Fail fast: the first error cancels the other track
+                for future in as_completed(futures):
+                    if future.exception() is not None:
+                        cancel.set()
+                        raise future.exception()
+        else:
+            # --- AUDIO PHASE (0% -> 10%), then VIDEO PHASE (10% -> 99%) ---
+            progress = ProgressTracker(video_id, audio_share=10, visual_share=89)
+            _run_audio_track(video_id, video_path, progress, total_seconds, cancel, **audio_options)
+            _run_visual_track(video_id, video_path, progress, total_seconds, cancel, **visual_options)
 
         # FINISH
-        conn.close()
+        get_backend().finalize(video_id)
         update_progress(video_id, 100)
         
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("UPDATE videos SET status = 'completed' WHERE id = %s", (video_id,))
-        conn.commit()
-        conn.close()
+        with connection() as conn:
+            conn.execute("UPDATE videos SET status = 'completed' WHERE id = %s", (video_id,))
+        progress_bus.publish(video_id, progress=100, status="completed", checkpoint=False)
+        return "completed"
 
     except Exception as e:
-        print(f"Pipeline Failed: {e}")
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute("UPDATE videos SET status = 'failed' WHERE id = %s", (video_id,))
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        # A cancelled video keeps what it indexed and can be resumed later
+        status = "cancelled" if isinstance(e, IngestionCancelled) else "failed"
+        print(f"Pipeline {status.capitalize()}: {e}")
+        with connection() as conn:
+            conn.execute("UPDATE videos SET status = %s WHERE id = %s", (status, video_id))
+        progress_bus.publish(video_id, status=status, error=str(e), checkpoint=False)
+        return status
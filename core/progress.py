@@ -0,0 +1,209 @@
+import asyncio
+import os
+import threading
+import time
+
+# Terminal states; a job's snapshot stops changing once it reaches one
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+class ProgressBus:
+    """
+    In-process progress channel for ingestion jobs.
+
+    The pipeline publishes updates from its worker threads; SSE handlers subscribe
+    from the event loop and get woken on every change. Progress is checkpointed to
+    the videos table at most every checkpoint_interval seconds (and on final states
+    that the pipeline writes itself), instead of once per percent.
+    Forwarders get every published update, e.g. to relay it to another process
+    """
+
+    def __init__(self, checkpoint_interval: float = 5.0, checkpoint=None):
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpoint = checkpoint
+        self._jobs = {}
+        self._last_checkpoint = {}
+        self._subscribers = {}
+        self._forwarders = []
+        self._lock = threading.Lock()
+
+    def set_checkpoint(self, fn):
+        """fn(video_id, progress) persists progress; called from publishing threads"""
+        self._checkpoint = fn
+
+    def add_forwarder(self, fn):
+        """fn(video_id, snapshot) is called after every publish"""
+        self._forwarders.append(fn)
+
+    def start(self, video_id: int, filename: str = None, stages: tuple = ("frames", "segments")):
+        """Registers a job; rates and ETA are measured from here"""
+        now = time.monotonic()
+        with self._lock:
+            self._jobs[video_id] = {
+                "video_id": video_id,
+                "filename": filename,
+                "status": "processing",
+                "progress": 0,
+                "counts": {stage: 0 for stage in stages},
+                "started": now,
+                "updated": now,
+            }
+        self._notify(video_id)
+
+    def publish(self, video_id: int, progress: int = None, status: str = None, counts: dict = None,
+                checkpoint: bool = True, **fields):
+        """
+        Merges an update into the job's snapshot and wakes its subscribers
+
+        Args:
+            video_id (int): Job to update
+            progress (int, optional): Overall percentage
+            status (str, optional): New status
+            counts (dict, optional): Items finished per stage since the last publish, e.g. {"frames": 32}
+            checkpoint (bool): Allow a throttled DB write of the progress
+            **fields: Extra values stored on the snapshot
+        """
+        write = None
+        with self._lock:
+            job = self._jobs.get(video_id)
+            if job is None:
+                now = time.monotonic()
+                job = self._jobs[video_id] = {"video_id": video_id, "status": "processing", "progress": 0,
+                                              "counts": {}, "started": now, "updated": now}
+
+            if progress is not None: job["progress"] = max(job["progress"], int(progress))
+            if status is not None: job["status"] = status
+            for stage, n in (counts or {}).items():
+                job["counts"][stage] = job["counts"].get(stage, 0) + n
+            job.update(fields)
+            job["updated"] = time.monotonic()
+
+            if checkpoint and progress is not None and self._checkpoint is not None:
+                last = self._last_checkpoint.get(video_id)
+                if last is None or job["updated"] - last >= self.checkpoint_interval:
+                    self._last_checkpoint[video_id] = job["updated"]
+                    write = job["progress"]
+
+        if write is not None:
+            try:
+                self._checkpoint(video_id, write)
+            except Exception as e:
+                print(f"Progress Checkpoint Warning: {e}")
+
+        self._notify(video_id)
+
+    def mirror(self, video_id: int, snapshot: dict):
+        """
+        Replaces a job's state with a snapshot taken in another process (e.g. an
+        ingestion worker) and wakes its subscribers. Nothing is checkpointed; the
+        publishing process already does that
+        """
+        now = time.monotonic()
+        job = {key: value for key, value in snapshot.items() if key not in ("elapsed_seconds", "rates", "eta_seconds")}
+        # Rebase the remote clock so rates and ETA come out the same here
+        job["started"] = now - snapshot.get("elapsed_seconds", 0.0)
+        job["updated"] = now
+        job["counts"] = dict(snapshot.get("counts") or {})
+
+        with self._lock:
+            self._jobs[video_id] = job
+        self._notify(video_id)
+
+    def snapshot(self, video_id: int = None) -> dict:
+        """
+        Current state of a job with per-stage rates and ETA
+
+        Args:
+            video_id (int, optional): Job to read. Defaults to the most recently started one
+
+        Return:
+            dict: Snapshot, or None when the bus has never seen the job
+        """
+        with self._lock:
+            if video_id is None:
+                if not self._jobs: return None
+                video_id = max(self._jobs, key=lambda v: self._jobs[v]["started"])
+            job = self._jobs.get(video_id)
+            if job is None: return None
+            job = {**job, "counts": dict(job["counts"])}
+
+        final = job["status"] in FINAL_STATUSES
+        elapsed = max((job["updated"] if final else time.monotonic()) - job.pop("started"), 1e-9)
+        job.pop("updated")
+
+        job["elapsed_seconds"] = round(elapsed, 1)
+        job["rates"] = {f"{stage}_per_sec": round(n / elapsed, 2) for stage, n in job["counts"].items()}
+
+        # Straight-line estimate from overall progress so far
+        fraction = job["progress"] / 100
+        job["eta_seconds"] = None if final or fraction <= 0 else round(elapsed * (1 - fraction) / fraction, 1)
+        return job
+
+    def forget(self, video_id: int = None):
+        """Drops one job's snapshot, or all of them. Subscribers of a dropped job are woken and end"""
+        with self._lock:
+            if video_id is None:
+                dropped = set(self._jobs) | set(self._subscribers)
+                self._jobs.clear()
+                self._last_checkpoint.clear()
+            else:
+                dropped = {video_id}
+                self._jobs.pop(video_id, None)
+                self._last_checkpoint.pop(video_id, None)
+
+        for dropped_id in dropped:
+            self._notify(dropped_id)
+
+    def _notify(self, video_id: int):
+        with self._lock:
+            waiters = list(self._subscribers.get(video_id, ()))
+            forwarders = list(self._forwarders)
+
+        for loop, event in waiters:
+            # Subscribers live on the event loop; publishers are pipeline threads
+            loop.call_soon_threadsafe(event.set)
+
+        if forwarders:
+            snapshot = self.snapshot(video_id)
+            for fn in forwarders:
+                try:
+                    fn(video_id, snapshot)
+                except Exception as e:
+                    print(f"Progress Forwarder Warning: {e}")
+
+    async def subscribe(self, video_id: int, keepalive: float = 15.0):
+        """
+        Async generator of snapshots for one job: the current one immediately, then one
+        per change (coalesced while the consumer is busy). Yields None as a keepalive
+        when nothing changed for `keepalive` seconds. Ends after a final status, or as
+        soon as the job has no snapshot (never started here, or forgotten, e.g. by /reset)
+        """
+        event = asyncio.Event()
+        entry = (asyncio.get_running_loop(), event)
+        with self._lock:
+            self._subscribers.setdefault(video_id, []).append(entry)
+
+        try:
+            snapshot = self.snapshot(video_id)
+
+            while snapshot is not None:
+                yield snapshot
+                if snapshot["status"] in FINAL_STATUSES: return
+
+                while True:
+                    try:
+                        await asyncio.wait_for(event.wait(), timeout=keepalive)
+                        break
+                    except asyncio.TimeoutError:
+                        yield None
+
+                # Cleared before reading, so a publish that lands meanwhile wakes us again
+                event.clear()
+                snapshot = self.snapshot(video_id)
+        finally:
+            with self._lock:
+                self._subscribers[video_id].remove(entry)
+                if not self._subscribers[video_id]:
+                    del self._subscribers[video_id]
+
+# One bus per process, fed by the pipeline and read by the API
+progress_bus = ProgressBus(checkpoint_interval=float(os.getenv("DEEPSEARCH_PROGRESS_CHECKPOINT_SECONDS", 5.0)))
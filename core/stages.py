@@ -0,0 +1,188 @@
+import queue
+import threading
+import time
+from core import metrics
+
+_DONE = object()
+
+class StageStats:
+    """Item counts and busy time for one pipeline stage"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, items: int, seconds: float):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    def as_dict(self, wall_seconds: float) -> dict:
+        # Busy rate is per worker; it shows how fast the stage could go if never starved
+        busy_per_worker = self.busy_seconds / max(self.workers, 1)
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "utilization": round(busy_per_worker / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            "items_per_sec": round(self.items / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "capacity_per_sec": round(self.items / busy_per_worker, 2) if busy_per_worker > 0 else 0.0,
+        }
+
+class _Pipeline:
+    def __init__(self):
+        self.stop = threading.Event()
+        self.error = None
+        self._lock = threading.Lock()
+
+    def fail(self, error: BaseException):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+        self.stop.set()
+
+    def put(self, q: queue.Queue, item):
+        # Blocking put that still notices when another stage has failed
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, q: queue.Queue):
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+def run_frame_stages(frame_gen, embed_fn, open_writer, batch_size: int = 32, embed_workers: int = 1,
+                     writer_workers: int = 4, batch_queue_depth: int = 4, write_queue_depth: int = 8,
+                     on_frame=None, start_index: int = 0) -> list:
+    """
+    Runs decode -> embed -> persist as concurrent stages joined by bounded queues
+
+    Args:
+        frame_gen (iterable): Frame tuples, (frame, timestamp, ...), e.g. from extract_frames
+        embed_fn (callable): Takes a batch of frame tuples and returns one embedding per frame
+        open_writer (callable): Called once per writer thread; returns an object with
+            write(batch, embeddings) and close(). Batches are lists of (frame_idx, frame_tuple)
+        batch_size (int): Frames per embedding batch
+        embed_workers (int): Threads running embed_fn
+        writer_workers (int): Threads running the writers
+        batch_queue_depth (int): Max batches waiting for embedding
+        write_queue_depth (int): Max embedded batches waiting to be written
+        on_frame (callable, optional): Called from the decode thread with each frame tuple
+        start_index (int): frame_idx of the first frame, e.g. when resuming a partly indexed video
+
+    Return:
+        list: Per-stage throughput stats, in stage order
+    """
+    pipe = _Pipeline()
+    batch_q = queue.Queue(maxsize=batch_queue_depth)
+    write_q = queue.Queue(maxsize=write_queue_depth)
+
+    decode_stats = StageStats("decode", 1)
+    embed_stats = StageStats("embed", embed_workers)
+    write_stats = StageStats("write", writer_workers)
+
+    def decode():
+        try:
+            batch = []
+            frame_idx = start_index
+            frames = iter(frame_gen)
+            while not pipe.stop.is_set():
+                start = time.perf_counter()
+                item = next(frames, _DONE)
+                seconds = time.perf_counter() - start
+                decode_stats.record(0 if item is _DONE else 1, seconds)
+
+                if item is _DONE: break
+                metrics.observe("frame_decode", seconds, items=1, nbytes=item[0].nbytes)
+
+                if on_frame is not None: on_frame(item)
+
+                batch.append((frame_idx, item))
+                frame_idx += 1
+
+                if len(batch) >= batch_size:
+                    if not pipe.put(batch_q, batch): return
+                    batch = []
+
+            if batch: pipe.put(batch_q, batch)
+        except BaseException as e:
+            pipe.fail(e)
+        finally:
+            for _ in range(embed_workers): pipe.put(batch_q, _DONE)
+
+    def embed():
+        try:
+            while True:
+                batch = pipe.get(batch_q)
+                if batch is _DONE: break
+
+                start = time.perf_counter()
+                embeddings = embed_fn([item for _, item in batch])
+                embed_stats.record(len(batch), time.perf_counter() - start)
+
+                if not pipe.put(write_q, (batch, embeddings)): break
+        except BaseException as e:
+            pipe.fail(e)
+
+    def write():
+        writer = None
+        try:
+            writer = open_writer()
+            while True:
+                job = pipe.get(write_q)
+                if job is _DONE: break
+
+                batch, embeddings = job
+                start = time.perf_counter()
+                writer.write(batch, embeddings)
+                write_stats.record(len(batch), time.perf_counter() - start)
+        except BaseException as e:
+            pipe.fail(e)
+        finally:
+            if writer is not None: writer.close()
+
+    wall_start = time.perf_counter()
+
+    # Each stage thread joins the caller's trace, if it is sampled
+    decoder = threading.Thread(target=metrics.bind_context(decode), name="frames-decode", daemon=True)
+    embedders = [threading.Thread(target=metrics.bind_context(embed), name=f"frames-embed-{i}", daemon=True)
+                 for i in range(embed_workers)]
+    writers = [threading.Thread(target=metrics.bind_context(write), name=f"frames-write-{i}", daemon=True)
+               for i in range(writer_workers)]
+
+    for t in [decoder] + embedders + writers: t.start()
+
+    decoder.join()
+    for t in embedders: t.join()
+
+    # Embedders are finished, so writers can be told to drain and stop
+    for _ in writers: pipe.put(write_q, _DONE)
+    for t in writers: t.join()
+
+    if pipe.error is not None:
+        raise pipe.error
+
+    wall_seconds = time.perf_counter() - wall_start
+    return [s.as_dict(wall_seconds) for s in (decode_stats, embed_stats, write_stats)]
+
+def print_stage_stats(stats: list):
+    """Prints a per-stage throughput table; the stage with the highest utilization is the bottleneck"""
+    print(f"{'stage':<8} {'workers':>7} {'items':>7} {'items/s':>9} {'capacity/s':>11} {'util':>6}")
+    for s in stats:
+        print(f"{s['stage']:<8} {s['workers']:>7} {s['items']:>7} {s['items_per_sec']:>9.1f} {s['capacity_per_sec']:>11.1f} {s['utilization']:>6.0%}")
+
+    if stats:
+        bottleneck = max(stats, key=lambda s: s["utilization"])
+        print(f"Bottleneck stage: {bottleneck['stage']}")
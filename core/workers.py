@@ -0,0 +1,340 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from core.progress import FINAL_STATUSES
+
+def worker_settings() -> dict:
+    """
+    Worker pool settings from the environment:
+    $DEEPSEARCH_INGEST_WORKERS (processes, default 2), $DEEPSEARCH_WHISPER_SLOTS and
+    $DEEPSEARCH_CLIP_SLOTS (jobs using each model at once, default 1),
+    $DEEPSEARCH_WORKER_NICE (CPU niceness of workers, default 10),
+    $DEEPSEARCH_WORKER_TORCH_THREADS (intra-op threads per worker, default cores / workers),
+    $DEEPSEARCH_JOB_POLL_SECONDS (queue and cancel polling, default 1),
+    $DEEPSEARCH_PROGRESS_FORWARD_SECONDS (min gap between forwarded updates and index
+    change notices, default 0.5), $DEEPSEARCH_METRICS_FORWARD_SECONDS (how often stage
+    metrics reach the API, default 5) and $DEEPSEARCH_JOB_MAX_CRASHES (worker deaths a job
+    may cause before it is failed instead of requeued, default 2)
+    """
+    workers = int(os.getenv("DEEPSEARCH_INGEST_WORKERS", 2))
+    torch_threads = os.getenv("DEEPSEARCH_WORKER_TORCH_THREADS")
+    return {
+        "workers": workers,
+        "whisper_slots": int(os.getenv("DEEPSEARCH_WHISPER_SLOTS", 1)),
+        "clip_slots": int(os.getenv("DEEPSEARCH_CLIP_SLOTS", 1)),
+        "nice": int(os.getenv("DEEPSEARCH_WORKER_NICE", 10)),
+        "torch_threads": int(torch_threads) if torch_threads else max(1, (os.cpu_count() or 1) // max(workers, 1)),
+        "poll_interval": float(os.getenv("DEEPSEARCH_JOB_POLL_SECONDS", 1.0)),
+        "forward_interval": float(os.getenv("DEEPSEARCH_PROGRESS_FORWARD_SECONDS", 0.5)),
+        "metrics_interval": float(os.getenv("DEEPSEARCH_METRICS_FORWARD_SECONDS", 5.0)),
+        "max_crashes": int(os.getenv("DEEPSEARCH_JOB_MAX_CRASHES", 2)),
+    }
+
+class _ProgressForwarder:
+    """Bus forwarder in a worker: sends throttled snapshots to the API process; final states always go through"""
+
+    def __init__(self, progress_queue, interval: float):
+        self.queue = progress_queue
+        self.interval = interval
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, video_id: int, snapshot: dict):
+        if snapshot is None: return
+
+        now = time.monotonic()
+        with self._lock:
+            if snapshot["status"] not in FINAL_STATUSES and now - self._last.get(video_id, 0.0) < self.interval:
+                return
+            self._last[video_id] = now
+        self.queue.put(("progress", (video_id, snapshot)))
+
+class _IndexNotifier:
+    """Invalidation listener in a worker: tells the API process its index changed, at most once per flush"""
+
+    def __init__(self, progress_queue):
+        self.queue = progress_queue
+        self._pending = threading.Event()
+
+    def __call__(self):
+        self._pending.set()
+
+    def flush(self, force: bool = False):
+        if force or self._pending.is_set():
+            self._pending.clear()
+            self.queue.put(("index", None))
+
+def _index_loop(notifier: _IndexNotifier, stop, interval: float):
+    while not stop.wait(interval):
+        notifier.flush()
+
+class _HeldSlot:
+    """
+    A worker's side of a shared slot semaphore. It counts the slots each worker
+    holds, so the pool can give back the ones a dead worker never released
+    """
+
+    def __init__(self, semaphore, held, index: int):
+        self.semaphore = semaphore
+        self.held = held
+        self.index = index
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        with self.held.get_lock():
+            self.held[self.index] += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.held.get_lock():
+            self.held[self.index] -= 1
+        self.semaphore.release()
+
+def _forward_metrics(progress_queue):
+    # Histogram and counter deltas since the last call; the API merges them into its registry
+    from core import metrics
+
+    delta = metrics.registry.drain()
+    if delta["histograms"] or delta["counters"]:
+        progress_queue.put(("metrics", delta))
+
+def _metrics_loop(progress_queue, stop, interval: float):
+    while not stop.wait(interval):
+        _forward_metrics(progress_queue)
+
+def _watch_cancel(job_id: int, cancel: threading.Event, done: threading.Event, poll_interval: float):
+    from core.jobs import cancel_requested
+
+    while not done.wait(poll_interval):
+        try:
+            if cancel_requested(job_id):
+                cancel.set()
+                return
+        except Exception as e:
+            print(f"Cancel Watch Warning: {e}")
+
+def _run_job(job_id: int, video_id: int, poll_interval: float):
+    from core.jobs import finish_job
+    from core.pipeline import ingest_video
+    from core.progress import progress_bus
+
+    cancel, done = threading.Event(), threading.Event()
+    watcher = threading.Thread(target=_watch_cancel, args=(job_id, cancel, done, poll_interval), daemon=True)
+    watcher.start()
+
+    try:
+        status = ingest_video(video_id, cancel=cancel)
+    except Exception as e:
+        status = "failed"
+        print(f"Job {job_id} Failed: {e}")
+    finally:
+        done.set()
+
+    if status is None:
+        # Already indexed (e.g. requeued after finishing) or deleted by a reset
+        finish_job(job_id, "completed")
+        return
+
+    snapshot = progress_bus.snapshot(video_id) or {}
+    stats = {"frame_cache": snapshot["frame_cache"]} if "frame_cache" in snapshot else None
+    finish_job(job_id, status, snapshot.get("error"), stats=stats)
+    progress_bus.forget(video_id)
+
+def _worker_main(name: str, index: int, slots: dict, held: dict, progress_queue, stop, settings: dict):
+    """Entry point of a worker process: claims jobs until stop is set"""
+    # Ingestion yields the CPU to the API process, so search latency holds up while videos index
+    if settings["nice"]:
+        try:
+            os.nice(settings["nice"])
+        except (AttributeError, OSError):
+            pass
+
+    from core import metrics, pipeline
+    from core.jobs import claim_job
+    from core.progress import progress_bus
+    from indexing.insert import open_pool
+    from search_service.cache import add_invalidation_listener
+
+    pipeline.resource_slots.update({slot: _HeldSlot(semaphore, held[slot], index) for slot, semaphore in slots.items()})
+    open_pool(min_size=1)
+    progress_bus.add_forwarder(_ProgressForwarder(progress_queue, settings["forward_interval"]))
+    metrics.add_trace_forwarder(lambda finished: progress_queue.put(("trace", finished)))
+    threading.Thread(target=_metrics_loop, args=(progress_queue, stop, settings["metrics_interval"]),
+                     name="metrics-forward", daemon=True).start()
+
+    # Stored batches reach the API's index at most once per forward interval
+    notifier = _IndexNotifier(progress_queue)
+    add_invalidation_listener(notifier)
+    threading.Thread(target=_index_loop, args=(notifier, stop, settings["forward_interval"]),
+                     name="index-notify", daemon=True).start()
+
+    if settings["torch_threads"]:
+        try:
+            import torch
+            torch.set_num_threads(settings["torch_threads"])
+        except ImportError:
+            pass
+
+    print(f"Ingestion {name} ready (pid {os.getpid()})")
+    while not stop.is_set():
+        try:
+            claimed = claim_job(name)
+        except Exception as e:
+            print(f"Job Queue Warning: {e}")
+            claimed = None
+
+        if claimed is None:
+            stop.wait(settings["poll_interval"])
+            continue
+
+        job_id, video_id = claimed
+        print(f"{name} picked up job {job_id} (video {video_id})")
+        _run_job(job_id, video_id, settings["poll_interval"])
+        # finalize() merged the job's segments
+        notifier.flush(force=True)
+        _forward_metrics(progress_queue)
+
+    _forward_metrics(progress_queue)
+
+class WorkerPool:
+    """
+    Ingestion worker processes fed by the jobs table. Workers claim jobs with
+    SKIP LOCKED, share cross-process Whisper/CLIP slot semaphores, and forward
+    throttled progress snapshots, index change notices, stage metrics and sampled
+    traces to the API process over a queue. A supervisor thread replaces workers
+    that die, releasing their jobs and the model slots they held
+    """
+
+    def __init__(self, workers: int = 2, whisper_slots: int = 1, clip_slots: int = 1, nice: int = 10,
+                 torch_threads: int = None, poll_interval: float = 1.0, forward_interval: float = 0.5,
+                 metrics_interval: float = 5.0, max_crashes: int = 2):
+        # spawn: workers start clean instead of inheriting the API's threads, pools and CUDA state
+        self._ctx = mp.get_context("spawn")
+        self.workers = workers
+        self.settings = {"nice": nice, "torch_threads": torch_threads, "poll_interval": poll_interval,
+                         "forward_interval": forward_interval, "metrics_interval": metrics_interval}
+        self.slot_limits = {"whisper": whisper_slots, "clip": clip_slots}
+        self.slots = {name: self._ctx.BoundedSemaphore(limit) for name, limit in self.slot_limits.items()}
+        # Slots held per worker, by worker index
+        self.held = {name: self._ctx.Array("i", workers) for name in self.slot_limits}
+        self.max_crashes = max_crashes
+        self.restarts = 0
+        self.progress_queue = self._ctx.Queue()
+        self._stop = self._ctx.Event()
+        self._processes = []
+        self._listener = None
+        self._supervisor = None
+
+    def _spawn(self, index: int):
+        name = f"ingest-worker-{index}"
+        process = self._ctx.Process(target=_worker_main, name=name, daemon=True,
+                                    args=(name, index, self.slots, self.held, self.progress_queue, self._stop,
+                                          self.settings))
+        process.start()
+        return process
+
+    def start(self, on_progress=None, on_index=None):
+        """
+        Starts the worker processes
+
+        Args:
+            on_progress (callable, optional): Called in this process with (video_id, snapshot)
+                for every forwarded progress update
+            on_index (callable, optional): Called in this process when a worker stored or
+                merged index segments
+        """
+        self._processes = [self._spawn(i) for i in range(self.workers)]
+
+        self._listener = threading.Thread(target=self._listen, args=(on_progress, on_index), name="ingest-progress",
+                                          daemon=True)
+        self._listener.start()
+        self._supervisor = threading.Thread(target=self._supervise, name="ingest-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _supervise(self):
+        while not self._stop.wait(self.settings["poll_interval"]):
+            for index, process in enumerate(self._processes):
+                if process.is_alive() or self._stop.is_set(): continue
+                try:
+                    self._replace(index, process)
+                except Exception as e:
+                    print(f"Worker Supervisor Warning: {e}")
+
+    def _replace(self, index: int, process):
+        from core.jobs import release_worker_jobs
+        from core.progress import progress_bus
+
+        error = f"{process.name} exited with code {process.exitcode}"
+        print(f"Ingestion Worker Warning: {error}")
+
+        # Slots taken and never released would block every later job that needs the model
+        for slot, semaphore in self.slots.items():
+            held = self.held[slot]
+            with held.get_lock():
+                count, held[index] = held[index], 0
+            for _ in range(count):
+                semaphore.release()
+
+        # Released before the replacement starts claiming under the same name
+        try:
+            released = release_worker_jobs(process.name, error, self.max_crashes)
+        except Exception as e:
+            # Left 'running'; recover_jobs() requeues them on the next start
+            print(f"Job Release Warning: {e}")
+            released = []
+
+        for job_id, video_id, status in released:
+            print(f"Job {job_id} (video {video_id}) {'requeued' if status == 'queued' else status} after {error}")
+            progress_bus.publish(video_id, status=status, error=error if status == "failed" else None,
+                                 checkpoint=False)
+
+        self._processes[index] = self._spawn(index)
+        self.restarts += 1
+
+    def _listen(self, on_progress, on_index):
+        from core import metrics
+
+        while not self._stop.is_set():
+            try:
+                kind, payload = self.progress_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                if kind == "metrics":
+                    metrics.registry.merge(payload)
+                elif kind == "trace":
+                    metrics.record_trace(payload)
+                elif kind == "index":
+                    if on_index is not None: on_index()
+                elif on_progress is not None:
+                    on_progress(*payload)
+            except Exception as e:
+                print(f"Progress Listener Warning: {e}")
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stops the workers after their current job, terminating any still busy after
+        timeout seconds. Their jobs stay 'running' and are requeued on the next start
+        """
+        self._stop.set()
+        if self._supervisor is not None: self._supervisor.join(timeout=self.settings["poll_interval"] + 1.0)
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+        for process in self._processes:
+            if process.is_alive(): process.terminate()
+
+        if self._listener is not None: self._listener.join(timeout=1.0)
+        self._processes = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": [{"name": p.name, "pid": p.pid, "alive": p.is_alive()} for p in self._processes],
+            "restarts": self.restarts,
+            "slots": self.slot_limits,
+            "max_crashes": self.max_crashes,
+            **self.settings,
+        }
@@ -1,4 +1,17 @@
 import psycopg as pg
+from indexing.ann_index import build_indexes, drop_indexes
+from indexing.quantization import get_embedding_format, pg_column_type, DIMENSIONS
+
+def _set_embedding_type(cur, table: str, column_type: str):
+    # Convert existing embedding columns when the storage format changes (e.g. vector -> halfvec)
+    dim = DIMENSIONS[table]
+    cur.execute("SELECT format_type(atttypid, atttypmod) FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'embedding'", (table,))
+    current = cur.fetchone()[0]
+
+    if current != f"{column_type}({dim})":
+        # Index operator classes are type-specific, so they are rebuilt afterwards
+        drop_indexes(cur, tables=[table])
+        cur.execute(f"ALTER TABLE {table} ALTER COLUMN embedding TYPE {column_type}({dim}) USING embedding::{column_type}({dim})")
 
 def database_setup():
     conn = pg.connect("host=localhost port=5431 dbname=postgres user=postgres password=borris")
@@ -18,21 +31,51 @@ def database_setup():
 
     cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
 
+    # halfvec stores the column at half width; binary keeps full vectors and indexes their sign bits
+    embedding_format = get_embedding_format()
+    # int8 codes only exist in the mmap backend; the pgvector tables fall back to full vectors
+    if embedding_format == "int8":
+        print("int8 is stored by the mmap backend only; pgvector tables use float32 vectors")
+        embedding_format = "float32"
+    column_type = pg_column_type(embedding_format).upper()
+
     cur.execute("""
         CREATE TABLE IF NOT EXISTS videos (
                 id SERIAL PRIMARY KEY,
                 name TEXT,
                 path TEXT)
     """)
+
+    # Registry columns the pipeline writes, plus the resume checkpoint (see core/checkpoint.py)
+    cur.execute("""
+        ALTER TABLE videos
+                ADD COLUMN IF NOT EXISTS title TEXT,
+                ADD COLUMN IF NOT EXISTS filepath TEXT,
+                ADD COLUMN IF NOT EXISTS status TEXT,
+                ADD COLUMN IF NOT EXISTS progress INTEGER DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS options JSONB,
+                ADD COLUMN IF NOT EXISTS transcript_done BOOLEAN DEFAULT FALSE,
+                ADD COLUMN IF NOT EXISTS transcript_end FLOAT DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS last_frame_ts FLOAT,
+                ADD COLUMN IF NOT EXISTS frames_done INTEGER DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS last_batch INTEGER DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS content_hash TEXT
+    """)
+    # Uploads with the same sha256 reuse the video already indexed (see /upload)
+    cur.execute("CREATE INDEX IF NOT EXISTS videos_content_hash_idx ON videos (content_hash)")
     
     cur.execute("""
         CREATE TABLE IF NOT EXISTS frames (
                 id SERIAL PRIMARY KEY,
                 video_id INTEGER REFERENCES videos(id),
                 timestamp FLOAT,
+                end_timestamp FLOAT,
                 IMAGE_PATH TEXT,
-                embedding VECTOR(512))
-    """)
+                embedding {column_type}(512))
+    """.format(column_type=column_type))
+
+    # Older databases predate frame spans
+    cur.execute("ALTER TABLE frames ADD COLUMN IF NOT EXISTS end_timestamp FLOAT")
 
     cur.execute("""
         CREATE TABLE IF NOT EXISTS text_segments (
@@ -41,11 +84,46 @@ def database_setup():
                 start_time FLOAT,
                 end_time FLOAT,
                 text TEXT,
-                embedding VECTOR(384))
+                embedding {column_type}(384))
+    """.format(column_type=column_type))
+
+    # Ingestion queue, drained by the API's worker processes (see core/jobs.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+                id SERIAL PRIMARY KEY,
+                video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE,
+                status TEXT NOT NULL DEFAULT 'queued',
+                priority INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                error TEXT,
+                cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                started_at TIMESTAMPTZ,
+                finished_at TIMESTAMPTZ,
+                stats JSONB,
+                crashes INTEGER NOT NULL DEFAULT 0)
     """)
+    # Older databases predate per-job stats (frame cache hit rate) and worker crash counts
+    cur.execute("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS stats JSONB")
+    cur.execute("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS crashes INTEGER NOT NULL DEFAULT 0")
+    # Workers claim from the head of this index
+    cur.execute("CREATE INDEX IF NOT EXISTS jobs_queue_idx ON jobs (priority DESC, id) WHERE status = 'queued'")
+
+    _set_embedding_type(cur, "frames", column_type.lower())
+    _set_embedding_type(cur, "text_segments", column_type.lower())
+
+    # Lookups for the existence check a resumed ingestion runs on replayed rows. Not unique:
+    # duplicate keys are valid on a first run. Earlier setups created unique versions
+    cur.execute("DROP INDEX IF EXISTS frames_video_timestamp_key")
+    cur.execute("DROP INDEX IF EXISTS text_segments_video_start_key")
+    cur.execute("CREATE INDEX IF NOT EXISTS frames_video_timestamp_idx ON frames (video_id, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS text_segments_video_start_idx ON text_segments (video_id, start_time)")
 
     conn.commit()
     cur.close()
+
+    # HNSW can be built on empty tables and stays current as rows are inserted
+    build_indexes(conn, method="hnsw", embedding_format=embedding_format)
     conn.close()
 
     print("DATABASE CREATED")
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from ingestion.frame_filter import dhash
+
+FRAME_CACHE_KEYS = ("exact", "dhash")
+
+# Side of the colour thumbnail that confirms a dhash match
+SIGNATURE_SIZE = 16
+
+def frame_key(frame: np.ndarray, method: str = "exact", hash_size: int = 16):
+    """
+    Cache key of a decoded BGR frame
+
+    Args:
+        frame (np.ndarray): BGR frame
+        method (str): "exact" only matches identical pixels; "dhash" also matches re-encoded
+            copies of the same shot (shared intros, re-cuts), but flat and similar frames collide,
+            so its hits are confirmed with frame_signature()
+        hash_size (int): dhash grid size (hash_size ** 2 bits)
+
+    Return:
+        Hashable key
+    """
+    if method == "exact":
+        digest = hashlib.blake2b(np.ascontiguousarray(frame).data, digest_size=16)
+        digest.update(str(frame.shape).encode())
+        return digest.digest()
+    if method == "dhash":
+        return dhash(frame, hash_size=hash_size)
+    raise ValueError(f"Unknown frame cache key '{method}', expected one of {FRAME_CACHE_KEYS}")
+
+def frame_signature(frame: np.ndarray) -> np.ndarray:
+    """Downscaled colour copy of a BGR frame, compared pixel by pixel to confirm a dhash match"""
+    return cv2.resize(frame, (SIGNATURE_SIZE, SIGNATURE_SIZE), interpolation=cv2.INTER_AREA)
+
+class FrameCacheStats:
+    """Hits and misses of one job; shared by its embed threads"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def add(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
+
+class FrameEmbeddingCache:
+    """
+    Thread-safe LRU of CLIP image embeddings keyed by frame hash; max_size=0 disables it.
+    With dhash keys each entry also keeps its frame's signature, and a lookup only hits
+    when the mean absolute pixel difference of the signatures is at most max_diff
+    """
+
+    def __init__(self, max_size: int = 20000, key: str = "exact", hash_size: int = 16, max_diff: float = 3.0):
+        if key not in FRAME_CACHE_KEYS:
+            raise ValueError(f"Unknown frame cache key '{key}', expected one of {FRAME_CACHE_KEYS}")
+        self.max_size = max_size
+        self.key = key
+        self.hash_size = hash_size
+        self.max_diff = max_diff
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # dhash matches turned down by the signature check
+        self.rejected = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def keys(self, frames: list) -> list:
+        return [frame_key(frame, self.key, self.hash_size) for frame in frames]
+
+    def signatures(self, frames: list) -> list:
+        # Exact keys already prove the pixels are identical
+        if self.key == "exact": return [None] * len(frames)
+        return [frame_signature(frame) for frame in frames]
+
+    def same_frame(self, a, b) -> bool:
+        """True if two signatures are close enough to share an embedding"""
+        if a is None or b is None: return True
+        return float(np.mean(np.abs(a.astype(np.int16) - b))) <= self.max_diff
+
+    def get_many(self, keys: list, signatures: list = None) -> list:
+        """Cached embedding per key, or None. Callers report the outcome with record()"""
+        signatures = signatures or [None] * len(keys)
+        with self._lock:
+            rows = []
+            for key, signature in zip(keys, signatures):
+                entry = self._data.get(key)
+                if entry is not None and not self.same_frame(entry[1], signature):
+                    self.rejected += 1
+                    entry = None
+                if entry is not None: self._data.move_to_end(key)
+                rows.append(entry[0] if entry is not None else None)
+        return rows
+
+    def record(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def set_many(self, keys: list, embeddings, signatures: list = None):
+        signatures = signatures or [None] * len(keys)
+        with self._lock:
+            for key, row, signature in zip(keys, embeddings, signatures):
+                # Copies, so a cached row doesn't keep the whole batch array alive
+                self._data[key] = (np.array(row, dtype=np.float32), signature)
+                self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "key": self.key,
+                "max_diff": self.max_diff,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+# Per process; 20000 CLIP rows is about 40 MB, plus 15 MB of signatures with dhash keys
+frame_cache = FrameEmbeddingCache(max_size=int(os.getenv("DEEPSEARCH_FRAME_CACHE_SIZE", 20000)),
+                                  key=os.getenv("DEEPSEARCH_FRAME_CACHE_KEY", "exact"),
+                                  hash_size=int(os.getenv("DEEPSEARCH_FRAME_CACHE_HASH_SIZE", 16)),
+                                  max_diff=float(os.getenv("DEEPSEARCH_FRAME_CACHE_MAX_DIFF", 3.0)))
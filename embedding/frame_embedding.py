@@ -1,29 +1,72 @@
-from transformers import CLIPProcessor, CLIPModel
-import cv2
-import torch
+import numpy as np
+from core import metrics
+from embedding.models import get_clip
+from embedding.preprocess import preprocess_frames
+from embedding.frame_cache import frame_cache
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
+def _encode(raw_frames: list) -> np.ndarray:
+    clip = get_clip()
+    model, device = clip["model"], clip["device"]
 
-processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
+    # BGR -> RGB, resize, crop and normalize in one batch (replaces CLIPProcessor's per-image PIL path)
+    with metrics.span("clip_preprocess", items=len(raw_frames), nbytes=sum(f.nbytes for f in raw_frames)):
+        pixel_values = preprocess_frames(raw_frames)
 
-def get_frame_embeddings(frames: list) -> list:
+    with metrics.span("clip_forward", items=len(raw_frames), nbytes=pixel_values.nbytes):
+        if clip.get("runtime") == "onnx":
+            return np.asarray(model.get_image_features(pixel_values=pixel_values))
+
+        import torch
+        with torch.no_grad():
+            outputs = model.get_image_features(pixel_values=torch.from_numpy(pixel_values).to(device))
+
+        return outputs.cpu().numpy()
+
+def get_frame_embeddings(frames: list, cache_stats=None) -> list:
     """
     Get embeddings for each frame in a video
-    Uses CLIP processor and model to encode the frames
+    Uses the batched CLIP preprocessing and the CLIP image model to encode the frames.
+    Frames already in the frame embedding cache (same key, confirmed for dhash keys) skip inference
 
     Args:
-        frames (list): List of frames in a video
-    
+        frames (list): List of (frame, timestamp, ...) tuples from a video
+        cache_stats (FrameCacheStats, optional): Per-job hit/miss counter
+
     Return:
-        list: List of embeddings for each frame converted to RGB in a numpy array
+        list: List of embeddings for each frame in a numpy array
     """
-    raw_frames = [frame for (frame, _) in frames]
+    raw_frames = [item[0] for item in frames]
+
+    if not frame_cache.enabled or not raw_frames:
+        return _encode(raw_frames)
+
+    keys = frame_cache.keys(raw_frames)
+    signatures = frame_cache.signatures(raw_frames)
+    cached = frame_cache.get_many(keys, signatures)
+
+    # Repeats inside the batch are encoded once too, if they pass the same check as a cache hit
+    source = {}
+    encoding = {}
+    missing = []
+    for i, (key, row) in enumerate(zip(keys, cached)):
+        if row is not None: continue
+        match = next((j for j in encoding.get(key, ()) if frame_cache.same_frame(signatures[j], signatures[i])), None)
+        if match is not None:
+            source[i] = match
+        else:
+            encoding.setdefault(key, []).append(i)
+            missing.append(i)
+
+    hits = len(keys) - len(missing)
+    frame_cache.record(hits, len(missing))
+    if cache_stats is not None: cache_stats.add(hits, len(missing))
+    metrics.registry.inc("deepsearch_frame_cache_total", hits, result="hit")
+    metrics.registry.inc("deepsearch_frame_cache_total", len(missing), result="miss")
 
-    # Raw frames must be converted to RGB for use with the CLIP model
-    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in raw_frames]
+    computed = {}
+    if missing:
+        encoded = _encode([raw_frames[i] for i in missing])
+        frame_cache.set_many([keys[i] for i in missing], encoded, [signatures[i] for i in missing])
+        computed = dict(zip(missing, encoded))
 
-    inputs = processor(images=rgb_frames, return_tensors="pt", padding=True).to(device)
-    outputs = model.get_image_features(**inputs)
-    
-    return outputs.detach().cpu().numpy()
\ No newline at end of file
+    return np.stack([row if row is not None else computed[source.get(i, i)] for i, row in enumerate(cached)])
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+# Models are loaded on first use and shared by ingestion and search
+_models = {}
+_stats = {}
+_lock = threading.Lock()
+_load_locks = {}
+
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+TEXT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+INFERENCE_RUNTIMES = ("torch", "onnx")
+
+def _rss_bytes() -> int:
+    # Current resident set size; /proc is Linux-only, fall back to peak RSS elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _param_bytes(model) -> int:
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    except AttributeError:
+        return None
+
+def _load_clip():
+    import torch
+    from transformers import CLIPProcessor, CLIPModel
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+    model = CLIPModel.from_pretrained(CLIP_MODEL_NAME).to(device)
+    model.eval()
+    return {"model": model, "processor": processor, "device": device}
+
+def _load_minilm():
+    import sentence_transformers
+
+    model = sentence_transformers.SentenceTransformer(TEXT_MODEL_NAME)
+    return {"model": model, "device": str(model.device)}
+
+def _load_clip_onnx():
+    from embedding.onnx_backend import load_clip_onnx
+    return load_clip_onnx()
+
+def _load_minilm_onnx():
+    from embedding.onnx_backend import load_minilm_onnx
+    return load_minilm_onnx()
+
+_loaders = {
+    "clip": _load_clip,
+    "minilm": _load_minilm,
+    "clip-onnx": _load_clip_onnx,
+    "minilm-onnx": _load_minilm_onnx,
+}
+
+def inference_runtime() -> str:
+    """PyTorch or ONNX Runtime, from $DEEPSEARCH_INFERENCE (default "torch")"""
+    runtime = os.getenv("DEEPSEARCH_INFERENCE", "torch")
+    if runtime not in INFERENCE_RUNTIMES:
+        raise ValueError(f"Unknown inference runtime '{runtime}', expected one of {INFERENCE_RUNTIMES}")
+    return runtime
+
+def _runtime_name(name: str) -> str:
+    # "clip" and "minilm" resolve to their ONNX variants when that runtime is selected
+    if inference_runtime() == "onnx" and f"{name}-onnx" in _loaders:
+        return f"{name}-onnx"
+    return name
+
+def register_loader(name: str, loader):
+    """Adds a model that can be fetched with get_model(name)"""
+    _loaders[name] = loader
+
+def get_model(name: str, loader=None) -> dict:
+    """
+    Returns a loaded model bundle, loading it on first use
+
+    Args:
+        name (str): Registry key, e.g. "clip" or "minilm"
+        loader (callable, optional): Loader for keys not registered up front
+
+    Return:
+        dict: The model bundle ("model", plus "processor"/"device" where relevant)
+    """
+    bundle = _models.get(name)
+    if bundle is not None:
+        return bundle
+
+    with _lock:
+        name_lock = _load_locks.setdefault(name, threading.Lock())
+
+    # Per-model lock: two callers never load the same model, but different models load in parallel
+    with name_lock:
+        bundle = _models.get(name)
+        if bundle is not None:
+            return bundle
+
+        loader = loader or _loaders.get(name)
+        if loader is None:
+            raise KeyError(f"No loader registered for model '{name}'")
+
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        bundle = loader()
+        load_seconds = time.perf_counter() - start
+
+        _stats[name] = {
+            "load_seconds": round(load_seconds, 2),
+            "param_bytes": _param_bytes(bundle["model"]),
+            # Approximate when other models load concurrently
+            "rss_delta_bytes": _rss_bytes() - rss_before,
+            "device": bundle.get("device"),
+        }
+        _models[name] = bundle
+        print(f"Loaded model '{name}' in {load_seconds:.1f}s")
+
+    return bundle
+
+def get_clip() -> dict:
+    return get_model(_runtime_name("clip"))
+
+def get_minilm() -> dict:
+    return get_model(_runtime_name("minilm"))
+
+def warm_models(names: list = None, background: bool = True):
+    """
+    Loads models ahead of first use
+
+    Args:
+        names (list, optional): Registry keys to load. Defaults to CLIP and MiniLM
+        background (bool): Load on a daemon thread and return immediately
+
+    Return:
+        threading.Thread: The warm-up thread, or None when loading in the foreground
+    """
+    names = [_runtime_name(name) for name in (names or ["clip", "minilm"])]
+
+    def warm():
+        for name in names:
+            try:
+                get_model(name)
+            except Exception as e:
+                print(f"Model Warm-up Warning ({name}): {e}")
+
+    if not background:
+        warm()
+        return None
+
+    thread = threading.Thread(target=warm, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def model_stats() -> dict:
+    """Load time and memory for each loaded model, plus which registered models are still cold"""
+    return {
+        "loaded": dict(_stats),
+        "cold": [name for name in _loaders if name not in _models],
+        "process_rss_bytes": _rss_bytes(),
+    }
@@ -0,0 +1,253 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding.models import CLIP_MODEL_NAME, TEXT_MODEL_NAME
+
+# Exported graphs; "<name>.int8.onnx" is the dynamically quantized variant
+CLIP_IMAGE_FILE = "clip_image.onnx"
+CLIP_TEXT_FILE = "clip_text.onnx"
+MINILM_FILE = "minilm.onnx"
+CLIP_PROCESSOR_DIR = "clip_processor"
+MINILM_TOKENIZER_DIR = "minilm_tokenizer"
+
+OPSET = 17
+
+def onnx_dir() -> str:
+    return os.getenv("DEEPSEARCH_ONNX_DIR", os.path.join("models", "onnx"))
+
+def _model_file(root: str, name: str, int8: bool) -> str:
+    return os.path.join(root, name.replace(".onnx", ".int8.onnx") if int8 else name)
+
+def export_models(output_dir: str = None, quantize: bool = False) -> list:
+    """
+    Exports the CLIP image and text towers and MiniLM to ONNX
+
+    Args:
+        output_dir (str, optional): Target directory. Defaults to $DEEPSEARCH_ONNX_DIR or models/onnx
+        quantize (bool): Also write int8 dynamically quantized copies
+
+    Return:
+        list: Paths of the .onnx files written
+    """
+    import torch
+    import sentence_transformers
+    from transformers import CLIPModel, CLIPProcessor
+
+    output_dir = output_dir or onnx_dir()
+    os.makedirs(output_dir, exist_ok=True)
+
+    class ImageTower(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, pixel_values):
+            return self.clip.get_image_features(pixel_values=pixel_values)
+
+    class TextTower(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, input_ids, attention_mask):
+            return self.clip.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+    class SentenceEncoder(torch.nn.Module):
+        # Transformer + mean pooling (+ L2 normalize), the same pipeline SentenceTransformer runs
+        def __init__(self, st_model):
+            super().__init__()
+            self.transformer = st_model[0].auto_model
+            self.normalize = any(type(m).__name__ == "Normalize" for m in st_model)
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            hidden = self.transformer(input_ids=input_ids, attention_mask=attention_mask,
+                                      token_type_ids=token_type_ids).last_hidden_state
+            mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            if self.normalize:
+                pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+            return pooled
+
+    written = []
+
+    clip = CLIPModel.from_pretrained(CLIP_MODEL_NAME).eval()
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+    processor.save_pretrained(os.path.join(output_dir, CLIP_PROCESSOR_DIR))
+
+    with torch.no_grad():
+        path = os.path.join(output_dir, CLIP_IMAGE_FILE)
+        torch.onnx.export(ImageTower(clip), (torch.zeros(1, 3, 224, 224),), path,
+                          input_names=["pixel_values"], output_names=["embeddings"],
+                          dynamic_axes={"pixel_values": {0: "batch"}, "embeddings": {0: "batch"}},
+                          opset_version=OPSET)
+        written.append(path)
+
+        tokens = processor(text=["a photo of a cat"], return_tensors="pt", padding=True)
+        path = os.path.join(output_dir, CLIP_TEXT_FILE)
+        torch.onnx.export(TextTower(clip), (tokens["input_ids"], tokens["attention_mask"]), path,
+                          input_names=["input_ids", "attention_mask"], output_names=["embeddings"],
+                          dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                                        "attention_mask": {0: "batch", 1: "sequence"},
+                                        "embeddings": {0: "batch"}},
+                          opset_version=OPSET)
+        written.append(path)
+
+        st_model = sentence_transformers.SentenceTransformer(TEXT_MODEL_NAME, device="cpu")
+        st_model.tokenizer.save_pretrained(os.path.join(output_dir, MINILM_TOKENIZER_DIR))
+        tokens = st_model.tokenizer(["a sentence"], return_tensors="pt", padding=True)
+        path = os.path.join(output_dir, MINILM_FILE)
+        torch.onnx.export(SentenceEncoder(st_model),
+                          (tokens["input_ids"], tokens["attention_mask"], tokens["token_type_ids"]), path,
+                          input_names=["input_ids", "attention_mask", "token_type_ids"], output_names=["embeddings"],
+                          dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                                        "attention_mask": {0: "batch", 1: "sequence"},
+                                        "token_type_ids": {0: "batch", 1: "sequence"},
+                                        "embeddings": {0: "batch"}},
+                          opset_version=OPSET)
+        written.append(path)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        for name in (CLIP_IMAGE_FILE, CLIP_TEXT_FILE, MINILM_FILE):
+            target = _model_file(output_dir, name, int8=True)
+            quantize_dynamic(os.path.join(output_dir, name), target, weight_type=QuantType.QInt8)
+            written.append(target)
+
+    return written
+
+def _session(path: str, threads: int):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # 0 lets ONNX Runtime use every physical core
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+class OnnxCLIP:
+    """CLIP image and text towers on ONNX Runtime; returns NumPy arrays"""
+
+    def __init__(self, root: str, int8: bool = False, threads: int = 0):
+        self.image_session = _session(_model_file(root, CLIP_IMAGE_FILE, int8), threads)
+        self.text_session = _session(_model_file(root, CLIP_TEXT_FILE, int8), threads)
+
+    def get_image_features(self, pixel_values) -> np.ndarray:
+        return self.image_session.run(None, {"pixel_values": np.asarray(pixel_values, dtype=np.float32)})[0]
+
+    def get_text_features(self, input_ids, attention_mask) -> np.ndarray:
+        return self.text_session.run(None, {"input_ids": np.asarray(input_ids, dtype=np.int64),
+                                            "attention_mask": np.asarray(attention_mask, dtype=np.int64)})[0]
+
+class OnnxSentenceEncoder:
+    """MiniLM on ONNX Runtime with the same encode() call shape as SentenceTransformer"""
+
+    def __init__(self, root: str, int8: bool = False, threads: int = 0, max_seq_length: int = 256):
+        from transformers import AutoTokenizer
+
+        self.session = _session(_model_file(root, MINILM_FILE, int8), threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.join(root, MINILM_TOKENIZER_DIR))
+        self.max_seq_length = max_seq_length
+
+    def encode(self, sentences, batch_size: int = 32) -> np.ndarray:
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+
+        outputs = []
+        for start in range(0, len(sentences), batch_size):
+            tokens = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            feed = {name: tokens[name].astype(np.int64) for name in ("input_ids", "attention_mask", "token_type_ids")}
+            outputs.append(self.session.run(None, feed)[0])
+
+        embeddings = np.concatenate(outputs) if outputs else np.empty((0, 384), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+def _runtime_options() -> dict:
+    return {
+        "root": onnx_dir(),
+        "int8": os.getenv("DEEPSEARCH_ONNX_INT8", "0") == "1",
+        "threads": int(os.getenv("DEEPSEARCH_ONNX_THREADS", "0")),
+    }
+
+@contextmanager
+def _export_lock(root: str):
+    # Worker processes and bulk_ingest shards can all hit a missing export at once
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): concurrent exports are wasted work, but the renames below stay atomic
+        yield
+        return
+
+    with open(os.path.join(root, ".export.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _ensure_exported(root: str, int8: bool):
+    # Export on first use so a fresh deployment only needs the env switch
+    names = (CLIP_IMAGE_FILE, CLIP_TEXT_FILE, MINILM_FILE)
+
+    def ready():
+        return all(os.path.exists(_model_file(root, name, int8)) for name in names)
+
+    if ready(): return
+
+    os.makedirs(root, exist_ok=True)
+    with _export_lock(root):
+        # Another process may have finished the export while this one waited
+        if ready(): return
+
+        print(f"Exporting ONNX models to {root} (int8={int8})")
+        staging = tempfile.mkdtemp(prefix=".export-", dir=root)
+        try:
+            export_models(staging, quantize=int8)
+
+            # Readers only look for the .onnx files, so those are moved in last; os.replace
+            # means a reader sees either no file or a complete one, never a partial write
+            for entry in sorted(os.listdir(staging), key=lambda name: name.endswith(".onnx")):
+                target = os.path.join(root, entry)
+                if os.path.isdir(target): continue
+                os.replace(os.path.join(staging, entry), target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+def load_clip_onnx() -> dict:
+    from transformers import CLIPProcessor
+
+    options = _runtime_options()
+    _ensure_exported(options["root"], options["int8"])
+    return {
+        "model": OnnxCLIP(**options),
+        "processor": CLIPProcessor.from_pretrained(os.path.join(options["root"], CLIP_PROCESSOR_DIR)),
+        "device": "cpu",
+        "runtime": "onnx",
+    }
+
+def load_minilm_onnx() -> dict:
+    options = _runtime_options()
+    _ensure_exported(options["root"], options["int8"])
+    return {"model": OnnxSentenceEncoder(**options), "device": "cpu", "runtime": "onnx"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export CLIP and MiniLM to ONNX for CPU inference")
+    parser.add_argument("--out", default=None, help="Defaults to $DEEPSEARCH_ONNX_DIR or models/onnx")
+    parser.add_argument("--quantize", action="store_true", help="Also write int8 dynamically quantized models")
+    args = parser.parse_args()
+
+    written = export_models(args.out, quantize=args.quantize)
+    print(f"Exported: {', '.join(written)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+# CLIPImageProcessor settings for openai/clip-vit-base-patch32
+CLIP_IMAGE_SIZE = 224
+CLIP_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+CLIP_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+# Rough peak memory per frame of a CLIP ViT-B/32 forward pass (input, activations, attention)
+CLIP_BYTES_PER_FRAME = 24 * 1024 * 1024
+
+class ClipPreprocessor:
+    """
+    Batched replacement for CLIPProcessor's image path. Crops and resizes each
+    BGR frame with OpenCV into a reused uint8 staging buffer, then converts
+    BGR -> RGB, rescales and normalizes the whole batch in place in a reused
+    float32 NCHW buffer. Not thread-safe; use one instance per thread
+    """
+
+    def __init__(self, size: int = CLIP_IMAGE_SIZE, mean: np.ndarray = CLIP_MEAN, std: np.ndarray = CLIP_STD):
+        self.size = size
+        # x / 255 then (x - mean) / std, folded into one multiply and one subtract
+        self.scale = (1.0 / (255.0 * np.asarray(std, dtype=np.float32))).reshape(1, 3, 1, 1)
+        self.offset = (np.asarray(mean, dtype=np.float32) / np.asarray(std, dtype=np.float32)).reshape(1, 3, 1, 1)
+        self._staging = np.empty((0, size, size, 3), dtype=np.uint8)
+        self._batch = np.empty((0, 3, size, size), dtype=np.float32)
+
+    def _reserve(self, count: int):
+        # Buffers only grow, so steady-state batches allocate nothing
+        if count > len(self._batch):
+            self._staging = np.empty((count, self.size, self.size, 3), dtype=np.uint8)
+            self._batch = np.empty((count, 3, self.size, self.size), dtype=np.float32)
+
+    def _resize_crop(self, frame: np.ndarray, out: np.ndarray):
+        height, width = frame.shape[:2]
+        size = self.size
+
+        # Resizing the shortest side to `size` and center-cropping a square equals cropping the
+        # central square first and resizing only that, which skips the discarded pixels
+        side = min(height, width)
+        top = (height - side) // 2
+        left = (width - side) // 2
+        square = frame[top:top + side, left:left + side]
+
+        # INTER_AREA antialiases when shrinking, like PIL's bicubic resize does
+        interpolation = cv2.INTER_AREA if side > size else cv2.INTER_CUBIC
+        cv2.resize(square, (size, size), dst=out, interpolation=interpolation)
+
+    def __call__(self, frames: list) -> np.ndarray:
+        """
+        Preprocesses BGR frames for CLIP
+
+        Args:
+            frames (list): uint8 BGR images (H, W, 3) as decoded by OpenCV
+
+        Return:
+            np.ndarray: float32 (N, 3, size, size) pixel values. A view of an internal
+            buffer that is overwritten by the next call
+        """
+        count = len(frames)
+        self._reserve(count)
+        staging, batch = self._staging[:count], self._batch[:count]
+
+        for frame, out in zip(frames, staging):
+            self._resize_crop(frame, out)
+
+        # BGR -> RGB and HWC -> CHW are strides only; the cast happens in the single copy
+        np.copyto(batch, staging[..., ::-1].transpose(0, 3, 1, 2), casting="unsafe")
+        batch *= self.scale
+        batch -= self.offset
+        return batch
+
+_local = threading.local()
+
+def preprocess_frames(frames: list) -> np.ndarray:
+    """CLIP pixel values for BGR frames, using a per-thread ClipPreprocessor"""
+    preprocessor = getattr(_local, "clip", None)
+    if preprocessor is None:
+        preprocessor = _local.clip = ClipPreprocessor()
+    return preprocessor(frames)
+
+def _available_memory(device: str) -> int:
+    if device.startswith("cuda"):
+        import torch
+        free, _ = torch.cuda.mem_get_info()
+        return free
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def adaptive_batch_size(device: str = "cpu", bytes_per_item: int = CLIP_BYTES_PER_FRAME, memory_fraction: float = None,
+                        minimum: int = 4, maximum: int = 128, default: int = 32) -> int:
+    """
+    Picks a batch size that fits in the memory currently available
+
+    Args:
+        device (str): "cpu" or a CUDA device
+        bytes_per_item (int): Peak memory one item adds to a batch
+        memory_fraction (float, optional): Share of free memory one batch may use.
+            Defaults to $DEEPSEARCH_BATCH_MEMORY_FRACTION or 0.25
+        minimum (int): Smallest batch size returned
+        maximum (int): Largest batch size returned
+        default (int): Used when free memory can't be read
+
+    Return:
+        int: Batch size, a multiple of 4 where possible
+    """
+    if memory_fraction is None:
+        memory_fraction = float(os.getenv("DEEPSEARCH_BATCH_MEMORY_FRACTION", "0.25"))
+
+    available = _available_memory(device)
+    if available is None:
+        return default
+
+    size = int(available * memory_fraction // bytes_per_item)
+    if size >= 8:
+        size -= size % 4
+    return max(minimum, min(maximum, size))
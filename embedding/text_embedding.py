@@ -1,6 +1,6 @@
-import sentence_transformers
+from core import metrics
+from embedding.models import get_minilm
 
-model = sentence_transformers.SentenceTransformer('all-MiniLM-L6-v2')
 def get_text_embeddings(texts: list) -> list:
     """
         Get text embeddings based on the audio transcription of the video
@@ -13,4 +13,5 @@ def get_text_embeddings(texts: list) -> list:
             list: List of embeddings for each text segment after encoding
     """
     texts = [seg["text"] for seg in texts]
-    return model.encode(texts)
\ No newline at end of file
+    with metrics.span("text_embed", items=len(texts), nbytes=sum(len(t) for t in texts)):
+        return get_minilm()["model"].encode(texts)
\ No newline at end of file
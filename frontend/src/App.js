@@ -38,23 +38,46 @@ function App() {
 
   const videoRef = useRef(null);
 
+  const [videoId, setVideoId] = useState(null);
+  const [rates, setRates] = useState(null);
+
+  const applyStatus = (data) => {
+    if (data.status !== status) setStatus(data.status);
+    if (data.progress !== progress) setProgress(data.progress);
+    if (data.filename) setFilename(data.filename);
+    if (data.video_id) setVideoId(data.video_id);
+    if (data.rates) setRates({ ...data.rates, eta: data.eta_seconds });
+  };
+
   // --- POLLING & INIT ---
+  // Polls /status until a job is processing; the SSE stream below takes over from there
   useEffect(() => {
     const checkStatus = async () => {
       try {
         const res = await axios.get(`${API_URL}/status`, { timeout: 2000 });
         setIsBackendOnline(true);
-        if (res.data.status !== status) setStatus(res.data.status);
-        if (res.data.progress !== progress) setProgress(res.data.progress);
-        if (res.data.filename) setFilename(res.data.filename);
+        applyStatus(res.data);
       } catch (err) {
         setIsBackendOnline(false);
       }
     };
     checkStatus();
+    if (status === "processing" && videoId) return;
     const interval = setInterval(checkStatus, 1000); 
     return () => clearInterval(interval);
-  }, [status, progress]);
+  }, [status, progress, videoId]);
+
+  // --- LIVE PROGRESS (Server-Sent Events) ---
+  useEffect(() => {
+    if (status !== "processing" || !videoId) return;
+    const source = new EventSource(`${API_URL}/progress/${videoId}/stream`);
+    source.onmessage = (e) => applyStatus(JSON.parse(e.data));
+    // The job was dropped (e.g. by a reset); close instead of letting EventSource reconnect, and poll
+    source.addEventListener("end", () => { source.close(); setVideoId(null); });
+    // On error, fall back to polling
+    source.onerror = () => { source.close(); setVideoId(null); };
+    return () => source.close();
+  }, [status, videoId]);
 
   // --- HANDLERS ---
   const handleUpload = async (e) => {
@@ -70,8 +93,18 @@ function App() {
 
     try {
       setStatus("uploading");
-      await axios.post(`${API_URL}/upload`, formData);
-      setStatus("processing");
+      const res = await axios.post(`${API_URL}/upload`, formData);
+      setFilename(res.data.filename);
+      if (res.data.message === "Duplicate" && res.data.status === "completed") {
+        // Same file as one already indexed; its index is searchable right away
+        setVideoId(res.data.video_id);
+        setProgress(100);
+        setStatus("completed");
+        return;
+      }
+      // Queued for the ingestion workers; polling picks it up until it starts
+      setVideoId(null);
+      setStatus("queued");
     } catch (err) {
       alert("Upload failed");
       setStatus("no_index");
@@ -178,7 +211,7 @@ function App() {
           <div className="loading-left">
             <div className="hero-title">Indexing {filename}</div>
             <div className="hero-subtitle">
-              {status === "uploading" ? "Uploading to server..." : "Extracting multimodal features..."}
+              {status === "uploading" ? "Uploading to server..." : status === "queued" ? "Waiting for a free worker..." : "Extracting multimodal features..."}
             </div>
             
             <div className="progress-track">
@@ -190,6 +223,13 @@ function App() {
               <span>{progress}%</span>
             </div>
 
+            {rates && (
+              <div style={{fontSize: '0.8rem', color: '#888', marginBottom: '20px', display: 'flex', justifyContent: 'space-between'}}>
+                <span>{rates.frames_per_sec} frames/s · {rates.segments_per_sec} segments/s</span>
+                <span>{rates.eta != null ? `ETA ${Math.round(rates.eta)}s` : ""}</span>
+              </div>
+            )}
+
             <button className="cancel-btn" onClick={handleHardReset}>
               Cancel Operation
             </button>
@@ -313,8 +353,8 @@ function App() {
       {renderHeader()}
       
       {(status === "startup" || status === "no_index") && renderUploadView()}
-      {(status === "uploading" || status === "processing") && renderLoadingView()}
-      {(status === "completed" || status === "failed") && renderWorkspace()}
+      {(status === "uploading" || status === "queued" || status === "processing") && renderLoadingView()}
+      {(status === "completed" || status === "failed" || status === "cancelled") && renderWorkspace()}
     </div>
   );
 }
@@ -0,0 +1,151 @@
+import argparse
+import math
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexing.quantization import EMBEDDING_FORMATS, DIMENSIONS, get_embedding_format, pg_column_type
+
+ANN_METHODS = ("hnsw", "ivfflat")
+
+# Tables with an embedding column searched by cosine distance
+INDEXED_TABLES = ("frames", "text_segments")
+
+def index_name(table: str, method: str, embedding_format: str = "float32") -> str:
+    if embedding_format == "float32":
+        return f"{table}_embedding_{method}_idx"
+    return f"{table}_embedding_{method}_{embedding_format}_idx"
+
+def index_target(table: str, embedding_format: str) -> str:
+    """Indexed expression and operator class for a storage format"""
+    if embedding_format == "binary":
+        # Index the sign bits only; query() reranks the shortlist against the full vectors
+        return f"(binary_quantize(embedding)::bit({DIMENSIONS[table]})) bit_hamming_ops"
+    return f"embedding {pg_column_type(embedding_format)}_cosine_ops"
+
+def drop_indexes(cur, tables=INDEXED_TABLES, keep: str = None):
+    """Drops every ANN index this module manages on the given tables, except the one named keep"""
+    for table in tables:
+        for method in ANN_METHODS:
+            for fmt in EMBEDDING_FORMATS:
+                name = index_name(table, method, fmt)
+                if name != keep:
+                    cur.execute(f"DROP INDEX IF EXISTS {name}")
+
+def _ivfflat_lists(row_count: int) -> int:
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond that
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+def build_indexes(conn, method: str = "hnsw", m: int = 16, ef_construction: int = 64, lists: int = None,
+                  rebuild: bool = False, maintenance_work_mem: str = None, embedding_format: str = None):
+    """
+    Creates (or rebuilds) cosine ANN indexes on frames and text_segments
+
+    Args:
+        conn: Database connection
+        method (str): Index type ("hnsw" or "ivfflat")
+        m (int): HNSW graph degree
+        ef_construction (int): HNSW build-time candidate list size
+        lists (int, optional): IVFFlat list count. Derived from the row count if not given
+        rebuild (bool): Drop and recreate existing indexes, e.g. after a bulk load
+        maintenance_work_mem (str, optional): Memory for the build, e.g. "2GB"
+        embedding_format (str, optional): Storage format (see indexing.quantization). Defaults to the configured one
+
+    Return:
+        list: Names of the indexes created
+    """
+    if method not in ANN_METHODS:
+        raise ValueError(f"Unknown ANN method '{method}', expected one of {ANN_METHODS}")
+
+    embedding_format = get_embedding_format(embedding_format)
+    created = []
+
+    with conn.cursor() as cur:
+        if maintenance_work_mem:
+            cur.execute("SELECT set_config('maintenance_work_mem', %s, false)", (maintenance_work_mem,))
+
+        for table in INDEXED_TABLES:
+            name = index_name(table, method, embedding_format)
+
+            # Only one ANN index per table; a different method or format replaces it
+            drop_indexes(cur, tables=[table], keep=None if rebuild else name)
+
+            if method == "hnsw":
+                options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+            else:
+                # IVFFlat centroids are trained on existing rows, so build after loading
+                table_lists = lists
+                if table_lists is None:
+                    cur.execute(f"SELECT count(*) FROM {table}")
+                    table_lists = _ivfflat_lists(cur.fetchone()[0])
+                options = f"lists = {int(table_lists)}"
+
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING {method} ({index_target(table, embedding_format)}) WITH ({options})")
+            cur.execute(f"ANALYZE {table}")
+            created.append(name)
+
+    conn.commit()
+    return created
+
+# pgvector rejects larger hnsw.ef_search values
+HNSW_MAX_EF_SEARCH = 1000
+
+def ef_search_for(depth: int, ef_search: int = None) -> int:
+    """
+    HNSW returns at most ef_search rows (pgvector defaults to 40), so a query that
+    needs depth rows asks for at least that many, up to pgvector's limit
+
+    Args:
+        depth (int): Rows the query has to get back from the index
+        ef_search (int, optional): Caller's recall knob; kept when larger
+    """
+    return min(max(ef_search or 0, depth), HNSW_MAX_EF_SEARCH)
+
+def search_param_statements(ef_search: int = None, probes: int = None) -> list:
+    """(sql, params) pairs that apply the per-query recall knobs; shared by the sync and async paths"""
+    # set_config(..., true) is transaction-local, so pooled connections are not affected
+    statements = []
+    if ef_search is not None:
+        statements.append(("SELECT set_config('hnsw.ef_search', %s, true)", (str(int(ef_search)),)))
+    if probes is not None:
+        statements.append(("SELECT set_config('ivfflat.probes', %s, true)", (str(int(probes)),)))
+    return statements
+
+def set_search_params(cur, ef_search: int = None, probes: int = None):
+    """
+    Applies per-query recall knobs for the current transaction
+
+    Args:
+        cur: Cursor the similarity query will run on
+        ef_search (int, optional): HNSW candidate list size (higher = better recall, slower)
+        probes (int, optional): IVFFlat lists to scan (higher = better recall, slower)
+    """
+    for sql, params in search_param_statements(ef_search, probes):
+        cur.execute(sql, params)
+
+def main():
+    from indexing.insert import get_connection
+
+    parser = argparse.ArgumentParser(description="Build or rebuild ANN indexes on frame and text embeddings")
+    parser.add_argument("--method", choices=ANN_METHODS, default="hnsw")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--rebuild", action="store_true", help="Drop and recreate existing indexes")
+    parser.add_argument("--maintenance-work-mem", default=None, help='e.g. "2GB"')
+    parser.add_argument("--format", choices=EMBEDDING_FORMATS, default=None, help="Defaults to $DEEPSEARCH_EMBEDDING_FORMAT")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    created = build_indexes(conn, method=args.method, m=args.m, ef_construction=args.ef_construction,
+                            lists=args.lists, rebuild=args.rebuild, maintenance_work_mem=args.maintenance_work_mem,
+                            embedding_format=args.format)
+    conn.close()
+
+    print(f"Indexes ready: {', '.join(created)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import asyncio
+from abc import ABC, abstractmethod
+import threading
+from indexing.insert import (connection, async_connection, async_pool_stats, insert_frames_bulk,
+                             insert_text_segments_bulk)
+from indexing.ann_index import set_search_params, search_param_statements, ef_search_for
+from indexing.quantization import get_embedding_format, pg_column_type, DIMENSIONS, DEFAULT_RERANK_FACTOR
+from core import metrics
+
+INDEX_BACKENDS = ("pgvector", "mmap")
+
+class IndexBackend(ABC):
+    """
+    Where frame and transcript embeddings are stored and searched. The video
+    registry (titles, status, progress) always lives in PostgreSQL
+    """
+
+    @abstractmethod
+    def add_frames(self, video_id: int, timestamps, image_paths: list, embeddings, end_timestamps=None,
+                   skip_existing: bool = False) -> int:
+        """skip_existing drops rows already stored for the same (video, timestamp), for replays after a crash"""
+
+    @abstractmethod
+    def add_text_segments(self, video_id: int, start_times, end_times, texts: list, embeddings,
+                          skip_existing: bool = False) -> int:
+        """skip_existing drops rows already stored for the same (video, start time), for replays after a crash"""
+
+    def refresh(self):
+        """Picks up rows other processes (ingestion workers) have written; no-op for shared stores"""
+        pass
+
+    @abstractmethod
+    def search(self, frame_embedding, text_embedding, limit: int = 5, ef_search: int = None, probes: int = None) -> dict:
+        """
+        Return:
+            dict: {"frames": [(timestamp, image_path, score, end_timestamp)],
+                   "text": [(start_time, end_time, text, score)]}, best match first
+        """
+
+    async def search_async(self, frame_embedding, text_embedding, limit: int = 5, ef_search: int = None,
+                           probes: int = None) -> dict:
+        """Same as search() without blocking the event loop. Backends override this to run both modalities concurrently"""
+        return await asyncio.to_thread(self.search, frame_embedding, text_embedding, limit, ef_search, probes)
+
+    def finalize(self, video_id: int):
+        """Called once a video is fully ingested"""
+
+    @abstractmethod
+    def reset(self):
+        """Removes every stored embedding"""
+
+_SEARCH_COLUMNS = {
+    "frames": "timestamp, image_path, 1 - (embedding <=> %(emb)s::{type}) AS score, COALESCE(end_timestamp, timestamp)",
+    "text_segments": "start_time, end_time, text, 1 - (embedding <=> %(emb)s::{type}) AS score",
+}
+
+def _similarity_sql(table: str, embedding_format: str) -> str:
+    column_type = pg_column_type(embedding_format)
+    columns = _SEARCH_COLUMNS[table].format(type=column_type)
+
+    if embedding_format == "binary":
+        # First pass: Hamming distance over the indexed sign bits. Second pass: exact cosine on the shortlist
+        bits = f"bit({DIMENSIONS[table]})"
+        return (f"SELECT {columns} FROM ("
+                f"SELECT * FROM {table} ORDER BY binary_quantize(embedding)::{bits} <~> binary_quantize(%(emb)s::vector)::{bits} "
+                f"LIMIT %(shortlist)s) shortlist "
+                f"ORDER BY embedding <=> %(emb)s::vector LIMIT %(limit)s")
+
+    # Order by the distance operator itself so pgvector can use the ANN index
+    return f"SELECT {columns} FROM {table} ORDER BY embedding <=> %(emb)s::{column_type} LIMIT %(limit)s"
+
+class PgvectorBackend(IndexBackend):
+    """Embeddings in the frames/text_segments tables, searched with pgvector"""
+
+    def __init__(self, embedding_format: str = None, rerank_factor: int = DEFAULT_RERANK_FACTOR):
+        self.embedding_format = get_embedding_format(embedding_format)
+        self.rerank_factor = rerank_factor
+
+        # Fails early for formats pgvector can't store
+        pg_column_type(self.embedding_format)
+
+    def _index_depth(self, limit: int) -> int:
+        # Rows the ANN index must hand back: the binary first pass reads the whole rerank shortlist
+        return limit * self.rerank_factor if self.embedding_format == "binary" else limit
+
+    def add_frames(self, video_id, timestamps, image_paths, embeddings, end_timestamps=None, skip_existing=False):
+        with connection() as conn:
+            return insert_frames_bulk(conn, video_id, timestamps, image_paths, embeddings, end_timestamps=end_timestamps,
+                                      skip_existing=skip_existing)
+
+    def add_text_segments(self, video_id, start_times, end_times, texts, embeddings, skip_existing=False):
+        with connection() as conn:
+            return insert_text_segments_bulk(conn, video_id, start_times, end_times, texts, embeddings,
+                                             skip_existing=skip_existing)
+
+    def search(self, frame_embedding, text_embedding, limit=5, ef_search=None, probes=None):
+        frame_embedding = list(map(float, frame_embedding))
+        text_embedding = list(map(float, text_embedding))
+
+        with connection() as conn:
+            cur = conn.cursor()
+
+            set_search_params(cur, ef_search=ef_search_for(self._index_depth(limit), ef_search), probes=probes)
+
+            params = {"limit": limit, "shortlist": limit * self.rerank_factor}
+
+            with metrics.span("similarity_frames", backend="pgvector") as span:
+                cur.execute(_similarity_sql("frames", self.embedding_format), {**params, "emb": frame_embedding})
+                frame_results = cur.fetchall()
+                span.add(items=len(frame_results))
+
+            with metrics.span("similarity_text", backend="pgvector") as span:
+                cur.execute(_similarity_sql("text_segments", self.embedding_format), {**params, "emb": text_embedding})
+                text_results = cur.fetchall()
+                span.add(items=len(text_results))
+
+        return {"frames": frame_results, "text": text_results}
+
+    async def _search_table_async(self, table: str, embedding: list, params: dict, ef_search, probes) -> list:
+        # One connection per modality, so the two similarity queries run at the same time
+        stage = "similarity_frames" if table == "frames" else "similarity_text"
+        async with async_connection() as conn:
+            async with conn.cursor() as cur:
+                for sql, knob in search_param_statements(ef_search=ef_search, probes=probes):
+                    await cur.execute(sql, knob)
+                with metrics.span(stage, backend="pgvector") as span:
+                    await cur.execute(_similarity_sql(table, self.embedding_format), {**params, "emb": embedding})
+                    rows = await cur.fetchall()
+                    span.add(items=len(rows))
+                return rows
+
+    async def search_async(self, frame_embedding, text_embedding, limit=5, ef_search=None, probes=None):
+        # Without the async pool, fall back to the sync path on a worker thread
+        if async_pool_stats() is None:
+            return await super().search_async(frame_embedding, text_embedding, limit, ef_search, probes)
+
+        params = {"limit": limit, "shortlist": limit * self.rerank_factor}
+        ef_search = ef_search_for(self._index_depth(limit), ef_search)
+
+        frame_results, text_results = await asyncio.gather(
+            self._search_table_async("frames", list(map(float, frame_embedding)), params, ef_search, probes),
+            self._search_table_async("text_segments", list(map(float, text_embedding)), params, ef_search, probes),
+        )
+        return {"frames": frame_results, "text": text_results}
+
+    def reset(self):
+        with connection() as conn:
+            conn.execute("TRUNCATE TABLE frames, text_segments RESTART IDENTITY")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend(name: str = None) -> IndexBackend:
+    """
+    Returns the process-wide index backend
+
+    Args:
+        name (str, optional): "pgvector" or "mmap". Defaults to $DEEPSEARCH_INDEX_BACKEND or "pgvector"
+
+    Return:
+        IndexBackend: Shared backend instance
+    """
+    global _backend
+
+    # The first call decides; later calls share that instance
+    if _backend is not None:
+        return _backend
+
+    name = name or os.getenv("DEEPSEARCH_INDEX_BACKEND", "pgvector")
+
+    with _backend_lock:
+        if _backend is None:
+            if name == "pgvector":
+                _backend = PgvectorBackend()
+            elif name == "mmap":
+                from indexing.mmap_index import MmapBackend
+                _backend = MmapBackend(os.getenv("DEEPSEARCH_INDEX_DIR", "index"))
+            else:
+                raise ValueError(f"Unknown index backend '{name}', expected one of {INDEX_BACKENDS}")
+    return _backend
@@ -1,11 +1,143 @@
+import os
 import psycopg as pg
 import numpy as np
+from contextlib import contextmanager, asynccontextmanager
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
+from indexing.quantization import get_embedding_format, pg_column_type
+from core import metrics
+
+# Optional: lets bulk inserts use binary COPY for the vector column
+try:
+    from pgvector.psycopg import register_vector
+except ImportError:
+    register_vector = None
+
+CONNINFO = "dbname=deepsearch user=postgres password=borris host=localhost port=5431"
+
+# Shared pool, opened by the API process. Scripts without a pool fall back to direct connections
+_pool = None
+
+# Async pool for the async search path; lives on the API's event loop
+_async_pool = None
 
 def get_connection():
     try: 
-        conn = pg.connect(dbname='deepsearch', user='postgres', password='borris', host='localhost', port=5431) 
+        conn = pg.connect(CONNINFO) 
         return conn
     except Exception as e: print(e)
+
+def open_pool(min_size: int = None, max_size: int = None, timeout: float = 30.0) -> ConnectionPool:
+    """
+    Opens the shared connection pool used by connection()
+
+    Args:
+        min_size (int, optional): Connections kept open. Defaults to $DEEPSEARCH_POOL_MIN or 2
+        max_size (int, optional): Upper bound on connections. Defaults to $DEEPSEARCH_POOL_MAX or 10
+        timeout (float): Seconds a caller waits for a free connection before failing
+
+    Return:
+        ConnectionPool: The opened pool
+    """
+    global _pool
+
+    if min_size is None: min_size = int(os.getenv("DEEPSEARCH_POOL_MIN", 2))
+    if max_size is None: max_size = int(os.getenv("DEEPSEARCH_POOL_MAX", 10))
+
+    if _pool is None:
+        # check_connection pings each connection on checkout, so dead backends are replaced
+        _pool = ConnectionPool(CONNINFO, min_size=min_size, max_size=max_size, timeout=timeout,
+                               check=ConnectionPool.check_connection, name="deepsearch", open=True)
+    return _pool
+
+def close_pool():
+    global _pool
+
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+def pool_stats() -> dict:
+    """Pool size and wait metrics (requests_waiting, requests_wait_ms, ...) or None without a pool"""
+    if _pool is None: return None
+    return _pool.get_stats()
+
+async def open_async_pool(min_size: int = None, max_size: int = None, timeout: float = 30.0) -> AsyncConnectionPool:
+    """
+    Opens the shared async pool used by async_connection(). Must be called from the event loop that uses it
+
+    Args:
+        min_size (int, optional): Connections kept open. Defaults to $DEEPSEARCH_ASYNC_POOL_MIN or 2
+        max_size (int, optional): Upper bound on connections. Defaults to $DEEPSEARCH_ASYNC_POOL_MAX or 20
+        timeout (float): Seconds a caller waits for a free connection before failing
+
+    Return:
+        AsyncConnectionPool: The opened pool
+    """
+    global _async_pool
+
+    if min_size is None: min_size = int(os.getenv("DEEPSEARCH_ASYNC_POOL_MIN", 2))
+    # Each async search holds two connections at once (frames and text)
+    if max_size is None: max_size = int(os.getenv("DEEPSEARCH_ASYNC_POOL_MAX", 20))
+
+    if _async_pool is None:
+        _async_pool = AsyncConnectionPool(CONNINFO, min_size=min_size, max_size=max_size, timeout=timeout,
+                                          check=AsyncConnectionPool.check_connection, name="deepsearch-async",
+                                          open=False)
+        await _async_pool.open()
+    return _async_pool
+
+async def close_async_pool():
+    global _async_pool
+
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+def async_pool_stats() -> dict:
+    if _async_pool is None: return None
+    return _async_pool.get_stats()
+
+@asynccontextmanager
+async def async_connection(timeout: float = None):
+    """Async counterpart of connection(): pooled when the async pool is open, direct otherwise"""
+    if _async_pool is not None:
+        async with _async_pool.connection(timeout=timeout) as conn:
+            yield conn
+        return
+
+    conn = await pg.AsyncConnection.connect(CONNINFO)
+    try:
+        yield conn
+        await conn.commit()
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        await conn.close()
+
+@contextmanager
+def connection(timeout: float = None):
+    """
+    Borrows a connection, from the pool when one is open. Commits on success and
+    rolls back on error, like psycopg_pool's own connection() context
+
+    Args:
+        timeout (float, optional): Max seconds to wait for a pooled connection (pool default if None)
+    """
+    if _pool is not None:
+        with _pool.connection(timeout=timeout) as conn:
+            yield conn
+        return
+
+    conn = pg.connect(CONNINFO)
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 def insert_video(conn, name: str, path: str) -> int:
     cur = conn.cursor()
 
@@ -15,13 +147,16 @@ def insert_video(conn, name: str, path: str) -> int:
     conn.commit()
     cur.close()
     return video_id
-def insert_frame(conn, video_id: int, timestamp: float, image_path: str, embedding: np.ndarray):
+def insert_frame(conn, video_id: int, timestamp: float, image_path: str, embedding: np.ndarray, end_timestamp: float = None):
 
     embedding_list = embedding.tolist()
 
+    # A frame with no span only stands for its own timestamp
+    if end_timestamp is None: end_timestamp = timestamp
+
     with conn.cursor() as cur:
-        cur.execute("INSERT INTO frames (video_id, timestamp, image_path, embedding) VALUES (%s, %s, %s, %s)",
-                    (video_id, timestamp, image_path, embedding_list))
+        cur.execute("INSERT INTO frames (video_id, timestamp, end_timestamp, image_path, embedding) VALUES (%s, %s, %s, %s, %s)",
+                    (video_id, timestamp, end_timestamp, image_path, embedding_list))
 
         conn.commit()
 def insert_text_segment(conn, video_id: int, start_time: float, end_time: float, text: str, embedding: np.ndarray):
@@ -32,4 +167,134 @@ def insert_text_segment(conn, video_id: int, start_time: float, end_time: float,
         cur.execute("INSERT INTO text_segments (video_id, start_time, end_time, text, embedding) VALUES (%s, %s, %s, %s, %s)",
                     (video_id, start_time, end_time, text, embedding_list))
 
-        conn.commit()
\ No newline at end of file
+        conn.commit()
+
+def _vector_literal(row: np.ndarray) -> str:
+    # str() of a float list is pgvector's text input format ("[0.1, 0.2, ...]")
+    return str(row.tolist())
+
+def _copy_rows(conn, table: str, columns: list, types: list, rows):
+    """
+    Streams rows into a table with COPY. Uses binary format when pgvector's
+    psycopg adapter is installed, otherwise text format with vector literals.
+    """
+    # The embedding column's pgvector type follows the configured storage format
+    types = types[:-1] + [pg_column_type(get_embedding_format())]
+    binary = register_vector is not None
+
+    if binary and conn.adapters.types.get(types[-1]) is None:
+        register_vector(conn)
+
+    fmt = "(FORMAT BINARY)" if binary else ""
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN {fmt}"
+
+    count = 0
+    with conn.cursor() as cur:
+        with cur.copy(statement) as copy:
+            if binary:
+                copy.set_types(types)
+            for row in rows:
+                if not binary:
+                    row = row[:-1] + (_vector_literal(row[-1]),)
+                copy.write_row(row)
+                count += 1
+    return count
+
+# Natural keys of re-runnable inserts; database_setup.py indexes each (not unique: a first run
+# may legitimately store two rows with the same key, e.g. Whisper segments sharing a start time)
+REPLAY_KEYS = {
+    "frames": ("video_id", "timestamp"),
+    "text_segments": ("video_id", "start_time"),
+}
+
+def _copy_rows_skip_existing(conn, table: str, columns: list, types: list, rows) -> int:
+    """
+    Idempotent variant of _copy_rows for replays: COPY into a session temp table, then
+    move over only the rows whose natural key isn't stored yet, so batches replayed
+    after a crash don't duplicate rows. Only the resume path uses it; one job writes a
+    video at a time, so the NOT EXISTS check doesn't race with other writers
+    """
+    stage = f"_{table}_stage"
+    column_list = ", ".join(columns)
+
+    with conn.cursor() as cur:
+        # Same column types as the target (including the vector type), no defaults or constraints
+        cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stage} AS SELECT {column_list} FROM {table} WITH NO DATA")
+
+    _copy_rows(conn, stage, columns, types, rows)
+
+    with conn.cursor() as cur:
+        match = " AND ".join(f"t.{key} = s.{key}" for key in REPLAY_KEYS[table])
+        cur.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} s "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE {match})")
+        inserted = cur.rowcount
+        cur.execute(f"TRUNCATE {stage}")
+    return inserted
+
+def insert_frames_bulk(conn, video_id: int, timestamps, image_paths: list, embeddings: np.ndarray, end_timestamps=None,
+                       commit: bool = True, skip_existing: bool = False) -> int:
+    """
+    Inserts many frames in one COPY and one transaction
+
+    Args:
+        conn: Database connection
+        video_id (int): Video the frames belong to
+        timestamps (array-like): Frame timestamps in seconds
+        image_paths (list): Preview path for each frame
+        embeddings (np.ndarray): (n, 512) embedding matrix
+        end_timestamps (array-like, optional): End of the span each frame covers (defaults to its timestamp)
+        commit (bool): Commit after the copy. Pass False to group several batches into one transaction
+        skip_existing (bool): Skip frames already stored for the same (video_id, timestamp)
+
+    Return:
+        int: Number of rows written
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    end_timestamps = timestamps if end_timestamps is None else np.asarray(end_timestamps, dtype=np.float64)
+
+    rows = ((video_id, ts, end_ts, path, emb)
+            for ts, end_ts, path, emb in zip(timestamps.tolist(), end_timestamps.tolist(), image_paths, embeddings))
+
+    copy_rows = _copy_rows_skip_existing if skip_existing else _copy_rows
+    with metrics.span("db_insert_frames", items=len(timestamps), nbytes=embeddings.nbytes):
+        count = copy_rows(conn, "frames",
+                           ["video_id", "timestamp", "end_timestamp", "image_path", "embedding"],
+                           ["int4", "float8", "float8", "text", "vector"],
+                           rows)
+        if commit: conn.commit()
+    return count
+
+def insert_text_segments_bulk(conn, video_id: int, start_times, end_times, texts: list, embeddings: np.ndarray,
+                              commit: bool = True, skip_existing: bool = False) -> int:
+    """
+    Inserts many transcript segments in one COPY and one transaction
+
+    Args:
+        conn: Database connection
+        video_id (int): Video the segments belong to
+        start_times (array-like): Segment start times in seconds
+        end_times (array-like): Segment end times in seconds
+        texts (list): Segment text
+        embeddings (np.ndarray): (n, 384) embedding matrix
+        commit (bool): Commit after the copy. Pass False to group several batches into one transaction
+        skip_existing (bool): Skip segments already stored for the same (video_id, start_time)
+
+    Return:
+        int: Number of rows written
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    start_times = np.asarray(start_times, dtype=np.float64)
+    end_times = np.asarray(end_times, dtype=np.float64)
+
+    rows = ((video_id, start, end, text, emb)
+            for start, end, text, emb in zip(start_times.tolist(), end_times.tolist(), texts, embeddings))
+
+    copy_rows = _copy_rows_skip_existing if skip_existing else _copy_rows
+    with metrics.span("db_insert_text", items=len(start_times), nbytes=embeddings.nbytes):
+        count = copy_rows(conn, "text_segments",
+                           ["video_id", "start_time", "end_time", "text", "embedding"],
+                           ["int4", "float8", "float8", "text", "vector"],
+                           rows)
+        if commit: conn.commit()
+    return count
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from indexing.backends import IndexBackend
+from core import metrics
+from indexing.quantization import (get_embedding_format, quantize_int8, quantize_binary, int8_scores,
+                                   binary_scores, DEFAULT_RERANK_FACTOR)
+
+# Rows scored per block; bounds the float32 copy made from float16 or int8 storage
+BLOCK_ROWS = 65536
+
+# Per kind: numeric columns stored as .npy, and the column holding row labels
+KINDS = {
+    "frames": ("timestamps", "end_timestamps"),
+    "text": ("start_times", "end_times"),
+}
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+class _Segment:
+    """One append's worth of rows: embeddings, optional codes and metadata columns, memory-mapped on demand"""
+
+    def __init__(self, path: str, kind: str, video_id: int):
+        self.path = path
+        self.kind = kind
+        self.video_id = video_id
+        self._embeddings = None
+        self._columns = None
+        self._labels = None
+        self._codes = None
+
+        # Quantized segments carry codes for the first pass; the format is whatever was written
+        if os.path.exists(os.path.join(path, "int8_codes.npy")):
+            self.codes_format = "int8"
+        elif os.path.exists(os.path.join(path, "binary_codes.npy")):
+            self.codes_format = "binary"
+        else:
+            self.codes_format = None
+
+    @property
+    def codes(self):
+        if self._codes is None and self.codes_format == "int8":
+            self._codes = (np.load(os.path.join(self.path, "int8_codes.npy"), mmap_mode="r"),
+                           np.load(os.path.join(self.path, "int8_scales.npy"), mmap_mode="r"))
+        elif self._codes is None and self.codes_format == "binary":
+            self._codes = np.load(os.path.join(self.path, "binary_codes.npy"), mmap_mode="r")
+        return self._codes
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        if self._embeddings is None:
+            self._embeddings = np.load(os.path.join(self.path, "embeddings.npy"), mmap_mode="r")
+        return self._embeddings
+
+    def column(self, name: str) -> np.ndarray:
+        if self._columns is None:
+            self._columns = {c: np.load(os.path.join(self.path, f"{c}.npy"), mmap_mode="r") for c in KINDS[self.kind]}
+        return self._columns[name]
+
+    @property
+    def labels(self) -> list:
+        # Image paths or transcript text; only read when a row from this segment is returned
+        if self._labels is None:
+            with open(os.path.join(self.path, "labels.json")) as f:
+                self._labels = json.load(f)
+        return self._labels
+
+    def _first_pass_scores(self, query: np.ndarray) -> np.ndarray:
+        rows = len(self.embeddings)
+        scores = np.empty(rows, dtype=np.float32)
+
+        if self.codes_format == "binary":
+            query_bits = quantize_binary(query)
+
+        for start in range(0, rows, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, rows)
+            if self.codes_format == "int8":
+                codes, scales = self.codes
+                scores[start:end] = int8_scores(codes[start:end], scales[start:end], query)
+            elif self.codes_format == "binary":
+                scores[start:end] = binary_scores(self.codes[start:end], query_bits)
+            else:
+                # halfvec rows are widened one block at a time, so resident memory stays at the float16 files
+                scores[start:end] = np.asarray(self.embeddings[start:end], dtype=np.float32) @ query
+        return scores
+
+    def top_k(self, query: np.ndarray, k: int, rerank_factor: int = DEFAULT_RERANK_FACTOR):
+        """
+        Scores every row against a normalized query; returns (scores, row indices) of the best k.
+        Quantized segments shortlist k * rerank_factor rows from their codes, then rescore
+        only those rows exactly
+        """
+        scores = self._first_pass_scores(query)
+
+        shortlist = k * rerank_factor if self.codes_format else k
+        if len(scores) > shortlist:
+            idx = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        else:
+            idx = np.arange(len(scores))
+
+        if not self.codes_format:
+            return scores[idx], idx
+
+        # Exact rerank reads only the shortlisted rows of the full-precision matrix
+        idx = np.sort(idx)
+        exact = np.asarray(self.embeddings[idx], dtype=np.float32) @ query
+        best = np.argsort(-exact)[:k]
+        return exact[best], idx[best]
+
+class MmapBackend(IndexBackend):
+    """
+    Embeddings stored on local disk as .npy files with metadata columns, searched
+    by brute-force cosine similarity. Needs no database for search.
+
+    Layout: {root}/{kind}/{video_id}/seg_{n}/ holding embeddings.npy, one .npy per
+    numeric column, labels.json and, for int8/binary formats, first-pass codes.
+    Every add writes a new segment; finalize() merges a video's segments into one
+    """
+
+    def __init__(self, root: str = "index", embedding_format: str = None, rerank_factor: int = DEFAULT_RERANK_FACTOR):
+        self.root = root
+        self.embedding_format = get_embedding_format(embedding_format)
+        self.rerank_factor = rerank_factor
+        self._lock = threading.Lock()
+        self._segments = {kind: [] for kind in KINDS}
+        self._next_seq = 0
+        self._load()
+
+    def _load(self):
+        for kind in KINDS:
+            self._segments[kind] = self._scan(kind, {})
+
+    def _scan(self, kind: str, known: dict) -> list:
+        # Segments on disk, reusing already-open ones (and their mmaps) by path
+        segments = []
+        kind_dir = os.path.join(self.root, kind)
+        if not os.path.isdir(kind_dir): return segments
+
+        for video in sorted(os.listdir(kind_dir)):
+            video_dir = os.path.join(kind_dir, video)
+            try:
+                names = sorted(os.listdir(video_dir))
+            except FileNotFoundError:
+                continue
+            for seg in names:
+                # Unfinished writes are left as .tmp directories; skip them
+                if not seg.startswith("seg_"): continue
+                path = os.path.join(video_dir, seg)
+                segments.append(known.get(path) or _Segment(path, kind, int(video)))
+                self._next_seq = max(self._next_seq, int(seg[len("seg_"):]) + 1)
+        return segments
+
+    def refresh(self):
+        """Rescans the index directory for segments written or merged away by other processes"""
+        for kind in KINDS:
+            with self._lock:
+                known = {s.path: s for s in self._segments[kind]}
+            segments = self._scan(kind, known)
+            with self._lock:
+                self._segments[kind] = segments
+
+    def _write_segment(self, kind: str, video_id: int, embeddings, columns: dict, labels: list) -> int:
+        embeddings = _normalize(embeddings)
+        if len(embeddings) == 0: return 0
+
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+
+        video_dir = os.path.join(self.root, kind, str(video_id))
+        final_path = os.path.join(video_dir, f"seg_{seq:08d}")
+        tmp_path = final_path + ".tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        start = time.perf_counter()
+
+        # Full-precision rows: float32, or float16 for halfvec (half the disk; widened once when
+        # first scored). Quantized formats add first-pass codes and only rerank from these rows
+        full_dtype = np.float16 if self.embedding_format == "halfvec" else np.float32
+        np.save(os.path.join(tmp_path, "embeddings.npy"), embeddings.astype(full_dtype))
+
+        if self.embedding_format == "int8":
+            codes, scales = quantize_int8(embeddings)
+            np.save(os.path.join(tmp_path, "int8_codes.npy"), codes)
+            np.save(os.path.join(tmp_path, "int8_scales.npy"), scales)
+        elif self.embedding_format == "binary":
+            np.save(os.path.join(tmp_path, "binary_codes.npy"), quantize_binary(embeddings))
+
+        for name, values in columns.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(values, dtype=np.float64))
+        with open(os.path.join(tmp_path, "labels.json"), "w") as f:
+            json.dump(list(labels), f)
+
+        # The rename makes the segment visible all at once
+        os.rename(tmp_path, final_path)
+        metrics.observe(f"mmap_write_{kind}", time.perf_counter() - start, items=len(embeddings), nbytes=embeddings.nbytes)
+
+        with self._lock:
+            self._segments[kind].append(_Segment(final_path, kind, video_id))
+        return len(embeddings)
+
+    def _new_rows(self, kind: str, video_id: int, keys) -> np.ndarray:
+        # Mask of rows whose key (first column) isn't stored for this video yet
+        with self._lock:
+            parts = [s for s in self._segments[kind] if s.video_id == video_id]
+        if not parts:
+            return np.ones(len(keys), dtype=bool)
+
+        stored = np.concatenate([np.asarray(s.column(KINDS[kind][0])) for s in parts])
+        return ~np.isin(np.asarray(keys, dtype=np.float64), stored)
+
+    def add_frames(self, video_id, timestamps, image_paths, embeddings, end_timestamps=None, skip_existing=False):
+        if end_timestamps is None: end_timestamps = timestamps
+
+        if skip_existing:
+            keep = self._new_rows("frames", video_id, timestamps)
+            timestamps, end_timestamps = np.asarray(timestamps)[keep], np.asarray(end_timestamps)[keep]
+            image_paths = [path for path, k in zip(image_paths, keep) if k]
+            embeddings = np.asarray(embeddings)[keep]
+
+        return self._write_segment("frames", video_id, embeddings,
+                                   {"timestamps": timestamps, "end_timestamps": end_timestamps}, image_paths)
+
+    def add_text_segments(self, video_id, start_times, end_times, texts, embeddings, skip_existing=False):
+        if skip_existing:
+            keep = self._new_rows("text", video_id, start_times)
+            start_times, end_times = np.asarray(start_times)[keep], np.asarray(end_times)[keep]
+            texts = [text for text, k in zip(texts, keep) if k]
+            embeddings = np.asarray(embeddings)[keep]
+
+        return self._write_segment("text", video_id, embeddings,
+                                   {"start_times": start_times, "end_times": end_times}, texts)
+
+    def finalize(self, video_id):
+        """Merges the video's per-batch segments so search touches one file per video"""
+        for kind, (first_col, second_col) in KINDS.items():
+            with self._lock:
+                parts = [s for s in self._segments[kind] if s.video_id == video_id]
+            if len(parts) < 2: continue
+
+            self._write_segment(
+                kind, video_id,
+                np.concatenate([np.asarray(s.embeddings, dtype=np.float32) for s in parts]),
+                {first_col: np.concatenate([s.column(first_col) for s in parts]),
+                 second_col: np.concatenate([s.column(second_col) for s in parts])},
+                [label for s in parts for label in s.labels],
+            )
+
+            with self._lock:
+                self._segments[kind] = [s for s in self._segments[kind] if s not in parts]
+            for s in parts:
+                shutil.rmtree(s.path, ignore_errors=True)
+
+    def _search_kind(self, kind: str, embedding, limit: int) -> list:
+        query = _normalize(embedding).reshape(-1)
+
+        with self._lock:
+            segments = list(self._segments[kind])
+
+        # A worker's finalize() can remove segments this process still lists; those are
+        # skipped, and a rescan picks up the merged segment that replaced them
+        gone = False
+        candidates = []
+        with metrics.span(f"similarity_{kind}", backend="mmap") as span:
+            for seg in segments:
+                try:
+                    scores, idx = seg.top_k(query, limit, rerank_factor=self.rerank_factor)
+                except FileNotFoundError:
+                    gone = True
+                    continue
+                candidates.extend((float(score), seg, int(i)) for score, i in zip(scores, idx))
+                # Items are rows scanned, not rows returned
+                span.add(items=len(seg.embeddings))
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        rows = []
+        first_col, second_col = KINDS[kind]
+        for score, seg, i in candidates:
+            if len(rows) == limit: break
+            try:
+                first, second, label = float(seg.column(first_col)[i]), float(seg.column(second_col)[i]), seg.labels[i]
+            except FileNotFoundError:
+                gone = True
+                continue
+            if kind == "frames":
+                rows.append((first, label, score, second))
+            else:
+                rows.append((first, second, label, score))
+
+        if gone: self.refresh()
+        return rows
+
+    def search(self, frame_embedding, text_embedding, limit=5, ef_search=None, probes=None):
+        # Brute force is exact, so the ANN recall knobs don't apply
+        return {
+            "frames": self._search_kind("frames", frame_embedding, limit),
+            "text": self._search_kind("text", text_embedding, limit),
+        }
+
+    async def search_async(self, frame_embedding, text_embedding, limit=5, ef_search=None, probes=None):
+        # NumPy releases the GIL in the matmuls, so the two scans overlap on separate threads
+        frames, text = await asyncio.gather(
+            asyncio.to_thread(self._search_kind, "frames", frame_embedding, limit),
+            asyncio.to_thread(self._search_kind, "text", text_embedding, limit),
+        )
+        return {"frames": frames, "text": text}
+
+    def reset(self):
+        with self._lock:
+            self._segments = {kind: [] for kind in KINDS}
+            if os.path.exists(self.root): shutil.rmtree(self.root)
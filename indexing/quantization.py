@@ -0,0 +1,70 @@
+import os
+import numpy as np
+
+EMBEDDING_FORMATS = ("float32", "halfvec", "int8", "binary")
+
+# Embedding width per table/kind
+DIMENSIONS = {"frames": 512, "text_segments": 384, "text": 384}
+
+# First-pass candidates per requested result for the quantized formats
+DEFAULT_RERANK_FACTOR = 10
+
+# Set-bit count for every byte value, for Hamming distance over packed bits
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def get_embedding_format(name: str = None) -> str:
+    """
+    Storage format for embeddings
+
+    Args:
+        name (str, optional): Explicit format. Defaults to $DEEPSEARCH_EMBEDDING_FORMAT or "float32"
+
+    Return:
+        str: One of EMBEDDING_FORMATS
+    """
+    name = name or os.getenv("DEEPSEARCH_EMBEDDING_FORMAT", "float32")
+    if name not in EMBEDDING_FORMATS:
+        raise ValueError(f"Unknown embedding format '{name}', expected one of {EMBEDDING_FORMATS}")
+    return name
+
+def pg_column_type(fmt: str) -> str:
+    """pgvector type of the embedding column. int8 codes have no pgvector type"""
+    if fmt == "int8":
+        raise ValueError("int8 scalar quantization is only available with the mmap index backend")
+    return "halfvec" if fmt == "halfvec" else "vector"
+
+def quantize_int8(embeddings: np.ndarray):
+    """
+    Symmetric per-row int8 quantization
+
+    Return:
+        tuple: (int8 codes, float32 per-row scales) with embeddings ~= codes * scales
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    scales = np.abs(embeddings).max(axis=-1, keepdims=True) / 127.0
+    scales = np.maximum(scales, 1e-12)
+    codes = np.clip(np.rint(embeddings / scales), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32).reshape(-1)
+
+def quantize_binary(embeddings: np.ndarray) -> np.ndarray:
+    """Sign bits packed 8 per byte, the same quantization as pgvector's binary_quantize"""
+    return np.packbits(np.asarray(embeddings) > 0, axis=-1)
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products of int8 rows with a float query"""
+    return (np.asarray(codes, dtype=np.float32) @ query) * scales
+
+def binary_scores(packed: np.ndarray, query_packed: np.ndarray) -> np.ndarray:
+    """Negative Hamming distance, so higher is closer like the other scores"""
+    return -_POPCOUNT[np.bitwise_xor(packed, query_packed)].sum(axis=-1, dtype=np.int32)
+
+def bytes_per_vector(fmt: str, dim: int) -> dict:
+    """
+    Storage cost of one embedding
+
+    Return:
+        dict: Bytes scanned by the first pass and bytes kept for exact reranking
+    """
+    full = 2 * dim if fmt == "halfvec" else 4 * dim
+    first_pass = {"float32": 4 * dim, "halfvec": 2 * dim, "int8": dim + 4, "binary": (dim + 7) // 8}[fmt]
+    return {"first_pass": first_pass, "full": full if fmt in ("int8", "binary") else 0}
@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+from core import metrics
+
+THUMBNAIL_FORMATS = ("webp", "jpg")
+
+PACK_FILE = "previews.pack"
+PACK_INDEX_FILE = "previews.idx.json"
+
+MEDIA_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+
+def encode_thumbnail(frame, max_size: int = 384, fmt: str = "webp", quality: int = 80) -> bytes:
+    """
+    Downscales a BGR frame and encodes it as a compact preview
+
+    Args:
+        frame (np.ndarray): BGR frame
+        max_size (int): Longest side of the preview in pixels (0 keeps the original size)
+        fmt (str): "webp" or "jpg"
+        quality (int): Encoder quality, 0-100
+
+    Return:
+        bytes: Encoded image
+    """
+    height, width = frame.shape[:2]
+    scale = max_size / max(height, width) if max_size else 1.0
+
+    if scale < 1.0:
+        frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+    params = [cv2.IMWRITE_WEBP_QUALITY, quality] if fmt == "webp" else [cv2.IMWRITE_JPEG_QUALITY, quality]
+    ok, buffer = cv2.imencode(f".{fmt}", frame, params)
+
+    if not ok:
+        raise ValueError(f"Could not encode {fmt} thumbnail")
+    return buffer.tobytes()
+
+class ThumbnailWriter:
+    """
+    Encodes frame previews on a worker pool. Previews are written as one file per
+    frame under frames/{video_id}/, or appended to a single pack file with an
+    offset index when pack=True
+    """
+
+    def __init__(self, video_id: int, root: str = "frames", max_size: int = 384, fmt: str = "webp",
+                 quality: int = 80, workers: int = 2, pack: bool = False, index_flush_every: int = 256):
+        if fmt not in THUMBNAIL_FORMATS:
+            raise ValueError(f"Unknown thumbnail format '{fmt}', expected one of {THUMBNAIL_FORMATS}")
+
+        self.video_id = video_id
+        self.max_size = max_size
+        self.fmt = fmt
+        self.quality = quality
+        self.pack = pack
+        self.index_flush_every = index_flush_every
+        self.video_dir = os.path.join(root, str(video_id))
+        os.makedirs(self.video_dir, exist_ok=True)
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self._futures = []
+        self._lock = threading.Lock()
+        self._index = {}
+        self._pack_file = open(os.path.join(self.video_dir, PACK_FILE), "ab") if pack else None
+
+        # A resumed video appends to its existing pack, so keep the previews already indexed
+        index_path = os.path.join(self.video_dir, PACK_INDEX_FILE)
+        if pack and os.path.exists(index_path):
+            with open(index_path) as f:
+                self._index = json.load(f)
+
+    def submit(self, frame_idx: int, frame) -> str:
+        """
+        Queues a frame for encoding
+
+        Return:
+            str: Path to store in the DB; the URL the API serves the preview from
+        """
+        name = f"frame_{frame_idx}.{self.fmt}"
+        future = self._pool.submit(metrics.bind_context(self._write), name, frame)
+
+        with self._lock:
+            self._futures.append(future)
+            # Drop finished futures so a long video doesn't keep them all alive
+            if len(self._futures) > 1024:
+                self._raise_errors([f for f in self._futures if f.done()])
+                self._futures = [f for f in self._futures if not f.done()]
+
+        if self.pack:
+            return f"previews/{self.video_id}/{name}"
+        return f"frames/{self.video_id}/{name}"
+
+    def _write(self, name: str, frame):
+        with metrics.span("thumbnail_write", items=1, fmt=self.fmt) as span:
+            data = encode_thumbnail(frame, max_size=self.max_size, fmt=self.fmt, quality=self.quality)
+            span.add(nbytes=len(data))
+            self._store(name, data)
+
+    def _store(self, name: str, data: bytes):
+        if not self.pack:
+            with open(os.path.join(self.video_dir, name), "wb") as f:
+                f.write(data)
+            return
+
+        with self._lock:
+            offset = self._pack_file.tell()
+            self._pack_file.write(data)
+            self._index[name] = [offset, len(data)]
+
+            if len(self._index) % self.index_flush_every == 0:
+                self._flush_index()
+
+    def _flush_index(self):
+        # Readers only see previews whose bytes are already in the pack
+        self._pack_file.flush()
+        tmp_path = os.path.join(self.video_dir, PACK_INDEX_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, os.path.join(self.video_dir, PACK_INDEX_FILE))
+
+    @staticmethod
+    def _raise_errors(futures):
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+
+    def flush(self):
+        """Waits for every preview queued so far to be on disk (and in the pack index); raises the first encode error"""
+        with self._lock:
+            futures = list(self._futures)
+
+        for future in futures:
+            future.result()
+
+        if self.pack:
+            with self._lock:
+                self._flush_index()
+
+    def close(self):
+        """Waits for queued previews and writes the pack index; raises the first encode error"""
+        self._pool.shutdown(wait=True)
+
+        if self.pack:
+            with self._lock:
+                self._flush_index()
+            self._pack_file.close()
+
+        self._raise_errors(self._futures)
+
+_index_cache = {}
+
+def _pack_entry(video_id: int, name: str, root: str):
+    video_dir = os.path.join(root, str(int(video_id)))
+    index_path = os.path.join(video_dir, PACK_INDEX_FILE)
+
+    try:
+        mtime = os.path.getmtime(index_path)
+    except OSError:
+        return None
+
+    # Re-read the index only when the writer has flushed a new one
+    cached = _index_cache.get(index_path)
+    if cached is None or cached[0] != mtime:
+        with open(index_path) as f:
+            cached = (mtime, json.load(f))
+        _index_cache[index_path] = cached
+
+    return cached[1].get(name)
+
+def packed_preview_length(video_id: int, name: str, root: str = "frames") -> int:
+    """Size in bytes of a packed preview, or None if it isn't in the pack"""
+    entry = _pack_entry(video_id, name, root)
+    return None if entry is None else entry[1]
+
+def read_packed_preview(video_id: int, name: str, root: str = "frames", start: int = None, end: int = None) -> bytes:
+    """
+    Reads one preview, or a byte range of it, from a video's pack file
+
+    Args:
+        video_id (int): Video the preview belongs to
+        name (str): Preview name, e.g. "frame_12.webp"
+        root (str): Directory holding per-video preview folders
+        start (int, optional): First byte of the range, relative to the preview
+        end (int, optional): Last byte of the range (inclusive)
+
+    Return:
+        bytes: Preview bytes, or None if the preview isn't in the pack
+    """
+    entry = _pack_entry(video_id, name, root)
+    if entry is None:
+        return None
+
+    offset, length = entry
+    start = 0 if start is None else start
+    end = length - 1 if end is None else min(end, length - 1)
+
+    with open(os.path.join(root, str(int(video_id)), PACK_FILE), "rb") as f:
+        f.seek(offset + start)
+        return f.read(max(0, end - start + 1))
@@ -1,6 +1,13 @@
 from faster_whisper import WhisperModel
+from embedding.models import get_model
+from core import metrics
+import numpy as np
 import subprocess
+import time
 import os
+
+SAMPLE_RATE = 16000
+
 def extract_audio(video_file: str, output_ext = "wav"):
     """
     Extract audio from a video file using ffmpeg
@@ -28,44 +35,122 @@ def extract_audio(video_file: str, output_ext = "wav"):
 
     return output_path
 
-def transcribe_audio(audio_file: str, model_size: str = "medium", device: str = None, compute_type: str = None, beam_size: int = None):
+def load_audio_pcm(video_file: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
     """
-    Transcribes an audio file using FasterWhisper
+    Decodes the audio track of a video straight into memory using ffmpeg
 
     Args:
-        audio_file (str): Path to the audio file to be transcribed
-        model_size (str, optional): Size of the model to use. Defaults to "medium"
-        device (str, optional): Device to use for transcription (cpu / cuda)
-        compute_type (str, optional): Compute type to use for transcription (int8 / float16 / float32)
-        beam_size (int, optional): Beam size to use for transcription
-    
-    Returns:
-        array: Array of transcribed text in segments
+        video_file (str): Path to video file
+        sample_rate (int): Output sample rate (Whisper expects 16 kHz)
+
+    Return:
+        np.ndarray: Mono float32 PCM samples in [-1, 1] (empty if the video has no audio)
     """
 
+    #FFmpeg command to decode audio as raw float32 to stdout, no intermediate file
+    command = ["ffmpeg", "-v", "error",
+               "-i", video_file,
+               "-vn",
+               "-ac", "1",
+               "-ar", str(sample_rate),
+               "-f", "f32le",
+               "-acodec", "pcm_f32le",
+               "-"]
+
+    with metrics.span("audio_decode") as span:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        span.add(nbytes=len(result.stdout))
+
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def _resolve_device(device: str = None, compute_type: str = None):
     # Default to cuda if compatible, otherwise default to cpu
     if device is None:
         device = "cuda" if os.getenv("CUDA_VISIBLE_DEVICES") is not None else "cpu"
-    
+
     # Use more intensive compute type for cuda devices
     if compute_type is None:
         compute_type = "float16" if device == "cuda" else "int8"
 
-    model = WhisperModel(model_size, device=device, compute_type=compute_type)
+    return device, compute_type
+
+def get_whisper(model_size: str = "medium", device: str = None, compute_type: str = None, cpu_threads: int = 0) -> WhisperModel:
+    """
+    Returns a resident WhisperModel, loading it once per size/device/compute type
+
+    Args:
+        model_size (str, optional): Size of the model to use. Defaults to "medium"
+        device (str, optional): Device to use for transcription (cpu / cuda)
+        compute_type (str, optional): Compute type to use for transcription (int8 / float16 / float32)
+        cpu_threads (int, optional): CPU threads for inference (0 = CTranslate2 default)
+
+    Return:
+        WhisperModel: Shared model instance
+    """
+    device, compute_type = _resolve_device(device, compute_type)
+
+    def load():
+        model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+        return {"model": model, "device": device}
+
+    return get_model(f"whisper-{model_size}-{device}-{compute_type}-t{cpu_threads}", loader=load)["model"]
+
+def iter_transcribe(audio, model_size: str = "medium", device: str = None, compute_type: str = None, beam_size: int = None, cpu_threads: int = 0):
+    """
+    Transcribes audio with FasterWhisper, yielding segments as they are decoded
+
+    Args:
+        audio (str | np.ndarray): Path to an audio file or 16 kHz float32 PCM samples
+        model_size (str, optional): Size of the model to use. Defaults to "medium"
+        device (str, optional): Device to use for transcription (cpu / cuda)
+        compute_type (str, optional): Compute type to use for transcription (int8 / float16 / float32)
+        beam_size (int, optional): Beam size to use for transcription
+        cpu_threads (int, optional): CPU threads for inference (0 = CTranslate2 default)
+
+    Return:
+        generator: Yields {"start", "end", "text"} dicts in order
+    """
+    device, compute_type = _resolve_device(device, compute_type)
+
+    model = get_whisper(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
 
     if beam_size is None:
         if device == "cuda": beam_size = 5 
         else: beam_size = 1
 
-    segments, info = model.transcribe(audio_file, beam_size=beam_size)
+    # faster-whisper decodes lazily; each segment is produced as the iterator advances
+    start = time.perf_counter()
+    segments, info = model.transcribe(audio, beam_size=beam_size)
+    metrics.observe("whisper_detect", time.perf_counter() - start,
+                    nbytes=0 if isinstance(audio, str) else audio.nbytes)
 
-    print("Translating %s using %s model with %s" % (audio_file, model_size, device))
+    source = audio if isinstance(audio, str) else f"{len(audio) / SAMPLE_RATE:.0f}s of PCM audio"
+    print("Translating %s using %s model with %s" % (source, model_size, device))
     print("Detected language '%s' with probability %f" % (info.language, info.language_probability))
 
-    output = []
+    # Groups audio output based on timestamps and content. Decoding happens inside next(),
+    # so each segment is timed there rather than around the consumer's work
+    segments = iter(segments)
+    while True:
+        start = time.perf_counter()
+        segment = next(segments, None)
+        if segment is None: break
+        metrics.observe("whisper", time.perf_counter() - start, items=1, audio_seconds=float(segment.end - segment.start))
 
-    # Groups audio output based on timestamps and content
-    for segment in segments:
-        output.append({"start": float(segment.start), "end": float(segment.end), "text": segment.text.strip()})
+        yield {"start": float(segment.start), "end": float(segment.end), "text": segment.text.strip()}
+
+def transcribe_audio(audio, model_size: str = "medium", device: str = None, compute_type: str = None, beam_size: int = None):
+    """
+    Transcribes audio using FasterWhisper
+
+    Args:
+        audio (str | np.ndarray): Path to an audio file or 16 kHz float32 PCM samples
+        model_size (str, optional): Size of the model to use. Defaults to "medium"
+        device (str, optional): Device to use for transcription (cpu / cuda)
+        compute_type (str, optional): Compute type to use for transcription (int8 / float16 / float32)
+        beam_size (int, optional): Beam size to use for transcription
     
-    return output
+    Returns:
+        array: Array of transcribed text in segments
+    """
+    return list(iter_transcribe(audio, model_size=model_size, device=device, compute_type=compute_type, beam_size=beam_size))
@@ -1,28 +1,62 @@
 import cv2
-def extract_frames(video_file: str, seconds_per_frame: float = 1.0):
+import math
+import numpy as np
+import subprocess
+import tempfile
+
+FRAME_BACKENDS = ("grab", "ffmpeg", "seek")
+
+# Display rotation (degrees, from the container) -> cv2.rotate code, as OpenCV's own autorotation applies it
+_ROTATIONS = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+
+def _frame_hop(native_fps: float, seconds_per_frame: float) -> int:
+    # Calculate number of frames to skip (native FPS / desired sampling FPS)
+    return max(1, int(native_fps / seconds_per_frame))
+
+def _first_sample(start_time: float, native_fps: float, frame_hop: int) -> int:
+    # Index of the first sampled frame at or after start_time, on the same grid as a full run
+    return math.ceil(start_time * native_fps / frame_hop) * frame_hop
+
+def extract_frames(video_file: str, seconds_per_frame: float = 1.0, backend: str = "grab", start_time: float = 0.0):
     """
     Extracts frames from a video file at a given FPS
 
     Args:
         video_file (str): Path to video file
-        frames_per_second (int): Frames per second to extract (higher is more memory intensive)
-    
+        seconds_per_frame (float): Frames per second to extract (higher is more memory intensive)
+        backend (str): Sampler to use ("grab", "ffmpeg" or "seek"). Defaults to "grab"
+        start_time (float): Seek here first, e.g. to resume a partly indexed video. Seeks land on
+            the nearest keyframe, so frames slightly before start_time can still be returned
+
     Return:
-        list: List of tuples containing frame and timestamp
+        generator: Yields tuples containing frame and timestamp
+    """
+    if backend == "grab":
+        return _extract_frames_grab(video_file, seconds_per_frame, start_time)
+    if backend == "ffmpeg":
+        return _extract_frames_ffmpeg(video_file, seconds_per_frame, start_time)
+    if backend == "seek":
+        return _extract_frames_seek(video_file, seconds_per_frame, start_time)
+
+    raise ValueError(f"Unknown frame backend '{backend}', expected one of {FRAME_BACKENDS}")
+
+def _extract_frames_seek(video_file: str, seconds_per_frame: float, start_time: float = 0.0):
+    """
+    Original sampler: seeks to every sampled frame. Kept as a fallback for
+    containers where sequential decoding reports bad timestamps.
     """
     vid = cv2.VideoCapture(video_file)
 
     if not vid.isOpened():
         raise ValueError("Could not open video file")
-    
+
     native_fps = vid.get(cv2.CAP_PROP_FPS)
     total_frames = int(vid.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    # Calculate number of frames to skip (native FPS / desired sampling FPS)
-    frame_hop = int(native_fps / seconds_per_frame)
+    frame_hop = _frame_hop(native_fps, seconds_per_frame)
+
+    current_frame_idx = _first_sample(start_time, native_fps, frame_hop)
 
-    current_frame_idx = 0
-    
     while current_frame_idx < total_frames:
 
         # Jump to the desired frame
@@ -31,7 +65,7 @@ def extract_frames(video_file: str, seconds_per_frame: float = 1.0):
         ret, frame = vid.read()
 
         if not ret: break
-        
+
         timestamp_ms = vid.get(cv2.CAP_PROP_POS_MSEC)
 
         timestamp = timestamp_ms / 1000
@@ -45,3 +79,117 @@ def extract_frames(video_file: str, seconds_per_frame: float = 1.0):
         current_frame_idx += frame_hop
 
     vid.release()
+
+def _extract_frames_grab(video_file: str, seconds_per_frame: float, start_time: float = 0.0):
+    """
+    Decodes the video forward once. Every frame is grabbed (demuxed and decoded)
+    but only the sampled ones are retrieved (converted to BGR), so there is no
+    keyframe seek per sample.
+    """
+    vid = cv2.VideoCapture(video_file)
+
+    if not vid.isOpened():
+        raise ValueError("Could not open video file")
+
+    native_fps = vid.get(cv2.CAP_PROP_FPS)
+    if native_fps <= 0: native_fps = 24
+
+    frame_hop = _frame_hop(native_fps, seconds_per_frame)
+
+    current_frame_idx = 0
+
+    if start_time > 0:
+        # Keyframe seek; the absolute frame index keeps the sampling grid of a full run
+        vid.set(cv2.CAP_PROP_POS_MSEC, start_time * 1000)
+        current_frame_idx = int(vid.get(cv2.CAP_PROP_POS_FRAMES))
+
+    try:
+        while vid.grab():
+            if current_frame_idx % frame_hop == 0:
+                ret, frame = vid.retrieve()
+
+                if not ret: break
+
+                timestamp = vid.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+                if timestamp == 0 and current_frame_idx > 0:
+                    timestamp = current_frame_idx / native_fps
+
+                yield frame, timestamp
+
+            current_frame_idx += 1
+    finally:
+        vid.release()
+
+def _extract_frames_ffmpeg(video_file: str, seconds_per_frame: float, start_time: float = 0.0):
+    """
+    Reads sampled frames from an ffmpeg rawvideo pipe. The select filter drops
+    unwanted frames inside ffmpeg so only kept frames cross the pipe.
+    ffmpeg decodes unrotated (-noautorotate) at the stored size and the frames are
+    rotated here, so the pipe's frame size can't disagree with the dimensions read from cv2
+    """
+    vid = cv2.VideoCapture(video_file)
+
+    if not vid.isOpened():
+        raise ValueError("Could not open video file")
+
+    # Stored (unrotated) dimensions, whatever this OpenCV build does by default
+    vid.set(cv2.CAP_PROP_ORIENTATION_AUTO, 0)
+    native_fps = vid.get(cv2.CAP_PROP_FPS)
+    if native_fps <= 0: native_fps = 24
+    width = int(vid.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(vid.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    rotate = _ROTATIONS.get(int(vid.get(cv2.CAP_PROP_ORIENTATION_META)) % 360)
+    vid.release()
+
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Could not read the frame size of {video_file}")
+
+    frame_hop = _frame_hop(native_fps, seconds_per_frame)
+    frame_size = width * height * 3
+
+    # Resuming: input-seek to the first sample on the full run's grid, so select counts from there
+    first_frame = _first_sample(start_time, native_fps, frame_hop) if start_time > 0 else 0
+    seek = ["-ss", f"{first_frame / native_fps:.6f}"] if first_frame else []
+
+    #FFmpeg command to decode every hop-th frame as raw BGR
+    command = ["ffmpeg", "-v", "error",
+               *seek,
+               "-noautorotate",
+               "-i", video_file,
+               "-an",
+               "-vf", f"select=not(mod(n\\,{frame_hop}))",
+               "-vsync", "0",
+               "-f", "rawvideo",
+               "-pix_fmt", "bgr24",
+               "-"]
+
+    # stderr goes to a file, not a pipe, so a chatty ffmpeg can't block on it while we read frames
+    stderr_file = tempfile.TemporaryFile()
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file, bufsize=frame_size)
+
+    sample_idx = 0
+
+    try:
+        while True:
+            buffer = proc.stdout.read(frame_size)
+
+            if len(buffer) < frame_size: break
+
+            frame = np.frombuffer(buffer, dtype=np.uint8).reshape((height, width, 3))
+            if rotate is not None: frame = cv2.rotate(frame, rotate)
+
+            yield frame, (first_frame + sample_idx * frame_hop) / native_fps
+
+            sample_idx += 1
+
+        # A decode failure would otherwise look like a video with no (more) frames
+        if proc.wait() != 0:
+            stderr_file.seek(0)
+            message = stderr_file.read().decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg exited with code {proc.returncode} on {video_file}: {message}")
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+        stderr_file.close()
@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+
+FRAME_FILTERS = ("dhash", "histogram")
+
+# Distance below which a frame counts as a duplicate of the last kept frame
+DEFAULT_THRESHOLDS = {
+    "dhash": 6,          # Hamming distance out of 64 bits
+    "histogram": 0.15,   # Bhattacharyya distance (0 = identical)
+}
+
+def dhash(frame: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Difference hash of a BGR frame
+
+    Args:
+        frame (np.ndarray): BGR frame
+        hash_size (int): Width/height of the hash grid (hash_size ** 2 bits)
+
+    Return:
+        int: Perceptual hash packed into an integer
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def histogram(frame: np.ndarray, size: int = 64) -> np.ndarray:
+    """
+    Normalized hue/saturation histogram of a downscaled BGR frame
+
+    Args:
+        frame (np.ndarray): BGR frame
+        size (int): Side length the frame is downscaled to before binning
+
+    Return:
+        np.ndarray: Normalized 2D histogram
+    """
+    small = cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).astype(np.float32)
+
+def _signature_distance(method: str):
+    if method == "dhash":
+        return dhash, lambda a, b: bin(a ^ b).count("1")
+    if method == "histogram":
+        return histogram, lambda a, b: cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA)
+
+    raise ValueError(f"Unknown frame filter '{method}', expected one of {FRAME_FILTERS}")
+
+def filter_frames(frames, method: str = "dhash", threshold: float = None):
+    """
+    Drops frames that are near-duplicates of the last kept frame
+
+    Each kept frame is yielded once the next scene change (or the end of the
+    video) is seen, together with the time span it stands in for.
+
+    Args:
+        frames (iterable): (frame, timestamp) tuples, e.g. from extract_frames
+        method (str): Similarity measure ("dhash" or "histogram")
+        threshold (float, optional): Minimum distance from the last kept frame for a frame to be kept
+
+    Return:
+        generator: Yields tuples containing frame, start timestamp and end timestamp
+    """
+    signature, distance = _signature_distance(method)
+
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLDS[method]
+
+    kept = None
+
+    for frame, timestamp in frames:
+        sig = signature(frame)
+
+        if kept is not None and distance(kept["sig"], sig) < threshold:
+            # Same scene, extend the span of the kept frame
+            kept["end"] = timestamp
+            continue
+
+        if kept is not None:
+            yield kept["frame"], kept["start"], kept["end"]
+
+        kept = {"frame": frame, "sig": sig, "start": timestamp, "end": timestamp}
+
+    if kept is not None:
+        yield kept["frame"], kept["start"], kept["end"]
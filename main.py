@@ -1,53 +1,60 @@
-from ingestion.extract_audio import extract_audio, transcribe_audio
+from ingestion.extract_audio import load_audio_pcm, transcribe_audio
 from ingestion.extract_frames import extract_frames
 from embedding.frame_embedding import get_frame_embeddings
 from embedding.text_embedding import get_text_embeddings
-from indexing.insert import get_connection, insert_frame, insert_text_segment, insert_video
+from embedding.models import get_clip
+from embedding.preprocess import adaptive_batch_size
+from indexing.insert import get_connection, insert_frames_bulk, insert_text_segments_bulk, insert_video
 from search_service.search import query, fuse_results
-import cv2
+from indexing.thumbnails import ThumbnailWriter
+
+def write_batch(conn, video_id, batch, embeddings, frame_index, thumbnails):
+    image_paths = []
+    for frame, _ in batch:
+        image_paths.append(thumbnails.submit(frame_index, frame))
+        frame_index += 1
+
+    insert_frames_bulk(conn, video_id, [ts for _, ts in batch], image_paths, embeddings, commit=False)
+    return frame_index
 
 def main():
     conn = get_connection()
     video_id = insert_video(conn, "video", "video.mp4")
 
-    audio_file = extract_audio("video.mp4")
-    transcript = transcribe_audio(audio_file)
+    audio = load_audio_pcm("video.mp4")
+    transcript = transcribe_audio(audio)
     text_embeddings = get_text_embeddings(transcript)
 
-    for seg, embedding in zip(transcript, text_embeddings):
-        insert_text_segment(conn, video_id, seg["start"], seg["end"], seg["text"], embedding)
+    insert_text_segments_bulk(conn, video_id,
+                              [seg["start"] for seg in transcript], [seg["end"] for seg in transcript],
+                              [seg["text"] for seg in transcript], text_embeddings, commit=False)
 
     print("Audio processed successfully!")
 
     frames = extract_frames("video.mp4")
 
     current_batch = []
-    BATCH_SIZE = 32
+    BATCH_SIZE = adaptive_batch_size(get_clip()["device"])
 
     frame_index = 0
+    thumbnails = ThumbnailWriter(video_id)
 
     for frame, timestamp in frames:
         current_batch.append((frame, timestamp))
 
         if len(current_batch) >= BATCH_SIZE:
             frame_embeddings = get_frame_embeddings(current_batch)
-
-            for (frame, timestamp), embedding in zip(current_batch, frame_embeddings):
-                image_path = f"frames/frame_{frame_index}.jpg"
-                cv2.imwrite(image_path, frame)
-                insert_frame(conn, video_id, timestamp, image_path, embedding)
-                frame_index += 1
-
+            frame_index = write_batch(conn, video_id, current_batch, frame_embeddings, frame_index, thumbnails)
             current_batch = []
     
     if current_batch:
         frame_embeddings = get_frame_embeddings(current_batch)
-        for (frame, timestamp), embedding in zip(current_batch, frame_embeddings):
-                image_path = f"frames/frame_{frame_index}.jpg"
-                cv2.imwrite(image_path, frame)
-                insert_frame(conn, video_id, timestamp, image_path, embedding)
-                frame_index += 1
-    
+        frame_index = write_batch(conn, video_id, current_batch, frame_embeddings, frame_index, thumbnails)
+
+    # Everything for this video lands in one transaction
+    thumbnails.close()
+    conn.commit()
+
     print(f"Processed all frames. Vector shape:  {frame_embeddings.shape}")
 
     user_query = input("Enter your query: ")
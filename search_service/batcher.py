@@ -0,0 +1,93 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from core import metrics
+
+class MicroBatcher:
+    """
+    Groups concurrent single-item requests into batched calls.
+
+    Callers block in encode(); one worker thread takes the first waiting item,
+    keeps collecting for up to window_ms or until max_batch items are queued,
+    runs encode_batch once and hands each caller its own row. Identical inputs
+    in the same batch are encoded once
+    """
+
+    def __init__(self, name: str, encode_batch, max_batch: int = 32, window_ms: float = 2.0):
+        self.name = name
+        self.encode_batch = encode_batch
+        self.max_batch = max_batch
+        self.window_ms = window_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None: return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                self._thread.start()
+
+    def encode(self, item, timeout: float = 30.0):
+        """
+        Encodes one input as part of whatever batch it lands in
+
+        Args:
+            item: A single input for encode_batch
+            timeout (float): Seconds to wait for the result
+
+        Return:
+            The row encode_batch produced for this input
+        """
+        if self.window_ms <= 0 or self.max_batch <= 1:
+            # Batching disabled: encode inline
+            return self.encode_batch([item])[0]
+
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, time.perf_counter(), future))
+        return future.result(timeout=timeout)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0: break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+
+            unique = list(dict.fromkeys(item for item, _, _ in batch))
+            metrics.registry.observe("deepsearch_query_batch_size", len(unique), batcher=self.name)
+            for _, enqueued, _ in batch:
+                metrics.registry.observe("deepsearch_query_queue_wait_seconds", started - enqueued, batcher=self.name)
+
+            try:
+                rows = self.encode_batch(unique)
+                by_item = dict(zip(unique, rows))
+                for item, _, future in batch:
+                    future.set_result(by_item[item])
+            except BaseException as e:
+                # Whatever happened, this batch's callers get the error and the thread keeps serving;
+                # a dead batching thread would leave every later caller waiting out its timeout
+                for _, _, future in batch:
+                    if not future.done(): future.set_exception(e)
+
+def batcher_options() -> dict:
+    """Window and batch cap from $DEEPSEARCH_QUERY_BATCH_WINDOW_MS / $DEEPSEARCH_QUERY_MAX_BATCH (window 0 disables)"""
+    return {
+        "window_ms": float(os.getenv("DEEPSEARCH_QUERY_BATCH_WINDOW_MS", 2.0)),
+        "max_batch": int(os.getenv("DEEPSEARCH_QUERY_MAX_BATCH", 32)),
+    }
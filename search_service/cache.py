@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Bumped on clear() so in-flight writers can't store results computed from old data
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+
+            if entry is not _MISSING and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation: int = None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+# Query embeddings never go stale; only the model can change them, and it is part of the key
+embedding_cache = TTLCache(max_size=int(os.getenv("DEEPSEARCH_EMBEDDING_CACHE_SIZE", 4096)),
+                           ttl=float(os.getenv("DEEPSEARCH_EMBEDDING_CACHE_TTL", 3600)))
+
+# Raw candidate lists from query(); cleared whenever the index changes
+result_cache = TTLCache(max_size=int(os.getenv("DEEPSEARCH_RESULT_CACHE_SIZE", 512)),
+                        ttl=float(os.getenv("DEEPSEARCH_RESULT_CACHE_TTL", 300)))
+
+def normalize_query(text: str) -> str:
+    # Both encoders lowercase their input, so case and spacing don't change the embedding
+    return " ".join(text.lower().split())
+
+_invalidation_listeners = []
+
+def add_invalidation_listener(fn):
+    """fn() is called after every invalidate_results(), e.g. to tell another process the index changed"""
+    _invalidation_listeners.append(fn)
+
+def invalidate_results():
+    """Drops cached search results; call after new data is committed or the index is reset"""
+    result_cache.clear()
+    for fn in _invalidation_listeners:
+        fn()
+
+def cache_stats() -> dict:
+    return {
+        "embeddings": embedding_cache.stats(),
+        "results": result_cache.stats(),
+    }
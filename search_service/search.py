@@ -1,143 +1,242 @@
-import sentence_transformers
-from transformers import CLIPModel, CLIPProcessor
-from indexing.insert import get_connection
+import asyncio
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from indexing.backends import get_backend
+from search_service.cache import embedding_cache, result_cache, normalize_query
+from search_service.batcher import MicroBatcher, batcher_options
+from embedding.models import get_clip, get_minilm, CLIP_MODEL_NAME, TEXT_MODEL_NAME
+from core import metrics
 
-text_model = sentence_transformers.SentenceTransformer('all-MiniLM-L6-v2')
-frame_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-frame_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-def query(query: str):
-    conn = get_connection()
-    cur = conn.cursor()
+# The batch functions run on the batcher threads, so their spans only reach the histograms;
+# the per-request query_encode_* spans below carry the same work (plus queueing) into traces
+def _encode_text_batch(texts: list) -> list:
+    with metrics.span("query_forward_text", items=len(texts)):
+        return get_minilm()["model"].encode(texts).tolist()
 
-    user_text_embedding = text_model.encode(query).tolist()
+def _encode_clip_batch(texts: list) -> list:
+    clip = get_clip()
+    with metrics.span("query_forward_clip", items=len(texts)):
+        if clip.get("runtime") == "onnx":
+            inputs = clip["processor"](text=texts, return_tensors="np", padding=True)
+            return clip["model"].get_text_features(inputs["input_ids"], inputs["attention_mask"]).tolist()
 
-    frame_inputs = frame_processor(text=[query], return_tensors="pt", padding=True)
-    frame_outputs = frame_model.get_text_features(**frame_inputs)
-    user_frame_embedding = frame_outputs.detach().numpy()[0].tolist()
+        import torch
+        inputs = clip["processor"](text=texts, return_tensors="pt", padding=True).to(clip["device"])
+        with torch.no_grad():
+            outputs = clip["model"].get_text_features(**inputs)
+        return outputs.cpu().numpy().tolist()
 
-    cur.execute("SELECT timestamp, image_path, 1 - (embedding <=> %s::vector) AS score FROM frames ORDER BY score DESC LIMIT 5", (user_frame_embedding,))
-    frame_results = cur.fetchall()
+# Concurrent searches share one forward pass per model instead of running batch-size-1 passes back to back
+text_batcher = MicroBatcher("minilm", _encode_text_batch, **batcher_options())
+clip_batcher = MicroBatcher("clip-text", _encode_clip_batch, **batcher_options())
 
-    cur.execute("SELECT start_time, end_time, text, 1 - (embedding <=> %s::vector) AS score FROM text_segments ORDER BY score DESC LIMIT 5", (user_text_embedding,))
-    text_results = cur.fetchall()
+def encode_text_query(text: str) -> list:
+    """MiniLM embedding of a query, cached by query text"""
+    key = (TEXT_MODEL_NAME, text)
+    embedding = embedding_cache.get(key)
 
-    return {
-        "frames" : frame_results,
-        "text" : text_results
-    }
+    if embedding is None:
+        with metrics.span("query_encode_text", items=1):
+            embedding = text_batcher.encode(text)
+        embedding_cache.set(key, embedding)
+    return embedding
 
+def encode_clip_query(text: str) -> list:
+    """CLIP text-tower embedding of a query, cached by query text"""
+    key = (CLIP_MODEL_NAME, text)
+    embedding = embedding_cache.get(key)
 
-def fuse_results(results: dict, time_window: float = 5.0, weight_visual: float = 1.0, weight_text: float = 1.0) -> list:
+    if embedding is None:
+        with metrics.span("query_encode_clip", items=1):
+            embedding = clip_batcher.encode(text)
+        embedding_cache.set(key, embedding)
+    return embedding
+
+# Query encoding for the async path runs here, never on the event loop or the request threadpool
+_inference_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DEEPSEARCH_INFERENCE_WORKERS", 4)),
+                                         thread_name_prefix="inference")
+
+def query(query: str, limit: int = 5, ef_search: int = None, probes: int = None):
+    """
+    Finds the closest frames and transcript segments to a text query
+
+    Args:
+        query (str): Natural language query
+        limit (int): Candidates to return per modality
+        ef_search (int, optional): HNSW recall knob for this query
+        probes (int, optional): IVFFlat recall knob for this query
+
+    Return:
+        dict: Frame rows and text rows, best match first
+    """
+    normalized = normalize_query(query)
+    cache_key = (normalized, limit, ef_search, probes)
+
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Read before touching the DB; if ingestion invalidates meanwhile, the result isn't cached
+    generation = result_cache.generation
+
+    user_text_embedding = encode_text_query(normalized)
+    user_frame_embedding = encode_clip_query(normalized)
+
+    results = get_backend().search(user_frame_embedding, user_text_embedding, limit=limit,
+                                   ef_search=ef_search, probes=probes)
+    result_cache.set(cache_key, results, generation=generation)
+
+    return results
+
+async def query_async(query: str, limit: int = 5, ef_search: int = None, probes: int = None):
+    """
+    Async version of query(): both query encoders run concurrently on the inference
+    executor, then the frame and text similarity searches run concurrently
+
+    Args:
+        query (str): Natural language query
+        limit (int): Candidates to return per modality
+        ef_search (int, optional): HNSW recall knob for this query
+        probes (int, optional): IVFFlat recall knob for this query
+
+    Return:
+        dict: Frame rows and text rows, best match first
+    """
+    normalized = normalize_query(query)
+    cache_key = (normalized, limit, ef_search, probes)
+
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    generation = result_cache.generation
+
+    loop = asyncio.get_running_loop()
+    user_text_embedding, user_frame_embedding = await asyncio.gather(
+        loop.run_in_executor(_inference_executor, metrics.bind_context(encode_text_query), normalized),
+        loop.run_in_executor(_inference_executor, metrics.bind_context(encode_clip_query), normalized),
+    )
+
+    results = await get_backend().search_async(user_frame_embedding, user_text_embedding, limit=limit,
+                                               ef_search=ef_search, probes=probes)
+    result_cache.set(cache_key, results, generation=generation)
+
+    return results
+
+def _group_argmax(values: np.ndarray, scene_id: np.ndarray) -> np.ndarray:
+    # Index of the largest value in each scene (scene_id must be sorted)
+    order = np.lexsort((values, scene_id))
+    last_in_scene = np.r_[np.flatnonzero(np.diff(scene_id[order])), len(order) - 1]
+    return order[last_in_scene]
+
+def fuse_results(results: dict, time_window: float = 5.0, weight_visual: float = 1.0, weight_text: float = 1.0,
+                 max_scene_length: float = None) -> list:
     """
     Fuses visual and text search results into coherent scenes.
+
+    Hits are sorted by time and swept once: a hit joins the current scene when it
+    starts within time_window of the scene's furthest end, so the cost is
+    O(n log n) and every hit belongs to exactly one scene.
+
+    Args:
+        results (dict): Output of query()
+        time_window (float): Max gap in seconds between hits of the same scene
+        weight_visual (float): Multiplier for frame scores
+        weight_text (float): Multiplier for transcript scores
+        max_scene_length (float, optional): Scenes longer than this are split. Defaults to 2 * time_window
+
+    Return:
+        list: Scenes with timestamp, score, match_type, preview_path and transcript_snippet, best first
     """
-    candidates = []
-
-    # --- 1. Use the passed-in weights instead of hardcoded 1.0 ---
-    for frame_result in results["frames"]:
-        candidates.append({
-            'time': float(frame_result[0]),
-            'score': float(frame_result[2]) * weight_visual, # <--- Uses the slider value
-            'type': 'visual',
-            'preview': frame_result[1],
-            'text': None
-        })
-    
-    for text_result in results["text"]:
-        candidates.append({
-            'time': float(text_result[0]),
-            'score': float(text_result[3]) * weight_text, # <--- Uses the slider value
-            'type': 'text',
-            'preview': None,
-            'text': text_result[2]
-        })
+    with metrics.span("fuse", items=len(results["frames"]) + len(results["text"])) as span:
+        scenes = _fuse(results, time_window, weight_visual, weight_text, max_scene_length)
+        span.add(scenes=len(scenes))
+    return scenes
+
+def _fuse(results: dict, time_window: float, weight_visual: float, weight_text: float, max_scene_length: float) -> list:
+    frames = results["frames"]
+    texts = results["text"]
+    n_frames = len(frames)
+    n = n_frames + len(texts)
 
-    # Sort by score first to prioritize better matches when grouping
-    candidates.sort(key=lambda x: x['score'], reverse=True)
-    
-    if not candidates: 
+    if n == 0:
         return []
 
-    scenes = []
-    used_times = set()
-
-    # --- 2. Clustering Logic (Unchanged) ---
-    for candidate in candidates:
-        if candidate['time'] in used_times:
-            continue
-            
-        scene_start = candidate['time']
-        scene_end = candidate['time']
-        scene_hits = [candidate]
-        scene_visual_score = 0.0
-        scene_text_score = 0.0
-        
-        if candidate['type'] == 'visual':
-            scene_visual_score = candidate['score']
-        else:
-            scene_text_score = candidate['score']
-        
-        for other in candidates:
-            if other['time'] in used_times:
-                continue
-            if other == candidate:
-                continue
-                
-            if abs(other['time'] - candidate['time']) <= time_window:
-                scene_hits.append(other)
-                scene_start = min(scene_start, other['time'])
-                scene_end = max(scene_end, other['time'])
-                used_times.add(other['time'])
-                
-                if other['type'] == 'visual':
-                    scene_visual_score = max(scene_visual_score, other['score'])
-                else:
-                    scene_text_score = max(scene_text_score, other['score'])
-        
-        used_times.add(candidate['time'])
-        
-        scenes.append({
-            'start_time': scene_start,
-            'end_time': scene_end,
-            'visual_score': scene_visual_score,
-            'text_score': scene_text_score,
-            'hits': scene_hits,
-            'center_time': candidate['time']
-        })
+    if max_scene_length is None:
+        max_scene_length = 2 * time_window
+
+    # --- 1. Flatten both modalities into columns; scores use the slider weights ---
+    times = np.empty(n, dtype=np.float64)
+    ends = np.empty(n, dtype=np.float64)
+    scores = np.empty(n, dtype=np.float64)
+
+    if n_frames:
+        times[:n_frames] = [r[0] for r in frames]
+        # Deduplicated frames stand in for a span of the video
+        ends[:n_frames] = [r[3] if len(r) > 3 else r[0] for r in frames]
+        scores[:n_frames] = [r[2] for r in frames]
+        scores[:n_frames] *= weight_visual
+    if n > n_frames:
+        times[n_frames:] = [r[0] for r in texts]
+        ends[n_frames:] = times[n_frames:]
+        scores[n_frames:] = [r[3] for r in texts]
+        scores[n_frames:] *= weight_text
+
+    is_visual = np.zeros(n, dtype=bool)
+    is_visual[:n_frames] = True
+
+    # --- 2. Sweep in time order ---
+    order = np.argsort(times, kind="stable")
+    t, e = times[order], ends[order]
+
+    # A new scene starts when a hit begins after everything before it has ended (plus the window)
+    reach = np.maximum.accumulate(e)
+    new_scene = np.ones(n, dtype=bool)
+    new_scene[1:] = t[1:] - reach[:-1] > time_window
+
+    # Split long runs of back-to-back hits into pieces of about max_scene_length,
+    # but never cut inside a hit's span (e.g. a deduplicated frame covering a long shot)
+    scene_id = np.cumsum(new_scene) - 1
+    scene_start = t[np.flatnonzero(new_scene)][scene_id]
+    piece = np.floor((t - scene_start) / max_scene_length) if max_scene_length > 0 else np.zeros(n)
+    new_scene[1:] |= (piece[1:] != piece[:-1]) & (t[1:] > reach[:-1])
+    scene_id = np.cumsum(new_scene) - 1
+    scene_first = np.flatnonzero(new_scene)
+
+    # --- 3. Per-scene best visual and text hits ---
+    sorted_scores = scores[order]
+    sorted_visual = is_visual[order]
+    visual_scores = np.where(sorted_visual, sorted_scores, -np.inf)
+    text_scores = np.where(sorted_visual, -np.inf, sorted_scores)
+
+    scene_visual = np.maximum.reduceat(visual_scores, scene_first)
+    scene_text = np.maximum.reduceat(text_scores, scene_first)
+    has_visual = np.isfinite(scene_visual)
+    has_text = np.isfinite(scene_text)
+    scene_visual = np.where(has_visual, scene_visual, 0.0)
+    scene_text = np.where(has_text, scene_text, 0.0)
+
+    best_visual = order[_group_argmax(visual_scores, scene_id)]
+    best_text = order[_group_argmax(text_scores, scene_id)]
+    best_hit = order[_group_argmax(sorted_scores, scene_id)]
+
+    total_scores = scene_visual + scene_text
 
     final_results = []
 
-    for scene in scenes:
-        total_score = scene['visual_score'] + scene['text_score']
-        
-        # Find best visual preview
-        best_image = "no_image.jpg"
-        visual_hits = [h for h in scene['hits'] if h['preview']]
-        if visual_hits:
-            best_visual_hit = max(visual_hits, key=lambda x: x['score'])
-            best_image = best_visual_hit['preview']
-        
-        # Find best text snippet
-        best_text = "..."
-        text_hits = [h for h in scene['hits'] if h['text']]
-        if text_hits:
-            best_text_hit = max(text_hits, key=lambda x: x['score'])
-            best_text = best_text_hit['text']
-        
-        # Use the time of the highest scoring hit in the scene
-        best_hit = max(scene['hits'], key=lambda x: x['score'])
-        scene_timestamp = best_hit['time']
-        
+    for i in np.argsort(-total_scores, kind="stable"):
+        visual_score = float(scene_visual[i])
+        text_score = float(scene_text[i])
+
         final_results.append({
-            'timestamp': scene_timestamp,
-            'score': total_score,
-            'match_type': 'hybrid' if scene['visual_score'] > 0 and scene['text_score'] > 0 else 'single',
-            'preview_path': best_image,
-            'transcript_snippet': best_text
+            # Use the time of the highest scoring hit in the scene
+            'timestamp': float(times[best_hit[i]]),
+            'score': float(total_scores[i]),
+            'match_type': 'hybrid' if visual_score > 0 and text_score > 0 else 'single',
+            'preview_path': frames[best_visual[i]][1] if has_visual[i] else "no_image.jpg",
+            'transcript_snippet': texts[best_text[i] - n_frames][2] if has_text[i] else "...",
         })
-    
-    final_results.sort(key=lambda x: x['score'], reverse=True)
-    
-    # --- 3. FIX: Return the list, not a single item ---
+
     # The API expects a list. If you return final_results[0], the React .map() function will crash.
-    return final_results
\ No newline at end of file
+    return final_results